@@ -0,0 +1,90 @@
+'''Benchmark do cold start da função: tempo da importação até a primeira resposta.
+
+Cada amostra roda em um processo Python novo, que importa `bq_taxonomy.main` e
+envia uma requisição `mode=apply` com um plano vazio, que percorre o handler,
+a configuração e a inicialização dos clientes sem depender de recursos reais
+(um plano vazio não consulta o workspace).
+As credenciais são anônimas, para que nenhuma chamada de rede seja necessária.
+
+Uso (a partir do diretório `function`):
+
+    python -m benchmarks.bench_cold_start [--samples 5]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from typing import Any, Dict, List
+
+
+CHILD: str = r'''
+import json, time
+start = time.perf_counter()
+import bq_taxonomy.main as main
+imported = time.perf_counter()
+
+from google.auth import credentials as ga_credentials
+from bq_taxonomy import clients, startup
+clients.credentials = lambda: (ga_credentials.AnonymousCredentials(), 'bench-project')
+
+import flask
+app = flask.Flask(__name__)
+with app.test_request_context('/?mode=apply', json={'version': 1, 'tables': {}}):
+    response = main.bq_taxonomy(flask.request)
+    assert response.status_code == 200, response.get_data()
+responded = time.perf_counter()
+
+# Constrói os clientes restantes, como faria uma execução real
+for factory in (clients.bigquery_client, clients.dataform_client):
+    factory()
+
+print(json.dumps({
+    'import': imported - start,
+    'first_response': responded - start,
+    'startup': startup.report()['timings'],
+}), flush=True)
+
+# Encerra sem esperar o envio dos logs pendentes do Cloud Logging, que falharia sem credenciais
+import os
+os._exit(0)
+'''
+
+def run_sample() -> Dict[str, Any]:
+    """Executa uma amostra em um processo novo e retorna os tempos medidos."""
+    env: Dict[str, str] = dict(
+        os.environ,
+        PROJECT_ID='bench-project', REPOSITORY_ID='bench', WORKSPACE_ID='bench', BASE_FOLDER='definitions',
+        ALLOW_APPLY='true',
+        # Evita que a configuração de logs tente detectar o ambiente de execução
+        NO_GCE_CHECK='True'
+    )
+    output: str = subprocess.run(
+        [sys.executable, '-c', CHILD], env=env, check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=5)
+    args = parser.parse_args()
+
+    samples: List[Dict[str, Any]] = [run_sample() for _ in range(args.samples)]
+    metrics: Dict[str, List[float]] = {'import': [], 'first_response': []}
+    for sample in samples:
+        metrics['import'].append(sample['import'])
+        metrics['first_response'].append(sample['first_response'])
+        for name, seconds in sample['startup'].items():
+            metrics.setdefault(f'startup.{name}', []).append(seconds)
+
+    print(f'{"metric":<32} {"median (ms)":>12} {"max (ms)":>12}')
+    for name, values in metrics.items():
+        print(f'{name:<32} {statistics.median(values) * 1000:>12.1f} {max(values) * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
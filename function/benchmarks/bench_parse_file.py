@@ -0,0 +1,72 @@
+'''Micro-benchmark do parser de blocos `config` contra a implementação anterior baseada em regex.
+
+Uso (a partir do diretório `function`):
+
+    python -m benchmarks.bench_parse_file [--columns 2000] [--sql-lines 20000] [--repeat 5]
+'''
+
+import argparse
+import json
+import re
+import timeit
+
+from typing import Any, Dict, Optional
+
+from bq_taxonomy import sqlx
+
+
+def legacy_parse(content: str) -> Optional[Dict[str, Any]]:
+    """Caminho anterior: busca do tipo com regex, aspas nas chaves com re.sub e json.loads."""
+    if not re.search(r'type:\s\"declaration\"', content):
+        return None
+    start_index: int = content.find('{')
+    return json.loads(re.sub(r'(\w+)\s*:', r'"\1":', content[start_index:]))
+
+
+def build_declaration(columns: int) -> str:
+    """Gera uma declaração com muitas colunas, compatível com os dois parsers."""
+    column_defs: str = ',\n'.join(
+        f'    column_{i}: {{\n'
+        f'      description: "Column {i}",\n'
+        f'      bigqueryPolicyTags: ["projects/p/locations/us/taxonomies/1/policyTags/{i}"]\n'
+        '    }'
+        for i in range(columns)
+    )
+    return (
+        'config {\n  type: "declaration",\n  schema: "dataset",\n  name: "wide_table",\n'
+        f'  columns: {{\n{column_defs}\n  }}\n}}\n'
+    )
+
+
+def build_non_declaration(sql_lines: int) -> str:
+    """Gera um arquivo que não é declaração, com um corpo SQL longo que o regex percorre inteiro."""
+    body: str = '\n'.join(f'SELECT {i} AS value UNION ALL' for i in range(sql_lines))
+    return f'config {{\n  type: "table",\n  schema: "dataset"\n}}\n{body}\nSELECT 0'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--columns', type=int, default=2000)
+    parser.add_argument('--sql-lines', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    declaration: str = build_declaration(args.columns)
+    non_declaration: str = build_non_declaration(args.sql_lines)
+    assert legacy_parse(declaration) == sqlx.parse_config(declaration, sqlx.DECLARATION_TYPE)
+
+    cases = {
+        f'declaration ({args.columns} columns, {len(declaration)} bytes)': declaration,
+        f'non-declaration ({args.sql_lines} SQL lines, {len(non_declaration)} bytes)': non_declaration,
+    }
+    print(f'{"case":<55} {"regex (ms)":>12} {"parser (ms)":>12}')
+    for name, content in cases.items():
+        legacy: float = min(timeit.repeat(lambda: legacy_parse(content), number=1, repeat=args.repeat))
+        parsed: float = min(timeit.repeat(
+            lambda: sqlx.parse_config(content, sqlx.DECLARATION_TYPE), number=1, repeat=args.repeat
+        ))
+        print(f'{name:<55} {legacy * 1000:>12.3f} {parsed * 1000:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+'''Benchmark de ponta a ponta do `validate_and_apply` contra backends falsos.
+
+Gera workspaces sintéticos com o número de declarações pedido (mais arquivos que
+não são declarações), colunas em quantidade variável e campos aninhados, e mede
+o tempo total, as chamadas às APIs e o pico de memória (tracemalloc) de cada um.
+Metade das tabelas já está com as policy tags desejadas e, na outra metade, as
+colunas com policy tags precisam de atualização. Como o tracemalloc deixa a
+execução mais lenta, o pico de memória é medido em uma segunda execução.
+
+Com `--validate-policy-tags`, as policy tags desejadas são validadas contra um Data
+Catalog falso com as 20 policy tags usadas pelo workspace.
+
+Com `--warm`, cada execução medida é precedida por outra no mesmo workspace, como
+em uma instância já aquecida, que reaproveita o cache do workspace.
+
+Uso (a partir do diretório `function`):
+
+    python -m benchmarks.bench_sync [--sizes 10,1000,10000] [--latency 0.005] [--error-rate 0]
+                                    [--bulk-snapshot] [--validate-policy-tags] [--skip-memory] [--warm]
+'''
+
+import argparse
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+
+from typing import Any, Dict, List, Tuple
+
+from google.cloud import bigquery
+
+from bq_taxonomy import cache
+from bq_taxonomy import config
+from bq_taxonomy import process
+from benchmarks import fakes
+
+
+PROJECT: str = 'bench-project'
+BASE_FOLDER: str = 'definitions'
+TAG: str = 'projects/bench-project/locations/us/taxonomies/1/policyTags/{}'
+FILES_PER_DIRECTORY: int = 100
+
+
+def _column_sqlx(name: str, tags: List[str], nested: Dict[str, List[str]], indent: str) -> str:
+    lines: List[str] = [f'{indent}{name}: {{', f'{indent}  description: "Column {name}",']
+    if tags:
+        lines.append(f'{indent}  bigqueryPolicyTags: {json.dumps(tags)},')
+    if nested:
+        lines.append(f'{indent}  columns: {{')
+        lines.append(',\n'.join(_column_sqlx(k, v, {}, indent + '    ') for k, v in nested.items()))
+        lines.append(f'{indent}  }}')
+    lines.append(f'{indent}}}')
+    return '\n'.join(lines)
+
+def generate_workspace(
+    declarations: int,
+    seed: int = 0
+) -> Tuple[Dict[str, str], Dict[str, List[bigquery.SchemaField]]]:
+    """
+    Gera um workspace sintético e as tabelas correspondentes no BigQuery.
+
+    Args:
+        declarations (int): Number of declaration files (and tables).
+        seed (int): Seed of the generator.
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, List[bigquery.SchemaField]]]: The workspace files
+            (path -> content) and the table schemas (full table ID -> schema). One extra
+            non-declaration file is generated for every four declarations.
+    """
+    rng: random.Random = random.Random(seed)
+    files: Dict[str, str] = {}
+    tables: Dict[str, List[bigquery.SchemaField]] = {}
+    for i in range(declarations):
+        dataset: str = f'dataset_{i // FILES_PER_DIRECTORY}'
+        directory: str = f'{BASE_FOLDER}/domain_{i // (FILES_PER_DIRECTORY * 10)}/{dataset}'
+        in_sync: bool = i % 2 == 0
+        columns: List[str] = []
+        schema: List[bigquery.SchemaField] = []
+        for c in range(rng.randint(3, 40)):
+            desired: List[str] = [TAG.format(rng.randint(1, 20))] if rng.random() < 0.3 else []
+            current: List[str] = desired if in_sync else []
+            nested: Dict[str, List[str]] = {}
+            if rng.random() < 0.1:
+                # Colunas RECORD não recebem policy tags, apenas os campos aninhados
+                desired = []
+                nested = {f'field_{n}': [TAG.format(rng.randint(1, 20))] for n in range(rng.randint(1, 5))}
+                schema.append(bigquery.SchemaField(f'column_{c}', 'RECORD', fields=[
+                    bigquery.SchemaField(name, 'STRING', policy_tags=bigquery.PolicyTagList(
+                        tags if in_sync else []
+                    )) for name, tags in nested.items()
+                ]))
+            else:
+                schema.append(bigquery.SchemaField(
+                    f'column_{c}', 'STRING', policy_tags=bigquery.PolicyTagList(current) if current else None
+                ))
+            columns.append(_column_sqlx(f'column_{c}', desired, nested, '    '))
+        column_block: str = ',\n'.join(columns)
+        files[f'{directory}/table_{i}.sqlx'] = (
+            f'config {{\n  type: "declaration",\n  schema: "{dataset}",\n  name: "table_{i}",\n'
+            f'  columns: {{\n{column_block}\n  }}\n}}\n'
+        )
+        tables[f'{PROJECT}.{dataset}.table_{i}'] = schema
+        if i % 4 == 0:
+            files[f'{directory}/view_{i}.sqlx'] = (
+                f'config {{\n  type: "view",\n  schema: "{dataset}"\n}}\n'
+                f'SELECT * FROM ${{ref("table_{i}")}}\n'
+            )
+    return files, tables
+
+def run(
+    declarations: int,
+    latency: float,
+    error_rate: float,
+    measure_memory: bool,
+    warm: bool = False
+) -> Dict[str, Any]:
+    """
+    Executa uma sincronização completa de um workspace sintético, com o cache do
+    workspace vazio ou, com `warm`, preenchido por uma execução anterior.
+
+    Returns:
+        Dict[str, Any]: Wall time, API calls per method, peak traced memory (in MiB,
+            None when not measured) and the count of tables per status.
+    """
+    files, tables = generate_workspace(declarations)
+    dataform_client = fakes.FakeDataformClient(files, latency=latency, error_rate=error_rate)
+    bigquery_client = fakes.FakeBigQueryClient(tables, latency=latency, error_rate=error_rate)
+    policy_tag_client = fakes.FakePolicyTagClient(
+        {'Bench': [f'Tag {i}' for i in range(1, 21)]}, project=PROJECT, latency=latency
+    )
+    cache.shared.cache_clear()
+    with fakes.install(dataform_client, bigquery_client, policy_tag_client):
+        if warm:
+            process.validate_and_apply(full_sync=True, dry_run=True)
+            dataform_client.calls.clear()
+            bigquery_client.calls.clear()
+            policy_tag_client.calls.clear()
+        if measure_memory:
+            tracemalloc.start()
+        start: float = time.perf_counter()
+        summary: Dict[str, Any] = process.validate_and_apply(full_sync=True)
+        wall: float = time.perf_counter() - start
+        peak: int = 0
+        if measure_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {
+        'wall': wall,
+        'calls': dict(dataform_client.calls + bigquery_client.calls + policy_tag_client.calls),
+        'peak_mib': peak / 2**20 if measure_memory else None,
+        'tables': summary['tables']
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,1000,10000')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds per fake API call.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of a transient error per call.')
+    parser.add_argument('--bulk-snapshot', action='store_true')
+    parser.add_argument('--validate-policy-tags', action='store_true')
+    parser.add_argument('--skip-memory', action='store_true', help='Skip the second, memory traced, run.')
+    parser.add_argument('--warm', action='store_true', help='Measure runs on a warm workspace cache.')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    os.environ.update(
+        PROJECT_ID=PROJECT, REPOSITORY_ID='bench', WORKSPACE_ID='bench', BASE_FOLDER=BASE_FOLDER,
+        STATE_URI='', BULK_SNAPSHOT=str(args.bulk_snapshot).lower(),
+        VALIDATE_POLICY_TAGS=str(args.validate_policy_tags).lower(),
+        TAXONOMY_PROJECTS=PROJECT, TAXONOMY_LOCATIONS='us'
+    )
+    config.get_settings.cache_clear()
+
+    print(f'{"declarations":>12} {"wall (s)":>9} {"files/s":>9} {"peak (MiB)":>11}  {"tables":<40} api calls')
+    for size in (int(s) for s in args.sizes.split(',')):
+        result: Dict[str, Any] = run(size, args.latency, args.error_rate, measure_memory=False, warm=args.warm)
+        peak: str = '-'
+        if not args.skip_memory:
+            peak = f'{run(size, args.latency, args.error_rate, measure_memory=True, warm=args.warm)["peak_mib"]:.1f}'
+        tables: str = ' '.join(f'{k}={v}' for k, v in result['tables'].items())
+        calls: str = ' '.join(f'{k}={v}' for k, v in sorted(result['calls'].items()))
+        print(f'{size:>12} {result["wall"]:>9.2f} {size / result["wall"]:>9.0f} {peak:>11}  {tables:<40} {calls}')
+
+
+if __name__ == '__main__':
+    main()
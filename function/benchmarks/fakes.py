@@ -0,0 +1,333 @@
+'''Backends falsos, em memória, do Dataform e do BigQuery para benchmarks offline.
+
+Os fakes implementam apenas os métodos dos clientes usados pela função, com latência
+configurável por chamada e injeção de erros transitórios, e contam as chamadas por
+método. São instalados no lugar dos clientes reais substituindo as fábricas de
+`bq_taxonomy.clients` com `install`.
+'''
+
+import collections
+import contextlib
+import copy
+import random
+import re
+import threading
+import time
+
+from typing import Any, Counter, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from unittest import mock
+
+from google.api_core import exceptions
+from google.api_core import retry as retries
+from google.cloud import bigquery
+from google.cloud import dataform
+
+from bq_taxonomy import clients
+from bq_taxonomy import taxonomy
+
+
+class _FakeBackend:
+    """Base dos fakes: latência, injeção de erros e contagem de chamadas."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0) -> None:
+        """
+        Args:
+            latency (float): Seconds slept by every call.
+            error_rate (float): Probability of a call failing with ServiceUnavailable.
+            seed (int): Seed of the error injection.
+        """
+        self.latency: float = latency
+        self.error_rate: float = error_rate
+        self.calls: Counter[str] = collections.Counter()
+        self._random: random.Random = random.Random(seed)
+        self._lock: threading.Lock = threading.Lock()
+
+    def _call(self, method: str) -> None:
+        """Registra a chamada, aplica a latência e, aleatoriamente, falha."""
+        with self._lock:
+            self.calls[method] += 1
+            fail: bool = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise exceptions.ServiceUnavailable(f'Injected error in {method}')
+
+
+class _Pager:
+    """Equivalente mínimo dos pagers retornados por `query_directory_contents` e `fetch_repository_history`."""
+
+    def __init__(self, pages: List[Any]) -> None:
+        self.pages: Iterator[Any] = iter(pages)
+
+
+class FakeDataformClient(_FakeBackend):
+    """
+    Workspace do Dataform em memória, com os arquivos indexados pelo caminho.
+
+    O estado do Git é simulado: os arquivos gravados ficam como mudanças pendentes até
+    `commit`, que as envia ao repositório com um novo commit.
+    """
+
+    def __init__(
+        self,
+        files: Dict[str, str],
+        page_size: int = 1000,
+        history: bool = True,
+        ahead: int = 0,
+        **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            files (Dict[str, str]): File path -> content.
+            page_size (int): Directory entries per page of `query_directory_contents`.
+            history (bool): Whether the repository history is available, as in repositories
+                            not connected to a remote Git repository.
+            ahead (int): Workspace commits not pushed to the repository yet.
+            **kwargs: Latency and error injection options, see `_FakeBackend`.
+        """
+        super().__init__(**kwargs)
+        self.files: Dict[str, bytes] = {path: content.encode('utf-8') for path, content in files.items()}
+        self.page_size: int = page_size
+        self.history: bool = history
+        self.commits: int = 1
+        self.ahead: int = ahead
+        self.changes: Dict[str, dataform.FetchFileGitStatusesResponse.UncommittedFileChange.State] = {}
+        self.directories: Dict[str, List[dataform.DirectoryEntry]] = {}
+        children: Dict[str, Dict[str, bool]] = collections.defaultdict(dict)
+        for path in self.files:
+            parts: List[str] = path.split('/')
+            for i in range(1, len(parts)):
+                children['/'.join(parts[:i])]['/'.join(parts[:i + 1])] = i == len(parts) - 1
+        for directory, entries in children.items():
+            self.directories[directory] = [
+                dataform.DirectoryEntry(file=entry) if is_file else dataform.DirectoryEntry(directory=entry)
+                for entry, is_file in sorted(entries.items())
+            ]
+
+    def _with_retry(self, function: Any, retry: Any) -> Any:
+        """Aplica a política de retry recebida, como faria o cliente real."""
+        return retry(function)() if isinstance(retry, retries.Retry) else function()
+
+    def query_directory_contents(
+        self,
+        request: dataform.QueryDirectoryContentsRequest,
+        retry: Any = None,
+        **_: Any
+    ) -> _Pager:
+        def query() -> _Pager:
+            self._call('query_directory_contents')
+            entries: Optional[List[dataform.DirectoryEntry]] = self.directories.get(request.path.rstrip('/'))
+            if entries is None:
+                raise exceptions.NotFound(f'Directory not found: {request.path}')
+            return _Pager([
+                dataform.QueryDirectoryContentsResponse(directory_entries=entries[i:i + self.page_size])
+                for i in range(0, max(len(entries), 1), self.page_size)
+            ])
+        return self._with_retry(query, retry)
+
+    def read_file(self, request: dataform.ReadFileRequest, retry: Any = None, **_: Any) -> dataform.ReadFileResponse:
+        def read() -> dataform.ReadFileResponse:
+            self._call('read_file')
+            if request.path not in self.files:
+                raise exceptions.NotFound(f'File not found: {request.path}')
+            return dataform.ReadFileResponse(file_contents=self.files[request.path])
+        return self._with_retry(read, retry)
+
+    def write_file(self, request: dataform.WriteFileRequest, **_: Any) -> dataform.WriteFileResponse:
+        self._call('write_file')
+        with self._lock:
+            state = dataform.FetchFileGitStatusesResponse.UncommittedFileChange.State
+            self.changes.setdefault(request.path, state.MODIFIED if request.path in self.files else state.ADDED)
+            self.files[request.path] = request.contents
+            parts: List[str] = request.path.split('/')
+            for i in range(1, len(parts)):
+                directory: str = '/'.join(parts[:i])
+                entry: str = '/'.join(parts[:i + 1])
+                entries: List[dataform.DirectoryEntry] = self.directories.setdefault(directory, [])
+                if all(e.file != entry and e.directory != entry for e in entries):
+                    is_file: bool = i == len(parts) - 1
+                    entries.append(
+                        dataform.DirectoryEntry(file=entry) if is_file else dataform.DirectoryEntry(directory=entry)
+                    )
+        return dataform.WriteFileResponse()
+
+    def commit(self) -> None:
+        """Grava as mudanças pendentes em um novo commit, já enviado ao repositório."""
+        with self._lock:
+            self.changes.clear()
+            self.commits += 1
+
+    def fetch_git_ahead_behind(self, request: dataform.FetchGitAheadBehindRequest, **_: Any) -> Any:
+        self._call('fetch_git_ahead_behind')
+        return dataform.FetchGitAheadBehindResponse(commits_ahead=self.ahead, commits_behind=0)
+
+    def fetch_file_git_statuses(self, request: dataform.FetchFileGitStatusesRequest, **_: Any) -> Any:
+        self._call('fetch_file_git_statuses')
+        with self._lock:
+            return dataform.FetchFileGitStatusesResponse(uncommitted_file_changes=[
+                dataform.FetchFileGitStatusesResponse.UncommittedFileChange(path=path, state=state)
+                for path, state in sorted(self.changes.items())
+            ])
+
+    def fetch_repository_history(self, request: dataform.FetchRepositoryHistoryRequest, **_: Any) -> _Pager:
+        self._call('fetch_repository_history')
+        if not self.history:
+            raise exceptions.FailedPrecondition('Repository history is not available with a remote Git repository.')
+        return _Pager([dataform.FetchRepositoryHistoryResponse(
+            commits=[dataform.CommitLogEntry(commit_sha=f'{self.commits:040x}')]
+        )])
+
+
+class _QueryJob:
+    """Equivalente mínimo de um QueryJob já concluído."""
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        self.rows: List[Dict[str, Any]] = rows
+
+    def result(self) -> List[Dict[str, Any]]:
+        return self.rows
+
+
+class FakeBigQueryClient(_FakeBackend):
+    """Tabelas do BigQuery em memória, com controle de concorrência pelo etag."""
+
+    COLUMN_FIELD_PATHS: re.Pattern = re.compile(
+        r'FROM `(?P<project>[^`]+)`\.`(?P<dataset>[^`]+)`\.INFORMATION_SCHEMA\.COLUMN_FIELD_PATHS'
+    )
+
+    def __init__(self, tables: Dict[str, List[bigquery.SchemaField]], **kwargs: Any) -> None:
+        """
+        Args:
+            tables (Dict[str, List[bigquery.SchemaField]]): Full table ID -> schema.
+            **kwargs: Latency and error injection options, see `_FakeBackend`.
+        """
+        super().__init__(**kwargs)
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        for full_table_id, schema in tables.items():
+            table: bigquery.Table = bigquery.Table(full_table_id, schema=schema)
+            table._properties['etag'] = '1' #pylint: disable=W0212
+            self.tables[full_table_id] = table.to_api_repr()
+
+    def _resource(self, full_table_id: str) -> Dict[str, Any]:
+        resource: Optional[Dict[str, Any]] = self.tables.get(full_table_id.replace(':', '.'))
+        if resource is None:
+            raise exceptions.NotFound(f'Not found: Table {full_table_id}')
+        return resource
+
+    def get_table(self, table: Any, **_: Any) -> bigquery.Table:
+        self._call('get_table')
+        with self._lock:
+            return bigquery.Table.from_api_repr(copy.deepcopy(self._resource(str(table))))
+
+    def update_table(self, table: bigquery.Table, fields: Sequence[str], **_: Any) -> bigquery.Table:
+        self._call('update_table')
+        with self._lock:
+            resource: Dict[str, Any] = self._resource(f'{table.project}.{table.dataset_id}.{table.table_id}')
+            if table.etag and table.etag != resource['etag']:
+                raise exceptions.PreconditionFailed(f'Etag mismatch for table {table.table_id}')
+            for field in fields:
+                resource[field] = copy.deepcopy(table.to_api_repr()[field])
+            resource['etag'] = str(int(resource['etag']) + 1)
+            return bigquery.Table.from_api_repr(copy.deepcopy(resource))
+
+    def list_datasets(self, project: str, **_: Any) -> List[bigquery.DatasetReference]:
+        self._call('list_datasets')
+        datasets: Set[str] = {
+            full_table_id.split('.')[1] for full_table_id in self.tables if full_table_id.startswith(f'{project}.')
+        }
+        return [bigquery.DatasetReference(project, dataset) for dataset in sorted(datasets)]
+
+    def query(self, query: str, job_config: Optional[bigquery.QueryJobConfig] = None, **_: Any) -> _QueryJob:
+        """Suporta apenas as consultas ao COLUMN_FIELD_PATHS usadas pelo snapshot em lote e pelo export."""
+        self._call('query')
+        match: Optional[re.Match] = self.COLUMN_FIELD_PATHS.search(query)
+        if match is None:
+            raise exceptions.BadRequest(f'Unsupported query: {query}')
+        prefix: str = f'{match["project"]}.{match["dataset"]}.'
+        table_names: Optional[Set[str]] = (
+            set(job_config.query_parameters[0].values) if job_config and job_config.query_parameters else None
+        )
+        rows: List[Dict[str, Any]] = []
+        with self._lock:
+            for full_table_id, resource in self.tables.items():
+                name: str = full_table_id[len(prefix):]
+                if full_table_id.startswith(prefix) and (table_names is None or name in table_names):
+                    rows.extend(_field_path_rows(name, resource['schema']['fields'], ''))
+        return _QueryJob(rows)
+
+
+def _field_path_rows(table_name: str, fields: List[Dict[str, Any]], prefix: str) -> Iterator[Dict[str, Any]]:
+    """Gera as linhas do COLUMN_FIELD_PATHS de um schema no formato da API."""
+    for field in fields:
+        path: str = f'{prefix}{field["name"]}'
+        yield {
+            'table_name': table_name,
+            'field_path': path,
+            'policy_tags': (field.get('policyTags') or {}).get('names', [])
+        }
+        yield from _field_path_rows(table_name, field.get('fields', []), f'{path}.')
+
+
+class FakePolicyTagClient(_FakeBackend):
+    """Taxonomias do Data Catalog em memória, com as listagens usadas por `taxonomy.load_policy_tag_index`."""
+
+    def __init__(
+        self,
+        taxonomies: Dict[str, List[str]],
+        project: str = 'p',
+        location: str = 'us',
+        **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            taxonomies (Dict[str, List[str]]): Taxonomy display name -> policy tag display names.
+                Taxonomies and policy tags are numbered from 1, in order, in their resource names
+                (e.g. 'projects/p/locations/us/taxonomies/1/policyTags/2').
+            project (str): The project holding the taxonomies.
+            location (str): The taxonomy location.
+            **kwargs: Latency and error injection options, see `_FakeBackend`.
+        """
+        super().__init__(**kwargs)
+        self.parent: str = f'projects/{project}/locations/{location}'
+        self.taxonomies: List[Dict[str, Any]] = []
+        self.policy_tags: Dict[str, List[Dict[str, Any]]] = {}
+        for i, (display_name, tags) in enumerate(taxonomies.items(), start=1):
+            name: str = f'{self.parent}/taxonomies/{i}'
+            self.taxonomies.append({'name': name, 'displayName': display_name})
+            self.policy_tags[name] = [
+                {'name': f'{name}/policyTags/{j}', 'displayName': tag} for j, tag in enumerate(tags, start=1)
+            ]
+
+    def list_taxonomies(self, parent: str) -> Iterator[Dict[str, Any]]:
+        self._call('list_taxonomies')
+        return iter(copy.deepcopy(self.taxonomies) if parent == self.parent else [])
+
+    def list_policy_tags(self, taxonomy_name: str) -> Iterator[Dict[str, Any]]:
+        self._call('list_policy_tags')
+        return iter(copy.deepcopy(self.policy_tags.get(taxonomy_name, [])))
+
+
+@contextlib.contextmanager
+def install(
+    dataform_client: Optional[FakeDataformClient] = None,
+    bigquery_client: Optional[FakeBigQueryClient] = None,
+    policy_tag_client: Optional[FakePolicyTagClient] = None
+) -> Iterator[Tuple[Optional[FakeDataformClient], Optional[FakeBigQueryClient]]]:
+    """
+    Substitui as fábricas de `bq_taxonomy.clients` pelos fakes durante o bloco.
+
+    Args:
+        dataform_client (Optional[FakeDataformClient]): The fake Dataform backend.
+        bigquery_client (Optional[FakeBigQueryClient]): The fake BigQuery backend.
+        policy_tag_client (Optional[FakePolicyTagClient]): The fake Data Catalog backend. The
+            policy tag index cached by previous invocations is discarded.
+    """
+    with contextlib.ExitStack() as stack:
+        if dataform_client is not None:
+            stack.enter_context(mock.patch.object(clients, 'dataform_client', lambda: dataform_client))
+        if bigquery_client is not None:
+            stack.enter_context(mock.patch.object(clients, 'bigquery_client', lambda: bigquery_client))
+        if policy_tag_client is not None:
+            stack.enter_context(mock.patch.object(taxonomy, '_client', policy_tag_client))
+            stack.enter_context(mock.patch.dict(taxonomy._cache, clear=True)) #pylint: disable=W0212
+        yield dataform_client, bigquery_client
@@ -1,25 +1,177 @@
 '''Módulo para interações com a API do BigQuery.'''
 
 import logging
-from typing import List, Dict, Any, Optional, Set
+import re
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
 
+from google.api_core import exceptions
 from google.cloud import bigquery
 
+from . import clients
+from . import metrics
 
-bq_client: bigquery.Client = bigquery.Client()
 
+# Identificadores aceitos ao compor consultas, que não podem recebê-los como parâmetros: ID de
+# projeto (com o prefixo de domínio opcional dos projetos legados) e ID de dataset
+_PROJECT_PATTERN: re.Pattern = re.compile(r'(?:[a-z][a-z0-9.-]*[a-z0-9]:)?[a-z](?:[a-z0-9-]{0,28}[a-z0-9])?')
+_DATASET_PATTERN: re.Pattern = re.compile(r'[A-Za-z0-9_]{1,1024}')
+
+def flatten_schema(schema: Iterable[bigquery.SchemaField]) -> Dict[str, bigquery.SchemaField]:
+    """
+    Monta um índice caminho -> campo para todos os campos do schema, incluindo os
+    campos aninhados de colunas RECORD/STRUCT (ex.: 'address.zip').
+
+    Args:
+        schema (Iterable[bigquery.SchemaField]): The table schema.
+
+    Returns:
+        Dict[str, bigquery.SchemaField]: The fields indexed by their dotted path,
+            in schema order (parents before their children).
+    """
+    index: Dict[str, bigquery.SchemaField] = {}
+    stack: List[Tuple[str, Iterator[bigquery.SchemaField]]] = [('', iter(schema))]
+    while stack:
+        prefix, fields = stack[-1]
+        field: Optional[bigquery.SchemaField] = next(fields, None)
+        if field is None:
+            stack.pop()
+            continue
+        path: str = f'{prefix}{field.name}'
+        index[path] = field
+        if field.fields:
+            stack.append((f'{path}.', iter(field.fields)))
+    return index
+
+def _apply_column_changes(path: str, tags: List[str], changes: List[Dict[str, str]]) -> List[str]:
+    """
+    Aplica as ações de uma coluna sobre a lista de policy tags atuais.
+
+    Args:
+        path (str): The column path, used for logging.
+        tags (List[str]): The current policy tags of the column.
+        changes (List[Dict[str, str]]): The 'add' and 'remove' actions to apply.
+
+    Returns:
+        List[str]: The resulting policy tags.
+    """
+    tags = list(tags)
+    for change_item in changes:
+        action: str = change_item['action']
+        tag_name: str = change_item['tag_name']
+
+        if action == 'add':
+            if tag_name not in tags:
+                tags.append(tag_name)
+                logging.info(
+                    'Action: ADD policy tag "%s" to column "%s"',
+                    tag_name, path
+                )
+            else:
+                logging.info(
+                    'Policy tag "%s" already exists on column "%s". Skipping add.',
+                    tag_name, path
+                )
+        elif action == 'remove':
+            if tag_name in tags:
+                tags.remove(tag_name)
+                logging.info(
+                    'Action: REMOVE policy tag "%s" from column "%s"',
+                    tag_name, path
+                )
+            else:
+                logging.warning(
+                    'Warning: Attempted to remove non-existent tag "%s" from column "%s". Skipping remove.',
+                    tag_name, path
+                )
+        else:
+            logging.warning(
+                'Warning: Unknown action "%s" for tag "%s" on column "%s". Skipping.',
+                action, tag_name, path
+            )
+    return tags
+
+def _rebuild_fields(
+    fields: Iterable[bigquery.SchemaField],
+    prefix: str,
+    tag_changes: Dict[str, Dict[str, List[Dict[str, str]]]],
+    affected: Set[str]
+) -> List[bigquery.SchemaField]:
+    """
+    Reconstrói apenas os ramos do schema afetados pelas mudanças; os demais campos
+    são reaproveitados sem serem percorridos.
+
+    Args:
+        fields (Iterable[bigquery.SchemaField]): The fields at the current level.
+        prefix (str): Path prefix of the given fields.
+        tag_changes (Dict[str, Dict[str, List[Dict[str, str]]]]): The changes per column path.
+        affected (Set[str]): The changed paths and all of their ancestors.
+
+    Returns:
+        List[bigquery.SchemaField]: The fields at the current level, with the changes applied.
+    """
+    new_fields: List[bigquery.SchemaField] = []
+    for field in fields:
+        path: str = f'{prefix}{field.name}'
+        if path not in affected:
+            new_fields.append(field)
+            continue
+
+        # Cria um novo SchemaField a partir da representação completa do campo,
+        # preservando todas as propriedades que não são alteradas.
+        api_repr: Dict[str, Any] = field.to_api_repr()
+        if path in tag_changes:
+            logging.info('Processing column "%s" for policy tag changes.', path)
+            current_tags: List[str] = list(field.policy_tags.names) if field.policy_tags else []
+            tags: List[str] = _apply_column_changes(path, current_tags, tag_changes[path]['changes'])
+            # É importante criar um novo objeto PolicyTagList.
+            api_repr['policyTags'] = bigquery.PolicyTagList(tags).to_api_repr() if tags else None
+        if field.fields:
+            api_repr['fields'] = [
+                f.to_api_repr() for f in _rebuild_fields(field.fields, f'{path}.', tag_changes, affected)
+            ]
+        new_fields.append(bigquery.SchemaField.from_api_repr(api_repr))
+    return new_fields
+
+def _apply_tag_changes(
+    bq_table: bigquery.Table,
+    tag_changes: Dict[str, Dict[str, List[Dict[str, str]]]]
+) -> List[bigquery.SchemaField]:
+    """
+    Aplica as mudanças de policy tags sobre o schema de uma tabela, retornando o novo schema.
+
+    Args:
+        bq_table (bigquery.Table): The table whose schema is used as the starting point.
+        tag_changes (Dict[str, Dict[str, List[Dict[str, str]]]]): The changes per column path,
+            in the format described in `sync_bigquery_column_policy_tags`.
+
+    Returns:
+        List[bigquery.SchemaField]: The new schema with the updated policy tags.
+    """
+    affected: Set[str] = set()
+    for path in tag_changes:
+        parts: List[str] = path.split('.')
+        affected.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return _rebuild_fields(bq_table.schema, '', tag_changes, affected)
+
+@metrics.instrumented('bigquery.sync_policy_tags')
 def sync_bigquery_column_policy_tags(
     full_table_id: str,
-    tag_changes: Dict[str, Dict[str, List[Dict[str, str]]]]
+    tag_changes: Dict[str, Dict[str, List[Dict[str, str]]]],
+    bq_table: Optional[bigquery.Table] = None
 ) -> None:
     """
     Sincroniza as policy tags para colunas em uma tabela do BigQuery.
 
+    A atualização é condicional ao etag da tabela lida: se a tabela foi alterada
+    por outro processo entre a leitura e a escrita, ela é relida uma única vez e
+    as mudanças são reaplicadas sobre o schema atualizado.
+
     Args:
         full_table_id (str): The full BigQuery table ID (e.g., 'project.dataset.table').
         tag_changes (Dict[str, Dict[str, List[Dict[str, str]]]]): 
-            Um dicionário onde as chaves são nomes de colunas e os valores são
-            dicionários contendo as ações ('add' ou 'remove') a serem aplicadas.
+            Um dicionário onde as chaves são nomes de colunas (ou caminhos de campos
+            aninhados, como 'address.zip') e os valores são dicionários contendo as
+            ações ('add' ou 'remove') a serem aplicadas.
             Example:
             {
                 "column_a": {
@@ -29,75 +181,28 @@ def sync_bigquery_column_policy_tags(
                     ]
                 }
             }
+        bq_table (Optional[bigquery.Table]): The table already fetched during the diff
+            phase. When omitted, the table is fetched before the update.
     """
     logging.info('Starting sync for table: %s', full_table_id)
     try:
-        # Get the current table to modify its schema
-        bq_table: bigquery.Table = bq_client.get_table(full_table_id)
-        new_schema: List[bigquery.SchemaField] = []
-
-        for field in bq_table.schema:
-            field: bigquery.SchemaField # Explicit type hint for clarity
-            if field.name in tag_changes:
-                logging.info('Processing column "%s" for policy tag changes.', field.name)
-                tags: List[str] = list(field.policy_tags.names) if field.policy_tags else []
-                for change_item in tag_changes[field.name]['changes']:
-                    action: str = change_item['action']
-                    tag_name: str = change_item['tag_name']
-
-                    if action == 'add':
-                        if tag_name not in tags:
-                            tags.append(tag_name)
-                            logging.info(
-                                'Action: ADD policy tag "%s" to column "%s"',
-                                tag_name, field.name
-                            )
-                        else:
-                            logging.info(
-                                'Policy tag "%s" already exists on column "%s". Skipping add.',
-                                tag_name, field.name
-                            )
-                    elif action == 'remove':
-                        if tag_name in tags:
-                            tags.remove(tag_name)
-                            logging.info(
-                                'Action: REMOVE policy tag "%s" from column "%s"',
-                                tag_name, field.name
-                            )
-                        else:
-                            logging.warning(
-                                'Warning: Attempted to remove non-existent tag "%s" from column "%s". Skipping remove.',
-                                tag_name, field.name
-                            )
-                    else:
-                        logging.warning(
-                            'Warning: Unknown action "%s" for tag "%s" on column "%s". Skipping.',
-                            action, tag_name, field.name
-                        )
-
-                # Cria um novo SchemaField com as policy tags atualizadas.
-                # É importante criar um novo objeto PolicyTagList.
-                updated_policy_tags: Optional[bigquery.PolicyTagList]
-                if tags:
-                    updated_policy_tags = bigquery.PolicyTagList(tags)
-                else:
-                    updated_policy_tags = None
-
-                new_field: bigquery.SchemaField = bigquery.SchemaField(
-                    name=field.name,
-                    field_type=field.field_type,
-                    mode=field.mode,
-                    description=field.description,
-                    policy_tags=updated_policy_tags, # Assign the updated policy tags
-                    fields=field.fields # Preserve nested fields if any
-                )
-                new_schema.append(new_field)
-            else:
-                new_schema.append(field)
+        if bq_table is None:
+            bq_table = get_bigquery_table(full_table_id)
 
-        # Atualiza a tabela. O field_mask 'schema' garante que apenas o schema seja modificado.
-        updated_table: bigquery.Table = bigquery.Table(full_table_id, schema=new_schema)
-        updated_table = bq_client.update_table(updated_table, ['schema'])
+        # Atualiza a tabela. O field_mask 'schema' garante que apenas o schema seja modificado,
+        # e o etag da tabela lida é enviado como pré-condição (If-Match).
+        bq_table.schema = _apply_tag_changes(bq_table, tag_changes)
+        try:
+            clients.bigquery_client().update_table(bq_table, ['schema'])
+        except exceptions.PreconditionFailed:
+            logging.warning(
+                'Table %s changed since it was read. Refetching and retrying the update.',
+                full_table_id
+            )
+            metrics.active().retry('bigquery.sync_policy_tags')
+            bq_table = get_bigquery_table(full_table_id)
+            bq_table.schema = _apply_tag_changes(bq_table, tag_changes)
+            clients.bigquery_client().update_table(bq_table, ['schema'])
         logging.info('Successfully synced policy tags for table: %s', full_table_id)
     except Exception as e:
         logging.error('Error syncing policy tags for table %s: %s', full_table_id, e, exc_info=True)
@@ -143,17 +248,42 @@ def compare_policy_tag_lists(desired_tags: List[str], current_tags: List[str]) -
         'match': are_identical
     }
 
-def get_bigquery_table_config(full_table_id: str) -> Dict[str, Dict[str, Any]]:
+@metrics.instrumented('bigquery.get_table')
+def get_bigquery_table(full_table_id: str) -> bigquery.Table:
+    """
+    Obtém os metadados de uma tabela do BigQuery.
+
+    Args:
+        full_table_id (str): The full BigQuery table ID (e.g., 'project.dataset.table').
+
+    Returns:
+        bigquery.Table: The table, including its schema and etag.
+    """
+    logging.info('Retrieving table: %s', full_table_id)
+    try:
+        return clients.bigquery_client().get_table(full_table_id)
+    except Exception as e:
+        logging.error('Error retrieving table %s: %s', full_table_id, e, exc_info=True)
+        raise
+
+@metrics.instrumented('bigquery.get_table_config')
+def get_bigquery_table_config(
+    full_table_id: str,
+    bq_table: Optional[bigquery.Table] = None
+) -> Dict[str, Dict[str, Any]]:
     """
     Obtém a configuração atual de uma tabela do BigQuery, focando nos
     nomes das colunas e suas policy tags associadas.
 
     Args:
         full_table_id (str): The full BigQuery table ID (e.g., 'project.dataset.table').
+        bq_table (Optional[bigquery.Table]): An already fetched table. When omitted,
+            the table is fetched with `get_bigquery_table`.
 
     Returns:
-        Um dicionário onde as chaves são nomes de colunas e os valores são dicionários contendo:
-            - 'name': The column name.
+        Um dicionário onde as chaves são nomes de colunas, incluindo os caminhos dos campos
+        aninhados (ex.: 'address.zip'), e os valores são dicionários contendo:
+            - 'name': The column name or dotted path.
             - 'policy_tags': A list of policy tag resource names applied to the column (if any).
                 Example: 'projects/PROJECT_ID/.../POLICY_TAG_ID'
             Returns an empty dictionary if the table has no schema.
@@ -161,16 +291,17 @@ def get_bigquery_table_config(full_table_id: str) -> Dict[str, Dict[str, Any]]:
     logging.info('Retrieving configuration for table: %s', full_table_id)
     table_config: Dict[str, Dict[str, Any]] = {}
     try:
-        bq_table: bigquery.Table = bq_client.get_table(full_table_id)
+        if bq_table is None:
+            bq_table = get_bigquery_table(full_table_id)
 
         if bq_table.schema:
-            for field in bq_table.schema:
+            for path, field in flatten_schema(bq_table.schema).items():
                 field: bigquery.SchemaField # Explicit type hint
                 column_definition: Dict[str, Any] = {
-                    'name': field.name,
+                    'name': path,
                     'policy_tags': list(field.policy_tags.names) if field.policy_tags else []
                 }
-                table_config[field.name] = column_definition
+                table_config[path] = column_definition
         else:
             logging.warning('Warning: Table %s has no defined schema. Returning empty config.', full_table_id)
 
@@ -179,3 +310,138 @@ def get_bigquery_table_config(full_table_id: str) -> Dict[str, Dict[str, Any]]:
         logging.error('Error retrieving configuration for table %s: %s', full_table_id, e, exc_info=True)
         raise
     return table_config
+
+def parse_dataset_id(dataset_id: str, default_project: str) -> Tuple[str, str]:
+    """
+    Converte um ID de dataset ('dataset' ou 'project.dataset') no par (projeto, dataset),
+    validando os dois identificadores.
+
+    Args:
+        dataset_id (str): The dataset ID.
+        default_project (str): The project used when the ID has none.
+
+    Returns:
+        Tuple[str, str]: The project and dataset IDs.
+
+    Raises:
+        ValueError: If the project or the dataset is not a valid BigQuery identifier.
+    """
+    project, _, dataset = dataset_id.rpartition('.')
+    project = project or default_project
+    if not _PROJECT_PATTERN.fullmatch(project) or not _DATASET_PATTERN.fullmatch(dataset):
+        raise ValueError(f'Invalid dataset ID "{dataset_id}".')
+    return project, dataset
+
+@metrics.instrumented('bigquery.snapshot_query')
+def _run_query(query: str, job_config: bigquery.QueryJobConfig) -> List[Any]:
+    """Executa uma consulta e retorna todas as linhas do resultado."""
+    return list(clients.bigquery_client().query(query, job_config=job_config).result())
+
+def _query_field_paths(
+    project: str,
+    dataset: str,
+    table_names: Optional[Iterable[str]] = None
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Lê as policy tags de todos os campos das tabelas de um dataset com uma única
+    consulta ao `INFORMATION_SCHEMA.COLUMN_FIELD_PATHS`.
+
+    Args:
+        project (str): The dataset project.
+        dataset (str): The dataset ID.
+        table_names (Optional[Iterable[str]]): Restrict the query to these tables.
+            When omitted, every table of the dataset is read.
+
+    Returns:
+        Full table ID -> table configuration, in the format returned by `get_bigquery_table_config`.
+
+    Raises:
+        ValueError: If the project or the dataset is not a valid BigQuery identifier.
+    """
+    parse_dataset_id(f'{project}.{dataset}', project)
+    query: str = (
+        'SELECT table_name, field_path, policy_tags '
+        f'FROM `{project}`.`{dataset}`.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS'
+    )
+    job_config: bigquery.QueryJobConfig = bigquery.QueryJobConfig()
+    if table_names is not None:
+        query += ' WHERE table_name IN UNNEST(@table_names)'
+        job_config.query_parameters = [
+            bigquery.ArrayQueryParameter('table_names', 'STRING', sorted(table_names))
+        ]
+    index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for row in _run_query(query, job_config):
+        table_config: Dict[str, Dict[str, Any]] = index.setdefault(
+            f'{project}.{dataset}.{row["table_name"]}', {}
+        )
+        table_config[row['field_path']] = {
+            'name': row['field_path'],
+            'policy_tags': list(row['policy_tags'] or [])
+        }
+    return index
+
+def get_bigquery_tables_config(full_table_ids: Iterable[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Obtém a configuração de várias tabelas do BigQuery de uma só vez, com uma
+    consulta ao `INFORMATION_SCHEMA.COLUMN_FIELD_PATHS` por dataset, em vez de
+    uma chamada `tables.get` por tabela.
+
+    Args:
+        full_table_ids (Iterable[str]): The full BigQuery table IDs (e.g., 'project.dataset.table').
+
+    Returns:
+        Um índice onde as chaves são os IDs completos das tabelas e os valores seguem o
+        mesmo formato retornado por `get_bigquery_table_config`. Tabelas não encontradas,
+        ou de datasets cuja consulta falhou, ficam fora do índice e devem ser lidas
+        individualmente com `get_bigquery_table_config`.
+    """
+    tables_by_dataset: Dict[Tuple[str, str], Set[str]] = {}
+    for full_table_id in full_table_ids:
+        project, dataset, table = full_table_id.split('.', 2)
+        tables_by_dataset.setdefault((project, dataset), set()).add(table)
+
+    index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for (project, dataset), tables in tables_by_dataset.items():
+        logging.info(
+            'Retrieving bulk configuration for %d tables in dataset: %s.%s',
+            len(tables), project, dataset
+        )
+        try:
+            index.update(_query_field_paths(project, dataset, tables))
+        except Exception as e: #pylint: disable=W0718
+            logging.warning(
+                'Bulk configuration query failed for dataset %s.%s, falling back to per-table reads: %s',
+                project, dataset, e
+            )
+    logging.info('Retrieved bulk configuration for %d tables.', len(index))
+    return index
+
+def get_bigquery_dataset_config(project: str, dataset: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Obtém a configuração de todas as tabelas de um dataset com uma única consulta.
+
+    Args:
+        project (str): The dataset project.
+        dataset (str): The dataset ID.
+
+    Returns:
+        Full table ID -> table configuration, in the format returned by `get_bigquery_table_config`.
+    """
+    logging.info('Retrieving configuration for all tables in dataset: %s.%s', project, dataset)
+    try:
+        return _query_field_paths(project, dataset)
+    except Exception as e:
+        logging.error('Error retrieving configuration for dataset %s.%s: %s', project, dataset, e, exc_info=True)
+        raise
+
+def list_datasets(project: str) -> List[str]:
+    """
+    Lista os datasets de um projeto.
+
+    Args:
+        project (str): The project ID.
+
+    Returns:
+        List[str]: The dataset IDs.
+    """
+    return [d.dataset_id for d in clients.bigquery_client().list_datasets(project)]
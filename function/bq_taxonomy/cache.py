@@ -0,0 +1,144 @@
+'''Módulo de cache LRU limitado por tamanho, em memória e, opcionalmente, em disco.
+
+O cache guarda valores de texto por chave. A camada em memória é reaproveitada pelas
+invocações seguintes da mesma instância; a camada em disco (por exemplo em `/tmp`)
+sobrevive também à troca do processo. As duas camadas são limitadas ao mesmo número
+de bytes e descartam primeiro as entradas usadas há mais tempo.
+'''
+
+import collections
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from typing import List, Optional, OrderedDict, Tuple
+
+
+class LRUCache:
+    """Cache LRU de textos, limitado pelo total de bytes (UTF-8) dos valores."""
+
+    def __init__(self, max_bytes: int, directory: str = '') -> None:
+        """
+        Args:
+            max_bytes (int): Maximum total size of the values in each layer.
+            directory (str): Directory of the disk layer. Empty keeps the cache in memory only.
+        """
+        self.max_bytes: int = max_bytes
+        self.directory: str = directory
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: OrderedDict[str, str] = collections.OrderedDict()
+        self._bytes: int = 0
+        # Tamanho da camada em disco, calculado na primeira escrita
+        self._disk_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Busca um valor, primeiro em memória e depois em disco.
+
+        Returns:
+            Optional[str]: The cached value, or None on a miss.
+        """
+        with self._lock:
+            value: Optional[str] = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+        if not self.directory:
+            return None
+        path: str = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as file:
+                value = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        """Grava um valor nas duas camadas. Valores maiores que o limite são ignorados."""
+        size: int = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        self._remember(key, value)
+        if self.directory:
+            self._write(key, value, size)
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            previous: Optional[str] = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.encode('utf-8'))
+            self._entries[key] = value
+            self._bytes += len(value.encode('utf-8'))
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.encode('utf-8'))
+
+    def _write(self, key: str, value: str, size: int) -> None:
+        """Grava o valor em disco de forma atômica e descarta os arquivos mais antigos acima do limite."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+                file.write(value)
+            os.replace(temporary, self._path(key))
+        except OSError as e:
+            logging.warning('Could not write cache entry to %s: %s', self.directory, e)
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(entry_bytes for _, entry_bytes, _ in self._disk_entries())
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes <= self.max_bytes:
+                return
+            # Descarta até 90% do limite, para não varrer o diretório a cada escrita
+            entries: List[Tuple[float, int, str]] = sorted(
+                (modified, entry_bytes, path) for path, entry_bytes, modified in self._disk_entries()
+            )
+            for _, entry_size, path in entries:
+                if self._disk_bytes <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._disk_bytes -= entry_size
+
+    def _disk_entries(self) -> List[Tuple[str, int, float]]:
+        """Lista os arquivos da camada em disco: (caminho, tamanho, data de modificação)."""
+        entries: List[Tuple[str, int, float]] = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat: os.stat_result = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def clear(self) -> None:
+        """Esvazia a camada em memória."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+@functools.lru_cache(maxsize=None)
+def shared(max_bytes: int, directory: str = '') -> Optional[LRUCache]:
+    """
+    Retorna o cache compartilhado pelas invocações da instância com a configuração informada.
+
+    Args:
+        max_bytes (int): Maximum total size of the values. Zero or less disables the cache.
+        directory (str): Directory of the disk layer. Empty keeps the cache in memory only.
+
+    Returns:
+        Optional[LRUCache]: The cache, or None when it is disabled.
+    """
+    return LRUCache(max_bytes, directory) if max_bytes > 0 else None
@@ -0,0 +1,85 @@
+'''Módulo com as fábricas dos clientes das APIs do Google Cloud.
+
+Os clientes são criados sob demanda, no primeiro uso, e reaproveitados pelas
+invocações seguintes da mesma instância. Todos compartilham as mesmas credenciais,
+e os clientes HTTP (BigQuery, Cloud Storage e Data Catalog) compartilham também a
+mesma sessão autenticada.
+'''
+
+import functools
+import threading
+
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+import google.auth
+from google.auth import credentials as ga_credentials
+from google.auth.transport import requests as auth_requests
+from google.cloud import bigquery
+from google.cloud import dataform
+
+from . import startup
+
+
+SCOPES: Tuple[str, ...] = ('https://www.googleapis.com/auth/cloud-platform',)
+
+T = TypeVar('T')
+
+def _lazy(name: str) -> Callable[[Callable[[], T]], Callable[[], T]]:
+    """
+    Transforma uma fábrica sem argumentos em um singleton criado no primeiro uso,
+    de forma segura entre threads, registrando o tempo de criação em `startup`.
+
+    Args:
+        name (str): The name used in the startup timing report.
+    """
+    def decorator(factory: Callable[[], T]) -> Callable[[], T]:
+        lock: threading.Lock = threading.Lock()
+        instance: list = []
+
+        @functools.wraps(factory)
+        def wrapper() -> T:
+            if not instance:
+                with lock:
+                    if not instance:
+                        with startup.timed(name):
+                            instance.append(factory())
+            return instance[0]
+
+        return wrapper
+    return decorator
+
+@_lazy('client.credentials')
+def credentials() -> Tuple[ga_credentials.Credentials, Optional[str]]:
+    """
+    Credenciais padrão da aplicação (ADC), compartilhadas por todos os clientes.
+
+    Returns:
+        Tuple[ga_credentials.Credentials, Optional[str]]: The credentials and the default project.
+    """
+    return google.auth.default(scopes=list(SCOPES))
+
+@_lazy('client.session')
+def authorized_session() -> auth_requests.AuthorizedSession:
+    """Sessão HTTP autenticada, compartilhada pelos clientes que usam APIs REST."""
+    return auth_requests.AuthorizedSession(credentials()[0])
+
+@_lazy('client.bigquery')
+def bigquery_client() -> bigquery.Client:
+    """Cliente do BigQuery."""
+    creds, project = credentials()
+    return bigquery.Client(project=project, credentials=creds, _http=authorized_session())
+
+@_lazy('client.dataform')
+def dataform_client() -> dataform.DataformClient:
+    """Cliente do Dataform (gRPC)."""
+    return dataform.DataformClient(credentials=credentials()[0])
+
+@_lazy('client.logging')
+def logging_client() -> Any:
+    """
+    Cliente do Cloud Logging. A biblioteca é importada apenas aqui, pois só é
+    usada para configurar o handler de logs na primeira requisição.
+    """
+    from google.cloud import logging as cloud_logging #pylint: disable=C0415
+    creds, project = credentials()
+    return cloud_logging.Client(project=project, credentials=creds, _http=authorized_session())
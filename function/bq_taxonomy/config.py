@@ -0,0 +1,120 @@
+'''Módulo de configuração da função, lida das variáveis de ambiente no primeiro uso.'''
+
+import functools
+import os
+
+from typing import List, NamedTuple, Tuple
+
+
+MODES: Tuple[str, ...] = ('sync', 'plan', 'apply', 'export')
+
+
+class Settings(NamedTuple):
+    """Configuração da função."""
+    project_id: str
+    region_id: str
+    repository_id: str
+    workspace_id: str
+    base_folder: str
+    # Número máximo de leituras simultâneas de arquivos no Dataform
+    read_concurrency: int
+    # Número máximo de listagens simultâneas de diretórios no Dataform
+    list_concurrency: int
+    # Padrões glob para filtrar os arquivos e diretórios percorridos
+    include_globs: List[str]
+    exclude_globs: List[str]
+    # Lê o schema de todas as tabelas com uma consulta por dataset, em vez de um get_table por tabela
+    bulk_snapshot: bool
+    # Local do estado da última sincronização (caminho local ou gs://bucket/objeto). Vazio desativa o modo incremental.
+    state_uri: str
+    # Força a reconciliação completa de todas as declarações, ignorando o estado salvo
+    full_sync: bool
+    # Número máximo de tabelas processadas simultaneamente
+    table_concurrency: int
+    # Número máximo de tabelas iniciadas por segundo (0 desativa o limite)
+    table_rate_limit: float
+    # Número máximo de tabelas do mesmo dataset processadas simultaneamente (0 desativa o limite)
+    dataset_concurrency: int
+    # Valida as policy tags desejadas contra as taxonomias do Data Catalog antes de qualquer escrita
+    validate_policy_tags: bool
+    # Projetos e localizações das taxonomias usadas na validação
+    taxonomy_projects: List[str]
+    taxonomy_locations: List[str]
+    # Tempo (em segundos) em que o índice de policy tags é reaproveitado entre invocações
+    taxonomy_cache_ttl: float
+    # Modo padrão de execução: 'sync' (compara e aplica), 'plan' (apenas gera o plano), 'apply' (aplica um plano)
+    # ou 'export' (gera declarações a partir das policy tags do BigQuery)
+    mode: str
+    # Habilita o modo 'apply'. Desligado por padrão: o plano vem no corpo da requisição
+    allow_apply: bool
+    # Habilita o modo 'export', que grava no workspace e expõe as policy tags dos datasets lidos. Desligado por padrão
+    allow_export: bool
+    # Datasets lidos pelo modo export ('dataset' ou 'projeto.dataset'). Vazio lê todos os datasets do projeto.
+    export_datasets: List[str]
+    # Diretório do workspace onde o modo export grava as declarações geradas. Vazio usa o BASE_FOLDER.
+    export_folder: str
+    # Tamanho máximo (em bytes) do cache de listagens, arquivos e declarações do workspace (0 desativa o cache)
+    workspace_cache_bytes: int
+    # Diretório da camada em disco do cache do workspace (por exemplo /tmp/bq_taxonomy). Vazio usa apenas a memória.
+    workspace_cache_dir: str
+    # Tempo (em segundos) em que o cache vale para workspaces cujo commit não pode ser identificado
+    # (repositórios com Git remoto ou commits não enviados). Zero não usa o cache nesses workspaces.
+    workspace_cache_ttl: float
+    # Executa cada sincronização sob o cProfile, registrando no log as funções mais custosas
+    profile: bool
+    # Arquivo onde o perfil bruto (formato pstats) é gravado. Vazio apenas registra no log.
+    profile_path: str
+
+
+def _flag(name: str, default: str = 'false') -> bool:
+    """Lê uma variável de ambiente booleana."""
+    return os.environ.get(name, default).lower() == 'true'
+
+def _list(name: str, default: str = '') -> List[str]:
+    """Lê uma variável de ambiente com valores separados por vírgula."""
+    return [v.strip() for v in os.environ.get(name, default).split(',') if v.strip()]
+
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Lê a configuração das variáveis de ambiente. O resultado é reaproveitado pelas
+    invocações seguintes da mesma instância.
+
+    Returns:
+        Settings: The function settings.
+
+    Raises:
+        KeyError: If a required environment variable is missing.
+    """
+    project_id: str = os.environ['PROJECT_ID']
+    return Settings(
+        project_id=project_id,
+        region_id=os.environ.get('REGION_ID', 'us-central1'),
+        repository_id=os.environ['REPOSITORY_ID'],
+        workspace_id=os.environ['WORKSPACE_ID'],
+        base_folder=os.environ['BASE_FOLDER'],
+        read_concurrency=int(os.environ.get('READ_CONCURRENCY', '16')),
+        list_concurrency=int(os.environ.get('LIST_CONCURRENCY', '8')),
+        include_globs=_list('INCLUDE_GLOBS'),
+        exclude_globs=_list('EXCLUDE_GLOBS'),
+        bulk_snapshot=_flag('BULK_SNAPSHOT'),
+        state_uri=os.environ.get('STATE_URI', ''),
+        full_sync=_flag('FULL_SYNC'),
+        table_concurrency=int(os.environ.get('TABLE_CONCURRENCY', '8')),
+        table_rate_limit=float(os.environ.get('TABLE_RATE_LIMIT', '0')),
+        dataset_concurrency=int(os.environ.get('DATASET_CONCURRENCY', '4')),
+        validate_policy_tags=_flag('VALIDATE_POLICY_TAGS'),
+        taxonomy_projects=_list('TAXONOMY_PROJECTS', project_id),
+        taxonomy_locations=_list('TAXONOMY_LOCATIONS', 'us'),
+        taxonomy_cache_ttl=float(os.environ.get('TAXONOMY_CACHE_TTL', '300')),
+        mode=os.environ.get('MODE', 'sync'),
+        allow_apply=_flag('ALLOW_APPLY'),
+        allow_export=_flag('ALLOW_EXPORT'),
+        export_datasets=_list('EXPORT_DATASETS'),
+        export_folder=os.environ.get('EXPORT_FOLDER', '') or os.environ['BASE_FOLDER'],
+        workspace_cache_bytes=int(float(os.environ.get('WORKSPACE_CACHE_MB', '32')) * 2**20),
+        workspace_cache_dir=os.environ.get('WORKSPACE_CACHE_DIR', ''),
+        workspace_cache_ttl=float(os.environ.get('WORKSPACE_CACHE_TTL', '0')),
+        profile=_flag('PROFILE'),
+        profile_path=os.environ.get('PROFILE_PATH', '')
+    )
@@ -1,15 +1,45 @@
 '''Módulo para interações com a API do Dataform.'''
 
+import collections
+import fnmatch
+import hashlib
 import json
-import re
 import logging
+import threading
+import time
 
-from typing import Iterator, List, Dict, Any
+from concurrent import futures
+from typing import Deque, FrozenSet, Iterable, Iterator, List, Dict, Any, Optional, Tuple
 
+from google.api_core import exceptions
+from google.api_core import retry as retries
 from google.cloud import dataform
 
+from . import clients
+from . import metrics
+from . import sqlx
+from .cache import LRUCache
 
-df_client: dataform.DataformClient = dataform.DataformClient()
+
+# Política padrão de retry para leituras: backoff exponencial apenas para erros transitórios
+# (UNAVAILABLE, DEADLINE_EXCEEDED, etc).
+DEFAULT_READ_RETRY: retries.Retry = retries.Retry(
+    predicate=retries.if_transient_error,
+    initial=0.5,
+    maximum=10.0,
+    multiplier=2.0,
+    timeout=60.0,
+    on_error=metrics.retry_callback('dataform.read_file')
+)
+
+def workspace_path(project: str, location: str, repository: str, workspace: str) -> str:
+    """
+    Monta o nome completo do recurso de um workspace do Dataform, sem criar o cliente.
+
+    Returns:
+        str: The workspace resource name.
+    """
+    return dataform.DataformClient.workspace_path(project, location, repository, workspace)
 
 def request_directory(workspace_name: str, path: str) -> Iterator[dataform.QueryDirectoryContentsResponse]:
     """
@@ -28,7 +58,7 @@ def request_directory(workspace_name: str, path: str) -> Iterator[dataform.Query
         query_directory: dataform.QueryDirectoryContentsRequest = dataform.QueryDirectoryContentsRequest(
             workspace=workspace_name, path=path
         )
-        return df_client.query_directory_contents(query_directory).pages
+        return clients.dataform_client().query_directory_contents(query_directory).pages
     except Exception as e:
         logging.error('Error requesting directory contents for workspace %s, path %s: %s',
                       workspace_name, path, e, exc_info=True
@@ -37,43 +67,28 @@ def request_directory(workspace_name: str, path: str) -> Iterator[dataform.Query
 
 def parse_file(content: str) -> Dict[str, Any]:
     """
-    Analisa o conteúdo de um arquivo de declaração do Dataform.
-    Tenta converter o conteúdo em um formato compatível com JSON, adicionando
-    aspas a chaves não citadas, e então o carrega como um dicionário Python.
+    Analisa o bloco `config { ... }` de um arquivo SQLX do Dataform.
+    O bloco usa uma sintaxe semelhante a JavaScript (chaves sem aspas, aspas simples,
+    comentários e vírgulas finais), que é lida por um parser próprio em uma única
+    passagem, parando na chave que fecha o bloco.
 
     Args:
         content (str): The string content of the file to parse.
 
     Returns:
-        Dict[str, Any]: The parsed content as a Python dictionary.
+        Dict[str, Any]: The parsed config block as a Python dictionary.
 
     Raises:
-        json.JSONDecodeError: If the content cannot be parsed as valid JSON.
+        sqlx.SqlxParseError: If the config block is not valid.
+        ValueError: If the content has no config block.
     """
     logging.debug('Attempting to parse file content (first 100 chars): %s...', content[:100])
     try:
-        # Regex para encontrar chaves sem aspas seguidas por dois pontos.
-        # Necessário porque os arquivos de declaração do Dataform usam uma sintaxe
-        # semelhante a JavaScript, que não é JSON válido.
-        # (\w+): Captura uma ou mais "word characters" (letras, números, underscore).
-        # \s*: Corresponde a zero ou mais espaços em branco.
-        # :    : Corresponde ao literal de dois pontos.
-        pattern: str = r'(\w+)\s*:'
-
-        start_index: int = content.find('{')
-        if start_index == -1: # pragma: no cover
-            raise ValueError('No JSON-like object found in content.')
-
-        # Replace unquoted keys with double-quoted keys
-        # We use r'"\1":' to replace the found word (\1) with itself surrounded by double quotes, plus the colon.
-        json_compatible_string: str = re.sub(pattern, r'"\1":', content[start_index:])
-
-        python_dict_regex: Dict[str, Any] = json.loads(json_compatible_string)
+        config: Optional[Dict[str, Any]] = sqlx.parse_config(content)
+        if config is None:
+            raise ValueError('No config block found in content.')
         logging.debug('Successfully parsed file content.')
-        return python_dict_regex
-    except json.JSONDecodeError as e:
-        logging.error('JSON decoding error while parsing file content: %s', e, exc_info=True)
-        raise
+        return config
     except ValueError as e:
         logging.error('Value error while parsing file content: %s', e, exc_info=True)
         raise
@@ -81,38 +96,318 @@ def parse_file(content: str) -> Dict[str, Any]:
         logging.error('An unexpected error occurred during file parsing: %s', e, exc_info=True)
         raise
 
-def get_files(
-        list_file: List[str],
-        pages: Iterator[dataform.QueryDirectoryContentsResponse],
-        workspace_name: str
+def parse_declaration(content: str, cache: Optional[LRUCache] = None) -> Optional[sqlx.Declaration]:
+    """
+    Analisa um arquivo SQLX do Dataform e retorna a declaração tipada. Arquivos de
+    outros tipos são rejeitados assim que a chave 'type' é lida.
+
+    Args:
+        content (str): The string content of the file to parse.
+        cache (Optional[LRUCache]): Cache of parsed declarations, keyed by the content hash.
+
+    Returns:
+        Optional[sqlx.Declaration]: The declaration, or None if the file is not a declaration.
+
+    Raises:
+        ValueError: If the config block is not valid or is missing required keys.
+    """
+    key: str = ''
+    if cache is not None:
+        key = 'declaration:' + hashlib.sha256(content.encode('utf-8')).hexdigest()
+        cached: Optional[str] = cache.get(key)
+        metrics.active().count('cache.declaration.' + ('miss' if cached is None else 'hit'))
+        if cached is not None:
+            config: Optional[Dict[str, Any]] = json.loads(cached)
+            if config is None:
+                return None
+            return sqlx.Declaration(
+                config.get('database'), config['schema'], config['name'], config['columns'], config
+            )
+    try:
+        declaration: Optional[sqlx.Declaration] = sqlx.parse_declaration(content)
+    except ValueError as e:
+        logging.error('Value error while parsing declaration: %s', e, exc_info=True)
+        raise
+    if cache is not None:
+        cache.put(key, json.dumps(declaration.config if declaration else None))
+    return declaration
+
+def _matches(path: str, patterns: Optional[Iterable[str]]) -> bool:
+    """Verifica se o caminho corresponde a algum dos padrões glob informados."""
+    return any(fnmatch.fnmatchcase(path, pattern) for pattern in patterns or ())
+
+@metrics.instrumented('dataform.list_directory')
+def _list_directory(workspace_name: str, path: str) -> List[dataform.DirectoryEntry]:
+    """Lista todas as entradas de um diretório, consumindo todas as páginas da resposta."""
+    entries: List[dataform.DirectoryEntry] = []
+    for p in request_directory(workspace_name, path):
+        entries.extend(p.directory_entries)
+    return entries
+
+class WorkspaceSnapshot:
+    """
+    Estado do workspace no início de uma execução, que identifica as listagens de
+    diretórios e os conteúdos de arquivos que podem ser reaproveitados do cache.
+
+    O conteúdo de um arquivo sem mudanças pendentes (uncommitted) é o do commit do
+    workspace, e fica no cache pela chave desse commit e do caminho: editar um arquivo
+    não invalida os demais. Arquivos com mudanças pendentes são sempre lidos do
+    Dataform. As listagens ficam pela chave do estado completo, que inclui os arquivos
+    adicionados e removidos.
+
+    As entradas lidas durante a execução só são gravadas no cache por `commit`, se o
+    estado do workspace não tiver mudado enquanto os arquivos eram lidos.
+    """
+
+    def __init__(
+        self,
+        workspace_name: str,
+        commit_key: str,
+        changes: FrozenSet[Tuple[str, str]],
+        cache: LRUCache,
+        ttl: float = 0.0
     ) -> None:
+        self.workspace_name: str = workspace_name
+        self.ttl: float = ttl
+        self.commit_key: str = commit_key
+        self.changes: FrozenSet[Tuple[str, str]] = changes
+        self.dirty: FrozenSet[str] = frozenset(path for path, _ in changes)
+        self.cache: LRUCache = cache
+        # Apenas arquivos adicionados e removidos mudam as listagens
+        self.listing_key: str = hashlib.sha256(json.dumps([
+            commit_key, sorted(change for change in changes if change[1] in ('ADDED', 'DELETED'))
+        ]).encode('utf-8')).hexdigest()
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+        self._pending_bytes: int = 0
+
+    def _get(self, kind: str, key: str) -> Optional[str]:
+        value: Optional[str] = self.cache.get(key)
+        metrics.active().count(f'cache.{kind}.' + ('miss' if value is None else 'hit'))
+        return value
+
+    def _stage(self, key: str, value: str) -> None:
+        """Guarda uma entrada até o `commit`, dentro do limite de tamanho do cache."""
+        with self._lock:
+            size: int = len(value)
+            if self._pending_bytes + size <= self.cache.max_bytes:
+                self._pending[key] = value
+                self._pending_bytes += size
+
+    def get_listing(self, path: str) -> Optional[List[dataform.DirectoryEntry]]:
+        """Retorna as entradas de um diretório no cache, ou None."""
+        value: Optional[str] = self._get('listing', f'listing:{self.listing_key}:{path}')
+        if value is None:
+            return None
+        return [
+            dataform.DirectoryEntry(file=entry) if is_file else dataform.DirectoryEntry(directory=entry)
+            for entry, is_file in json.loads(value)
+        ]
+
+    def stage_listing(self, path: str, entries: List[dataform.DirectoryEntry]) -> None:
+        self._stage(
+            f'listing:{self.listing_key}:{path}',
+            json.dumps([[e.directory, False] if e.directory else [e.file, True] for e in entries])
+        )
+
+    def get_file(self, path: str) -> Optional[str]:
+        """Retorna o conteúdo de um arquivo sem mudanças pendentes no cache, ou None."""
+        if path in self.dirty:
+            return None
+        return self._get('file', f'file:{self.commit_key}:{path}')
+
+    def stage_file(self, path: str, content: str) -> None:
+        if path not in self.dirty:
+            self._stage(f'file:{self.commit_key}:{path}', content)
+
+    def commit(self) -> int:
+        """
+        Grava no cache as entradas lidas na execução, se o estado do workspace continuar o mesmo.
+
+        Returns:
+            int: Number of entries written.
+        """
+        with self._lock:
+            pending: Dict[str, str] = self._pending
+            self._pending = {}
+            self._pending_bytes = 0
+        if not pending:
+            return 0
+        current: Optional[WorkspaceSnapshot] = workspace_snapshot(self.workspace_name, self.cache, self.ttl)
+        if current is None or (current.commit_key, current.changes) != (self.commit_key, self.changes):
+            logging.info('Dataform workspace changed during the run, discarding %d cache entries.', len(pending))
+            return 0
+        for key, value in pending.items():
+            self.cache.put(key, value)
+        return len(pending)
+
+
+@metrics.instrumented('dataform.workspace_state')
+def _workspace_state(workspace_name: str) -> Tuple[Optional[str], int, int, FrozenSet[Tuple[str, str]]]:
+    """
+    Consulta o commit mais recente do repositório, os commits à frente e atrás do
+    workspace e os arquivos com mudanças pendentes.
+
+    Returns:
+        Tuple[Optional[str], int, int, FrozenSet[Tuple[str, str]]]: The repository head
+            commit SHA (None when the repository history is not available, as in repositories
+            connected to a remote Git repository), the commits ahead, the commits behind and
+            the (path, state) pairs of the uncommitted changes.
+    """
+    client: dataform.DataformClient = clients.dataform_client()
+    ahead_behind: dataform.FetchGitAheadBehindResponse = client.fetch_git_ahead_behind(
+        dataform.FetchGitAheadBehindRequest(name=workspace_name)
+    )
+    statuses: dataform.FetchFileGitStatusesResponse = client.fetch_file_git_statuses(
+        dataform.FetchFileGitStatusesRequest(name=workspace_name)
+    )
+    changes: FrozenSet[Tuple[str, str]] = frozenset(
+        (c.path, dataform.FetchFileGitStatusesResponse.UncommittedFileChange.State(c.state).name)
+        for c in statuses.uncommitted_file_changes
+    )
+    head: Optional[str] = None
+    try:
+        history = client.fetch_repository_history(dataform.FetchRepositoryHistoryRequest(
+            name=workspace_name.split('/workspaces/')[0], page_size=1
+        ))
+        commits: List[dataform.CommitLogEntry] = list(next(iter(history.pages)).commits)
+        head = commits[0].commit_sha if commits else None
+    except exceptions.GoogleAPICallError as e:
+        logging.debug('Repository history is not available: %s', e)
+    return head, ahead_behind.commits_ahead, ahead_behind.commits_behind, changes
+
+def workspace_snapshot(
+        workspace_name: str,
+        cache: Optional[LRUCache],
+        ttl: float = 0.0
+    ) -> Optional[WorkspaceSnapshot]:
+    """
+    Identifica o estado atual de um workspace do Dataform para o cache de listagens e arquivos.
+
+    O commit do workspace não é exposto pela API: ele é identificado pelo commit mais
+    recente do repositório e pelo número de commits atrás dele. Quando o histórico do
+    repositório não está disponível ou o workspace tem commits que ainda não foram
+    enviados (push), o commit não pode ser identificado, e as entradas do cache valem
+    apenas por `ttl` segundos.
+
+    A chave `head~behind` só identifica o commit de forma única em um histórico linear:
+    com merge commits, dois commits diferentes do workspace podem estar à mesma distância
+    do mesmo head e compartilhar a chave. Em repositórios com merges no branch do
+    workspace, use `WORKSPACE_CACHE_MB=0`.
+
+    Args:
+        workspace_name (str): The full resource name of the Dataform workspace.
+        cache (Optional[LRUCache]): The cache. None disables the snapshot.
+        ttl (float): How long, in seconds, entries of an unidentified commit are reused.
+                     Zero disables the cache for those workspaces.
+
+    Returns:
+        Optional[WorkspaceSnapshot]: The snapshot, or None when the cache cannot be used.
     """
-    Percorre recursivamente os diretórios do Dataform para coletar todos os caminhos de arquivo.
+    if cache is None:
+        return None
+    try:
+        head, ahead, behind, changes = _workspace_state(workspace_name)
+    except Exception as e: #pylint: disable=W0718
+        logging.warning('Could not fetch the Dataform workspace Git state, skipping the cache: %s', e)
+        return None
+    if head is not None and ahead == 0:
+        commit_key: str = f'{head}~{behind}'
+    elif ttl > 0:
+        # Intervalos fixos de `ttl` segundos, para que a chave também valha entre processos (cache em disco)
+        commit_key = f'{head}+{ahead}~{behind}@{int(time.time() // ttl)}'
+    else:
+        logging.info('Dataform workspace commit cannot be identified, skipping the cache.')
+        return None
+    return WorkspaceSnapshot(workspace_name, f'{workspace_name}@{commit_key}', changes, cache, ttl)
+
+def get_files(
+        workspace_name: str,
+        path: str,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+        max_in_flight: int = 8,
+        snapshot: Optional[WorkspaceSnapshot] = None
+    ) -> Iterator[str]:
+    """
+    Percorre os diretórios do Dataform em largura (breadth-first), listando
+    diretórios irmãos de forma concorrente, e retorna os caminhos dos arquivos
+    conforme são encontrados.
 
     Args:
-        list_file (List[str]): A list to append the full file paths to.
-        pages (Iterator[dataform.QueryDirectoryContentsResponse]): An iterator over
-                                                                   directory contents responses.
-        workspace_name (str): The full resource name of the Dataform workspace,
-                              needed for recursive calls to request_directory.
-    """
-    for p in pages:
-        for e in p.directory_entries:
-            if e.directory:
-                logging.debug('Found directory: %s. Recursing...', e.directory)
-                # Pass workspace_name to request_directory for recursive calls
-                get_files(list_file, request_directory(workspace_name, e.directory), workspace_name)
-            else:
-                logging.debug('Found file: %s', e.file)
-                list_file.append(e.file)
-
-def read_file(workspace_name: str, file_path: str) -> str:
+        workspace_name (str): The full resource name of the Dataform workspace.
+        path (str): The directory where the walk starts.
+        include (Optional[Iterable[str]]): Glob patterns (fnmatch syntax, matched against
+                                           the full path) a file must match to be yielded.
+                                           None or empty yields every file.
+        exclude (Optional[Iterable[str]]): Glob patterns for files and directories to skip.
+                                           Excluded directories are never listed.
+        max_in_flight (int): Maximum number of concurrent directory listings.
+        snapshot (Optional[WorkspaceSnapshot]): The workspace snapshot. Cached listings are
+                                                used instead of listing the directories.
+
+    Yields:
+        str: The full path of each file found.
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+    max_in_flight = max(1, max_in_flight)
+    queue: Deque[str] = collections.deque([path])
+    pending: Dict[futures.Future, str] = {}
+
+    def list_directory(directory: str) -> List[dataform.DirectoryEntry]:
+        if snapshot is None:
+            return _list_directory(workspace_name, directory)
+        entries: Optional[List[dataform.DirectoryEntry]] = snapshot.get_listing(directory)
+        if entries is None:
+            entries = _list_directory(workspace_name, directory)
+            snapshot.stage_listing(directory, entries)
+        return entries
+
+    with futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        try:
+            while queue or pending:
+                while queue and len(pending) < max_in_flight:
+                    directory: str = queue.popleft()
+                    pending[executor.submit(list_directory, directory)] = directory
+
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    logging.debug('Listed directory: %s', pending.pop(future))
+                    for e in future.result():
+                        if e.directory:
+                            if _matches(e.directory, exclude) or _matches(e.directory + '/', exclude):
+                                logging.debug('Skipping excluded directory: %s', e.directory)
+                                continue
+                            logging.debug('Found directory: %s. Queueing...', e.directory)
+                            queue.append(e.directory)
+                        elif _matches(e.file, exclude) or (include and not _matches(e.file, include)):
+                            logging.debug('Skipping filtered file: %s', e.file)
+                        else:
+                            logging.debug('Found file: %s', e.file)
+                            yield e.file
+        finally:
+            for future in pending:
+                future.cancel()
+
+@metrics.instrumented('dataform.read_file', size=len)
+def _read_file_contents(request: dataform.ReadFileRequest, retry: Optional[retries.Retry]) -> bytes:
+    """Executa a leitura de um arquivo, retornando o conteúdo bruto."""
+    return clients.dataform_client().read_file(request, retry=retry).file_contents
+
+def read_file(
+        workspace_name: str,
+        file_path: str,
+        retry: Optional[retries.Retry] = DEFAULT_READ_RETRY
+    ) -> str:
     """
     Lê o conteúdo de um arquivo de um workspace do Dataform.
 
     Args:
         workspace_name (str): O nome completo do recurso do workspace.
         file_path (str): O caminho para o arquivo dentro do workspace.
+        retry (Optional[retries.Retry]): Retry policy with exponential backoff applied
+                                         to the request. None disables retries.
 
     Returns:
         str: O conteúdo do arquivo como uma string decodificada em UTF-8.
@@ -120,8 +415,119 @@ def read_file(workspace_name: str, file_path: str) -> str:
     logging.debug('Reading file: %s from workspace: %s', file_path, workspace_name)
     try:
         cmd = dataform.ReadFileRequest(workspace=workspace_name, path=file_path)
-        query_file = df_client.read_file(cmd)
-        return query_file.file_contents.decode('utf-8')
+        return _read_file_contents(cmd, retry).decode('utf-8')
     except Exception as e:
         logging.error('Error reading file %s from workspace %s: %s', file_path, workspace_name, e, exc_info=True)
         raise
+
+@metrics.instrumented('dataform.write_file')
+def write_file(workspace_name: str, file_path: str, content: str) -> None:
+    """
+    Grava um arquivo em um workspace do Dataform, criando-o ou substituindo seu conteúdo.
+
+    Args:
+        workspace_name (str): O nome completo do recurso do workspace.
+        file_path (str): O caminho para o arquivo dentro do workspace.
+        content (str): O conteúdo do arquivo.
+    """
+    logging.debug('Writing file: %s to workspace: %s', file_path, workspace_name)
+    try:
+        cmd = dataform.WriteFileRequest(workspace=workspace_name, path=file_path, contents=content.encode('utf-8'))
+        clients.dataform_client().write_file(cmd)
+    except Exception as e:
+        logging.error('Error writing file %s to workspace %s: %s', file_path, workspace_name, e, exc_info=True)
+        raise
+
+def file_exists(
+        workspace_name: str,
+        file_path: str,
+        retry: Optional[retries.Retry] = DEFAULT_READ_RETRY
+    ) -> bool:
+    """
+    Verifica se um arquivo existe em um workspace do Dataform, inclusive fora das
+    pastas percorridas por `get_files`.
+
+    Args:
+        workspace_name (str): O nome completo do recurso do workspace.
+        file_path (str): O caminho para o arquivo dentro do workspace.
+        retry (Optional[retries.Retry]): Retry policy applied to the request. None disables retries.
+
+    Returns:
+        bool: True se o arquivo existe.
+    """
+    try:
+        _read_file_contents(dataform.ReadFileRequest(workspace=workspace_name, path=file_path), retry)
+        return True
+    except exceptions.NotFound:
+        return False
+
+def _read_file_or_none(workspace_name: str, file_path: str, retry: Optional[retries.Retry]) -> Optional[str]:
+    """Lê um arquivo, retornando None se ele não existir no workspace."""
+    try:
+        return read_file(workspace_name, file_path, retry)
+    except exceptions.NotFound:
+        return None
+
+def read_files(
+        workspace_name: str,
+        file_paths: Iterable[str],
+        max_in_flight: int = 16,
+        retry: Optional[retries.Retry] = DEFAULT_READ_RETRY,
+        ignore_not_found: bool = False,
+        snapshot: Optional[WorkspaceSnapshot] = None
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Lê arquivos de um workspace do Dataform de forma concorrente, com um número
+    limitado de requisições em andamento, retornando cada conteúdo assim que a
+    leitura termina (fora da ordem de entrada).
+
+    Args:
+        workspace_name (str): O nome completo do recurso do workspace.
+        file_paths (Iterable[str]): The file paths to read. Consumed lazily, so a
+                                    generator may keep producing paths while reads run.
+        max_in_flight (int): Maximum number of concurrent read requests.
+        retry (Optional[retries.Retry]): Retry policy applied to each request.
+        ignore_not_found (bool): Yield None as the content of files that do not exist,
+                                 instead of raising.
+        snapshot (Optional[WorkspaceSnapshot]): The workspace snapshot. Cached contents are
+                                                yielded right away, without a read request.
+
+    Yields:
+        Tuple[str, Optional[str]]: Pairs of (file path, file content) in completion order.
+
+    Raises:
+        Exception: The first read error after retries are exhausted. Pending reads
+                   are cancelled.
+    """
+    max_in_flight = max(1, max_in_flight)
+    paths: Iterator[str] = iter(file_paths)
+    pending: Dict[futures.Future, str] = {}
+
+    with futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        def fill() -> Iterator[Tuple[str, Optional[str]]]:
+            """Completa as leituras em andamento, gerando de imediato os conteúdos encontrados no cache."""
+            while len(pending) < max_in_flight:
+                path: Optional[str] = next(paths, None)
+                if path is None:
+                    return
+                content: Optional[str] = snapshot.get_file(path) if snapshot else None
+                if content is not None:
+                    yield path, content
+                    continue
+                pending[executor.submit(_read_file_or_none if ignore_not_found else read_file,
+                                        workspace_name, path, retry)] = path
+
+        try:
+            yield from fill()
+            while pending:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    path: str = pending.pop(future)
+                    content: Optional[str] = future.result()
+                    if snapshot is not None and content is not None:
+                        snapshot.stage_file(path, content)
+                    yield path, content
+                    yield from fill()
+        finally:
+            for future in pending:
+                future.cancel()
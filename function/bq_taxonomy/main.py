@@ -1,21 +1,118 @@
 '''Módulo principal'''
 
+from . import startup # Primeiro import, para medir o tempo de importação dos demais
+
+import base64
+import binascii
 import http
+import json
 import functions_framework
 import logging
+import threading
 
-from flask import Response, Request
-from google.cloud import logging as cloud_logging
+from typing import Any, Dict, List, Optional
 
-from .process import validate_and_apply
+from flask import Response, Request
 
+from . import bigquery as bq
+from . import clients
+from .config import MODES, get_settings
+from .process import apply_plan, export_declarations, validate_and_apply
 
-log_client = cloud_logging.Client()
-log_client.setup_logging()
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+_initialize_lock: threading.Lock = threading.Lock()
+_initialized: bool = False
+
+startup.mark('imports')
+
+def _initialize() -> bool:
+    """
+    Executa a inicialização adiada para a primeira requisição: configura o handler
+    do Cloud Logging, que exige a criação de um cliente.
+
+    Returns:
+        bool: True only for the first request handled by the instance (cold start).
+    """
+    global _initialized #pylint: disable=W0603
+    if _initialized:
+        return False
+    with _initialize_lock:
+        if _initialized:
+            return False
+        startup.mark('first_request')
+        with startup.timed('logging_setup'):
+            try:
+                clients.logging_client().setup_logging()
+            except Exception as e: #pylint: disable=W0718
+                logging.warning('Could not set up Cloud Logging, using default logging: %s', e)
+            logger.setLevel(logging.INFO)
+        _initialized = True
+        return True
+
+def _startup_report() -> Dict[str, Any]:
+    """Registra no log e retorna o relatório de tempos do cold start."""
+    startup.mark('first_response')
+    report: Dict[str, Any] = startup.report()
+    logging.info('Startup timing report: %s', json.dumps(report))
+    return report
+
+def _parse_targets(request: Request) -> Optional[Dict[str, List[str]]]:
+    """
+    Lê os alvos de uma sincronização direcionada do corpo JSON da requisição, que pode
+    vir diretamente ou dentro de uma mensagem push do Pub/Sub ({'message': {'data': base64}}).
+    Corpos sem as chaves 'files' ou 'tables' (como os enviados pelo Cloud Scheduler ou por
+    outros gatilhos) mantêm a sincronização de todo o workspace.
+
+    Returns:
+        Optional[Dict[str, List[str]]]: {'files': [...], 'tables': [...]}, or None for a sync
+            of the whole workspace.
+
+    Raises:
+        ValueError: If the 'files' or 'tables' keys are not lists of strings.
+    """
+    body: Any = request.get_json(silent=True)
+    if isinstance(body, dict) and isinstance(body.get('message'), dict):
+        try:
+            body = json.loads(base64.b64decode(body['message'].get('data', '')).decode('utf-8'))
+        except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+            logging.info('Pub/Sub message data is not a JSON target list, running a full sync.')
+            return None
+    if not isinstance(body, dict) or not ({'files', 'tables'} & body.keys()):
+        return None
+    targets: Dict[str, List[str]] = {}
+    for key in ('files', 'tables'):
+        values: Any = body.get(key, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) and v for v in values):
+            raise ValueError(f'"{key}" must be a list of non-empty strings.')
+        targets[key] = values
+    return targets
+
+def _parse_datasets(request: Request) -> Optional[List[str]]:
+    """
+    Lê os datasets do modo export, do parâmetro de query `datasets` (separados por
+    vírgula) ou da chave 'datasets' do corpo JSON.
+
+    Raises:
+        ValueError: If the body 'datasets' key is not a list of strings, or a dataset ID
+            is not a valid BigQuery identifier.
+    """
+    datasets: List[str]
+    if request.args.get('datasets'):
+        datasets = [d.strip() for d in request.args['datasets'].split(',') if d.strip()]
+    else:
+        body: Any = request.get_json(silent=True)
+        if not isinstance(body, dict) or 'datasets' not in body:
+            return None
+        if not isinstance(body['datasets'], list) or not all(isinstance(d, str) and d for d in body['datasets']):
+            raise ValueError('"datasets" must be a list of non-empty strings.')
+        datasets = body['datasets']
+    for dataset_id in datasets:
+        bq.parse_dataset_id(dataset_id, get_settings().project_id)
+    return datasets
+
 @functions_framework.http
 def bq_taxonomy(request:Request) -> Response:
     """
@@ -23,18 +120,74 @@ def bq_taxonomy(request:Request) -> Response:
     de declaração do Dataform. A função é acionada por HTTP e lê sua
     configuração a partir de variáveis de ambiente.
 
+    O modo de execução vem do parâmetro de query `mode` ou da variável `MODE`:
+    - `sync` (padrão): compara e aplica as mudanças.
+    - `plan`: apenas compara e retorna o plano de mudanças em JSON, sem escritas.
+    - `apply`: aplica o plano enviado no corpo JSON da requisição, conferido contra as
+      declarações do workspace. Desabilitado (403) a menos que `ALLOW_APPLY=true`.
+    - `export`: gera declarações no workspace a partir das policy tags atuais do BigQuery,
+      para os datasets do parâmetro `datasets` (ou `EXPORT_DATASETS`), e retorna o relatório
+      de divergências. Com `dry_run=true`, nenhum arquivo é gravado. Desabilitado (403) a menos
+      que `ALLOW_EXPORT=true`; IDs de dataset inválidos retornam 400.
+
+    Nos modos `sync` e `plan`, um corpo JSON `{"files": [...], "tables": [...]}` restringe
+    a execução aos arquivos e tabelas indicados, sem percorrer o workspace. As tabelas são
+    resolvidas para seus arquivos pelo estado salvo, e só seguem esse caminho rápido com
+    `STATE_URI` configurado; sem ele (o padrão), ou para tabelas fora do estado, todos os
+    arquivos de `BASE_FOLDER` são lidos para encontrá-las. O corpo também pode ser uma
+    mensagem push do Pub/Sub com esse JSON no campo `data`.
+
     Args:
-        request (flask.Request): O objeto de requisição HTTP (não utiliza parâmetros).
+        request (flask.Request): O objeto de requisição HTTP. O parâmetro de query
+            `full_sync=true` força a reconciliação completa de todas as declarações.
 
     Returns:
-        O objeto Response, com o HTTTP Code e uma mensagem adicional.
+        O objeto Response, com o HTTTP Code e o resumo da execução em JSON. O código é
+        500 se alguma tabela falhar, mas as demais tabelas são processadas normalmente.
+        O resumo inclui as métricas da execução (tempos por etapa e chamadas às APIs)
+        na chave 'metrics'.
+        Na primeira requisição da instância, o resumo inclui o relatório de tempos do
+        cold start na chave 'startup'.
         <https://flask.palletsprojects.com/en/1.1.x/api/#flask.make_response>.
     """
+    cold_start: bool = _initialize()
     try:
-        logging.info('Starting Dataform to BigQuery policy tag synchronization process.')
-        validate_and_apply()
+        mode: str = request.args.get('mode', get_settings().mode)
+        if mode not in MODES:
+            return Response(f'Invalid mode "{mode}". Expected one of: {", ".join(MODES)}',
+                            status=http.HTTPStatus.BAD_REQUEST)
+        logging.info('Starting Dataform to BigQuery policy tag synchronization process (mode: %s).', mode)
+        if mode == 'apply':
+            if not get_settings().allow_apply:
+                return Response('Apply mode is disabled. Set ALLOW_APPLY=true to enable it.',
+                                status=http.HTTPStatus.FORBIDDEN)
+            try:
+                summary = apply_plan(request.get_json(silent=True))
+            except ValueError as e:
+                return Response(str(e), status=http.HTTPStatus.BAD_REQUEST)
+        elif mode == 'export':
+            if not get_settings().allow_export:
+                return Response('Export mode is disabled. Set ALLOW_EXPORT=true to enable it.',
+                                status=http.HTTPStatus.FORBIDDEN)
+            try:
+                datasets: Optional[List[str]] = _parse_datasets(request)
+            except ValueError as e:
+                return Response(str(e), status=http.HTTPStatus.BAD_REQUEST)
+            dry_run: bool = request.args.get('dry_run', 'false').lower() == 'true'
+            summary = export_declarations(datasets, dry_run=dry_run)
+        else:
+            try:
+                targets: Optional[Dict[str, List[str]]] = _parse_targets(request)
+            except ValueError as e:
+                return Response(str(e), status=http.HTTPStatus.BAD_REQUEST)
+            full_sync: bool = request.args.get('full_sync', 'false').lower() == 'true'
+            summary = validate_and_apply(full_sync=full_sync, dry_run=mode == 'plan', targets=targets)
         logging.info('BigQuery policy tag synchronization process completed.')
-        return Response('OK', status=http.HTTPStatus.OK)
+        if cold_start:
+            summary['startup'] = _startup_report()
+        failed: bool = bool(summary['errors']) if mode == 'export' else bool(summary['tables']['failed'])
+        status: http.HTTPStatus = http.HTTPStatus.INTERNAL_SERVER_ERROR if failed else http.HTTPStatus.OK
+        return Response(json.dumps(summary), status=status, mimetype='application/json')
     except Exception as e: #pylint: disable=W0718
         logging.error('Error during execution: %s', str(e), exc_info=True)
         return Response('ERROR', status=http.HTTPStatus.INTERNAL_SERVER_ERROR)
@@ -0,0 +1,241 @@
+'''Módulo de instrumentação das execuções: tempos por etapa, contadores e latência das chamadas às APIs.
+
+As métricas são coletadas em um `Metrics` ativo por execução, iniciado por `begin`.
+Como as chamadas às APIs acontecem em threads dos pools de execução, o coletor ativo
+é global ao processo: execuções simultâneas na mesma instância compartilham as contagens.
+'''
+
+import bisect
+import contextlib
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import threading
+import time
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+
+# Limites superiores (em segundos) dos intervalos do histograma de latência
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+T = TypeVar('T')
+
+
+class _OperationStats:
+    """Estatísticas acumuladas de uma operação."""
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.errors: int = 0
+        self.retries: int = 0
+        self.bytes: int = 0
+        self.total_seconds: float = 0.0
+        self.max_seconds: float = 0.0
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float, error: bool, size: int) -> None:
+        self.calls += 1
+        self.errors += error
+        self.bytes += size
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def report(self) -> Dict[str, Any]:
+        bounds: List[str] = [str(b) for b in LATENCY_BUCKETS] + ['+Inf']
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'total_seconds': round(self.total_seconds, 6),
+            'mean_seconds': round(self.total_seconds / self.calls, 6) if self.calls else 0.0,
+            'max_seconds': round(self.max_seconds, 6),
+            # Histograma cumulativo: quantidade de chamadas com latência <= limite
+            'histogram': dict(zip(bounds, _cumulative(self.buckets)))
+        }
+
+
+def _cumulative(values: List[int]) -> List[int]:
+    total: int = 0
+    result: List[int] = []
+    for value in values:
+        total += value
+        result.append(total)
+    return result
+
+
+class Metrics:
+    """Coletor das métricas de uma execução, compartilhado entre threads."""
+
+    def __init__(self) -> None:
+        self.started_at: float = time.perf_counter()
+        self._lock: threading.Lock = threading.Lock()
+        self._operations: Dict[str, _OperationStats] = {}
+        self._phases: Dict[str, float] = {}
+        self._milestones: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+
+    def _stats(self, operation: str) -> _OperationStats:
+        stats: Optional[_OperationStats] = self._operations.get(operation)
+        if stats is None:
+            stats = self._operations.setdefault(operation, _OperationStats())
+        return stats
+
+    def observe(self, operation: str, seconds: float, error: bool = False, size: int = 0) -> None:
+        """
+        Registra uma chamada de uma operação.
+
+        Args:
+            operation (str): The operation name, e.g. 'dataform.read_file'.
+            seconds (float): The call latency.
+            error (bool): Whether the call raised an exception.
+            size (int): Bytes read by the call.
+        """
+        with self._lock:
+            self._stats(operation).observe(seconds, error, size)
+
+    def retry(self, operation: str) -> None:
+        """Registra uma nova tentativa de uma operação."""
+        with self._lock:
+            self._stats(operation).retries += 1
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Incrementa um contador da execução.
+
+        Args:
+            name (str): The counter name, e.g. 'cache.file.hit'.
+            value (int): The increment.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Mede o tempo de uma etapa da execução. Etapas repetidas são somadas.
+
+        Args:
+            name (str): The phase name, e.g. 'collect'.
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases[name] = self._phases.get(name, 0.0) + time.perf_counter() - start
+
+    def mark(self, name: str) -> None:
+        """
+        Registra o tempo decorrido até um marco da execução. Apenas a primeira
+        ocorrência de cada marco é registrada.
+
+        Args:
+            name (str): The milestone name, e.g. 'first_table_done'.
+        """
+        if name in self._milestones:
+            return
+        with self._lock:
+            self._milestones.setdefault(name, time.perf_counter() - self.started_at)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Retorna o resumo das métricas coletadas.
+
+        Returns:
+            Dict[str, Any]: A report with the following keys:
+                - 'wall_seconds': Time since the collection started.
+                - 'phases': Phase name -> seconds. Phases may overlap.
+                - 'milestones': Milestone name -> seconds since the collection started.
+                - 'counters': Counter name -> value.
+                - 'operations': Operation name -> calls, errors, retries, bytes, latency
+                  totals and a cumulative latency histogram.
+        """
+        with self._lock:
+            return {
+                'wall_seconds': round(time.perf_counter() - self.started_at, 6),
+                'phases': {name: round(seconds, 6) for name, seconds in self._phases.items()},
+                'milestones': {name: round(seconds, 6) for name, seconds in self._milestones.items()},
+                'counters': dict(sorted(self._counters.items())),
+                'operations': {name: stats.report() for name, stats in sorted(self._operations.items())}
+            }
+
+
+_active: Metrics = Metrics()
+
+def begin() -> Metrics:
+    """
+    Inicia a coleta de métricas de uma nova execução.
+
+    Returns:
+        Metrics: The new active collector.
+    """
+    global _active #pylint: disable=W0603
+    _active = Metrics()
+    return _active
+
+def active() -> Metrics:
+    """Retorna o coletor da execução atual."""
+    return _active
+
+def instrumented(
+    operation: str,
+    size: Optional[Callable[[Any], int]] = None
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator que registra a latência, as chamadas e os erros de uma função no coletor ativo.
+
+    Args:
+        operation (str): The operation name used in the report.
+        size (Optional[Callable[[Any], int]]): Computes the bytes read from the return value.
+    """
+    def decorator(function: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            start: float = time.perf_counter()
+            try:
+                result: T = function(*args, **kwargs)
+            except Exception:
+                _active.observe(operation, time.perf_counter() - start, error=True)
+                raise
+            _active.observe(operation, time.perf_counter() - start, size=size(result) if size else 0)
+            return result
+        return wrapper
+    return decorator
+
+def retry_callback(operation: str) -> Callable[[Exception], None]:
+    """
+    Cria um callback `on_error` para políticas de retry do google-api-core, que
+    contabiliza cada nova tentativa da operação.
+
+    Args:
+        operation (str): The operation name used in the report.
+    """
+    def on_error(_: Exception) -> None:
+        _active.retry(operation)
+    return on_error
+
+@contextlib.contextmanager
+def profiled(path: str = '', limit: int = 30) -> Iterator[None]:
+    """
+    Executa o bloco com o cProfile, registrando no log as funções com maior tempo acumulado.
+
+    Args:
+        path (str): Where to dump the raw profile (pstats format). Empty skips the dump.
+        limit (int): Number of functions listed in the log.
+    """
+    profiler: cProfile.Profile = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        output: io.StringIO = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        logging.info('Profile of the run:\n%s', output.getvalue())
+        if path:
+            profiler.dump_stats(path)
@@ -0,0 +1,114 @@
+'''Módulo para o plano de mudanças de policy tags (modos plan e apply).'''
+
+from typing import Any, Dict, List, Optional
+
+
+PLAN_VERSION: int = 1
+
+def changes_to_plan(tag_changes: Dict[str, Dict[str, List[Dict[str, str]]]]) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Converte as mudanças de uma tabela para o formato do plano.
+
+    Args:
+        tag_changes (Dict[str, Dict[str, List[Dict[str, str]]]]): The changes per column, in the
+            format returned by `bigquery.compare_policy_tag_lists`.
+
+    Returns:
+        Dict[str, Dict[str, List[str]]]: Column name -> {'add': [...], 'remove': [...]}.
+    """
+    return {
+        column_name: {
+            action: [c['tag_name'] for c in diffs['changes'] if c['action'] == action]
+            for action in ('add', 'remove')
+        }
+        for column_name, diffs in tag_changes.items()
+    }
+
+def plan_to_changes(columns: Dict[str, Dict[str, List[str]]]) -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+    """
+    Converte as colunas de uma tabela do plano para o formato aceito por
+    `bigquery.sync_bigquery_column_policy_tags`.
+
+    Args:
+        columns (Dict[str, Dict[str, List[str]]]): Column name -> {'add': [...], 'remove': [...]}.
+
+    Returns:
+        Dict[str, Dict[str, List[Dict[str, str]]]]: The changes per column.
+    """
+    return {
+        column_name: {
+            'changes': [
+                {'action': action, 'tag_name': tag_name}
+                for action in ('add', 'remove')
+                for tag_name in column_plan.get(action, [])
+            ]
+        }
+        for column_name, column_plan in columns.items()
+    }
+
+def build_plan(results: List[Dict[str, Any]], files: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Monta o plano a partir dos resultados das tabelas com mudanças pendentes.
+
+    Args:
+        results (List[Dict[str, Any]]): The table results of a dry run.
+        files (Dict[str, List[str]]): Full table ID -> all declaration files of the table,
+            which are the only files read back by the apply mode.
+
+    Returns:
+        Dict[str, Any]: The plan, in the format:
+            {
+                "version": 1,
+                "tables": {
+                    "project.dataset.table": {
+                        "file": "definitions/...sqlx",
+                        "files": ["definitions/...sqlx", ...],
+                        "columns": {"column_a": {"add": [...], "remove": [...]}}
+                    }
+                }
+            }
+    """
+    return {
+        'version': PLAN_VERSION,
+        'tables': {
+            r['full_table_id']: {
+                'file': r['full_file_name'],
+                'files': files.get(r['full_table_id'], [r['full_file_name']]),
+                'columns': r['changes']
+            }
+            for r in sorted((r for r in results if r['changes']), key=lambda r: r['full_table_id'])
+        }
+    }
+
+def load_plan(document: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Valida um plano recebido, aceitando tanto o plano puro quanto o resumo de uma
+    execução em modo plan (com o plano na chave 'plan').
+
+    Args:
+        document (Optional[Dict[str, Any]]): The received JSON document.
+
+    Returns:
+        Dict[str, Any]: The validated plan.
+
+    Raises:
+        ValueError: If the document is not a valid plan.
+    """
+    if isinstance(document, dict) and 'plan' in document:
+        document = document['plan']
+    if not isinstance(document, dict) or document.get('version') != PLAN_VERSION:
+        raise ValueError(f'Expected a plan with version {PLAN_VERSION}.')
+    if not isinstance(document.get('tables'), dict):
+        raise ValueError("The plan 'tables' key is not a dictionary.")
+    for full_table_id, table_plan in document['tables'].items():
+        if not isinstance(table_plan, dict) or not isinstance(table_plan.get('columns'), dict):
+            raise ValueError(f'Invalid plan entry for table {full_table_id}.')
+        files: Any = table_plan.get('files', [])
+        if not isinstance(files, list) or not all(isinstance(f, str) and f for f in files):
+            raise ValueError(f'Invalid plan files for table {full_table_id}.')
+        for column_name, column_plan in table_plan['columns'].items():
+            if not isinstance(column_plan, dict) or not all(
+                isinstance(column_plan.get(action, []), list) for action in ('add', 'remove')
+            ):
+                raise ValueError(f'Invalid plan entry for column {column_name} of table {full_table_id}.')
+    return document
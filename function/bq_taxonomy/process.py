@@ -1,28 +1,83 @@
 '''Módulo principal para o processo de validação e aplicação das tags'''
 
-import os
-import re
+import collections
+import contextlib
+import functools
+import itertools
+import json
 import logging
 
 from collections import namedtuple # type: ignore
-from typing import List, Dict, Any
+from concurrent import futures
+from typing import Callable, Deque, Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple, TypeVar
 
+from google.cloud import bigquery
+
+from . import cache
 from . import dataform as df
 from . import bigquery as bq
-
-PROJECT_ID: str = os.environ['PROJECT_ID']
-REGION_ID: str = os.environ.get('REGION_ID', 'us-central1')
-REPOSITORY_ID: str = os.environ['REPOSITORY_ID']
-WORKSPACE_ID: str = os.environ['WORKSPACE_ID']
-BASE_FOLDER: str = os.environ['BASE_FOLDER']
+from . import metrics
+from . import plan as pl
+from . import sqlx
+from . import state as st
+from . import taxonomy as tx
+from .config import Settings, get_settings
+from .ratelimit import KeyedSemaphore, RateLimiter
+from .sqlx import Declaration
 
 File = namedtuple('File', ['full_file_name', 'full_table_id', 'definition'])
+TableResult = namedtuple('TableResult', ['full_table_id', 'full_file_name', 'status', 'error', 'changes'])
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class PolicyTagConflictError(ValueError):
+    """Declarações da mesma tabela com policy tags diferentes para a mesma coluna."""
+
+
+class PlanRejectedError(ValueError):
+    """Plano de uma tabela que não corresponde às declarações do workspace."""
+
+
+UNCHANGED: str = 'unchanged'
+PLANNED: str = 'planned'
+UPDATED: str = 'updated'
+FAILED: str = 'failed'
+
+def _measured(function: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Decorator que coleta as métricas de uma execução, opcionalmente sob o cProfile
+    (`PROFILE`), e as adiciona ao resumo na chave 'metrics' e a um único log estruturado.
+    """
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+        settings: Settings = get_settings()
+        run: metrics.Metrics = metrics.begin()
+        with metrics.profiled(settings.profile_path) if settings.profile else contextlib.nullcontext():
+            summary: Dict[str, Any] = function(*args, **kwargs)
+        summary['metrics'] = run.report()
+        logging.info(
+            'Run metrics: %s', json.dumps(summary['metrics']),
+            extra={'json_fields': {'run_metrics': summary['metrics']}}
+        )
+        return summary
+    return wrapper
 
-def validate_and_apply() -> None:
+@_measured
+def validate_and_apply(
+    full_sync: bool = False,
+    dry_run: bool = False,
+    targets: Optional[Dict[str, List[str]]] = None
+) -> Dict[str, Any]:
     """
     Orquestra o processo de ponta a ponta para sincronizar as policy tags
     dos arquivos de declaração do Dataform com as tabelas do BigQuery.
 
+    Quando `STATE_URI` está configurado, a sincronização é incremental: arquivos cujo
+    hash de conteúdo não mudou desde a última execução bem-sucedida são ignorados.
+    Alterações feitas diretamente no BigQuery só são corrigidas em uma reconciliação
+    completa (`full_sync` ou `FULL_SYNC`).
+
     O processo envolve:
     1. Encontrar todos os arquivos dentro do `BASE_FOLDER` especificado no workspace do Dataform.
     2. Filtrar os arquivos do tipo 'declaration'.
@@ -32,49 +87,925 @@ def validate_and_apply() -> None:
     5. Comparar o estado desejado (do Dataform) com o estado atual (do BigQuery).
     6. Aplicar quaisquer adições ou remoções de policy tags necessárias ao schema
        da tabela do BigQuery.
+
+    Com `VALIDATE_POLICY_TAGS`, todas as policy tags desejadas são validadas contra as
+    taxonomias do Data Catalog antes de qualquer escrita; declarações com tags
+    desconhecidas são rejeitadas, e nomes de exibição são resolvidos para nomes de recurso.
+
+    A leitura é um pipeline em streaming, com o trabalho em andamento limitado em cada
+    etapa. As declarações da mesma tabela são unidas antes da comparação, então cada
+    tabela é lida e atualizada no máximo uma vez; policy tags diferentes para a mesma
+    coluna em declarações diferentes são um conflito, e a tabela não é alterada.
+    Com `BULK_SNAPSHOT`, o snapshot é lido em lotes.
+
+    As tabelas são processadas em paralelo (`TABLE_CONCURRENCY`), intercalando os datasets
+    e com no máximo `DATASET_CONCURRENCY` tabelas do mesmo dataset ao mesmo tempo, com taxa
+    limitada por `TABLE_RATE_LIMIT`. A falha de uma tabela não interrompe as demais.
+
+    Em modo dry run (plan), nenhuma tabela é alterada e o estado não é salvo; o resumo
+    inclui o plano de mudanças na chave 'plan', que pode ser aplicado com `apply_plan`.
+
+    Args:
+        full_sync (bool): Reprocess every declaration, ignoring the stored state.
+        dry_run (bool): Only compute the changes and return them as a plan.
+        targets (Optional[Dict[str, List[str]]]): Restrict the run to these targets, skipping
+            the directory walk: {'files': [Dataform file paths], 'tables': [BigQuery table IDs]}.
+            Tables are resolved to their declaration files through the stored state.
+
+    Returns:
+        Dict[str, Any]: The run summary, with the number of files read, the count of
+            tables per status, the result of each table, the run metrics (see `metrics.Metrics.report`)
+            and, in dry run, the plan. Targeted runs also report the missing files and unresolved
+            tables under 'targets'.
+    """
+    settings: Settings = get_settings()
+    run: metrics.Metrics = metrics.active()
+    store: Optional[st.StateStore] = st.get_state_store(settings.state_uri)
+    with run.phase('state_load'):
+        stored_state: Dict[str, Any] = store.load() if store else st.empty_state()
+    previous_state: Dict[str, Any] = stored_state
+    if full_sync or settings.full_sync or previous_state['project'] != settings.project_id:
+        logging.info('Running a full reconciliation of all declarations.')
+        previous_state = st.empty_state()
+    new_state: Dict[str, Any] = st.empty_state()
+    if targets is not None and stored_state['project'] == settings.project_id:
+        # Em uma sincronização direcionada, o estado dos demais arquivos é mantido
+        new_state['files'].update(stored_state['files'])
+        new_state['tables'].update(stored_state['tables'])
+    new_state['project'] = settings.project_id
+
+    workspace: str = df.workspace_path(
+        settings.project_id, settings.region_id, settings.repository_id, settings.workspace_id
+    )
+    summary: Dict[str, Any] = _new_summary(0)
+    summary['files_read'] = 0
+    with run.phase('snapshot'):
+        snapshot: Optional[df.WorkspaceSnapshot] = _workspace_snapshot(workspace)
+
+    files: Iterable[str]
+    # Conteúdo dos arquivos já lidos ao procurar as tabelas alvo no workspace
+    contents: Dict[str, str] = {}
+    if targets is None:
+        logging.info('Collecting Dataform files from "%s" directory.', settings.base_folder)
+        files = df.get_files(
+            workspace, settings.base_folder, include=settings.include_globs,
+            exclude=settings.exclude_globs, max_in_flight=settings.list_concurrency, snapshot=snapshot
+        )
+    else:
+        files, unresolved_tables = resolve_targets(targets, stored_state, settings.project_id)
+        if unresolved_tables:
+            # Tabelas fora do estado salvo (ou sem `STATE_URI`) são procuradas no workspace
+            logging.info('Scanning the Dataform workspace for %d target tables.', len(unresolved_tables))
+            with run.phase('resolve'):
+                found: Dict[str, Dict[str, str]] = _find_declaration_files(
+                    workspace, (normalize_table_id(t, settings.project_id) for t in unresolved_tables), snapshot
+                )
+            for paths in found.values():
+                contents.update(paths)
+            files = list(dict.fromkeys(files + list(contents)))
+            unresolved_tables = [
+                t for t in unresolved_tables if normalize_table_id(t, settings.project_id) not in found
+            ]
+            for table_id in unresolved_tables:
+                logging.warning('Table %s has no declaration in the Dataform workspace.', table_id)
+        summary['targets'] = {'missing_files': [], 'unresolved_tables': unresolved_tables}
+        logging.info(
+            'Targeted sync of %d files (%d tables could not be resolved).',
+            len(files), len(unresolved_tables)
+        )
+
+    # Leitura em streaming: listagem -> leitura -> filtro/parse -> validação, com o trabalho em
+    # andamento limitado em cada etapa. As declarações são reduzidas às policy tags desejadas e
+    # agrupadas por tabela, para que cada tabela seja comparada e atualizada uma única vez.
+    invalid: Dict[str, str] = {}
+    declarations: Iterator[File] = _read_declarations(
+        workspace, files, previous_state, stored_state, new_state, summary, invalid,
+        targeted=targets is not None, snapshot=snapshot, contents=contents
+    )
+    rejected: Dict[str, List[str]] = {}
+    if settings.validate_policy_tags:
+        declarations = _validate_policy_tags(declarations, rejected)
+    with run.phase('collect'):
+        tables: Dict[str, Tuple[File, List[str]]] = _coalesce(declarations, summary, new_state, rejected)
+    # Declarações que não puderam ser analisadas falham sozinhas, sem interromper a execução
+    for f, error in sorted(invalid.items()):
+        summary['tables']['total'] += 1
+        _add_result(summary, TableResult(None, f, FAILED, error, None))
+    if snapshot is not None:
+        with run.phase('snapshot'):
+            snapshot.commit()
+
+    # Com o snapshot em lote, todas as tabelas já são conhecidas: uma única consulta por dataset
+    current_configs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    if settings.bulk_snapshot and tables:
+        with run.phase('snapshot'):
+            current_configs = bq.get_bigquery_tables_config(tables)
+    # As tabelas são intercaladas entre os datasets e limitadas por dataset (`DATASET_CONCURRENCY`)
+    scheduled: Iterator[File] = _schedule_by_dataset(
+        (t for t, _ in tables.values()), lambda t: t.full_table_id
+    )
+    table_configs: Iterator[Tuple[File, Optional[Dict[str, Dict[str, Any]]]]] = (
+        (t, current_configs.get(t.full_table_id)) for t in scheduled
+    )
+    limiter: RateLimiter = RateLimiter(settings.table_rate_limit)
+    dataset_slots: KeyedSemaphore = KeyedSemaphore(settings.dataset_concurrency)
+
+    def process_table(item: Tuple[File, Optional[Dict[str, Dict[str, Any]]]]) -> TableResult:
+        with dataset_slots.hold(_dataset_of(item[0].full_table_id)):
+            return sync_table(item[0], item[1], limiter, dry_run)
+
+    declaration_files: Dict[str, List[str]] = {}
+    with run.phase('sync'):
+        for (t, _), result in _run_tables(process_table, table_configs):
+            run.mark('first_table_done')
+            _add_result(summary, result)
+            table_files: List[str] = tables.pop(t.full_table_id)[1]
+            declaration_files[t.full_table_id] = table_files
+            if result.status == FAILED:
+                # Os arquivos ficam fora do estado para serem reprocessados na próxima execução
+                for f in table_files:
+                    new_state['files'].pop(f, None)
+                continue
+            # Registra o último estado aplicado da tabela
+            new_state['tables'][t.full_table_id] = {
+                'file': t.full_file_name,
+                'files': table_files,
+                'columns': {
+                    column_name: column_def['bigqueryPolicyTags']
+                    for column_name, column_def in t.definition['columns'].items()
+                    if 'bigqueryPolicyTags' in column_def
+                }
+            }
+
+    logging.info('Read %d files from Dataform workspace.', summary['files_read'])
+    _log_summary(summary)
+    if dry_run:
+        summary['plan'] = pl.build_plan(summary['results'], declaration_files)
+    elif store:
+        with run.phase('state_save'):
+            store.save(new_state)
+    return summary
+
+def _declared_tags(
+    workspace: str,
+    summary: Dict[str, Any],
+    files: Optional[List[str]] = None
+) -> Tuple[Dict[str, Dict[str, List[str]]], Set[str], Dict[str, List[str]]]:
     """
-    workspace: str = df.df_client.workspace_path(PROJECT_ID, REGION_ID, REPOSITORY_ID, WORKSPACE_ID)
+    Lê as declarações do workspace (etapa 'collect') e retorna as policy tags declaradas
+    por tabela. Com `VALIDATE_POLICY_TAGS`, as tags são resolvidas para os nomes de
+    recurso por `_validate_policy_tags`.
 
-    files: List[str] = []
-    logging.info('Collecting Dataform files from "%s" directory.', BASE_FOLDER)
-    # Pass workspace to get_files for recursive calls
-    df.get_files(files, df.request_directory(workspace, BASE_FOLDER), workspace)
-    logging.info('Found %d files in Dataform workspace.', len(files))
+    Args:
+        workspace (str): The Dataform workspace resource name.
+        summary (Dict[str, Any]): The run summary, where 'files_read' is counted. When `files`
+            is given, missing files are added to its 'targets' key.
+        files (Optional[List[str]]): Read only these files, without walking the workspace.
+            Defaults to every file of `BASE_FOLDER`.
 
-    declaration: str = r'type:\s\"declaration\"'
-    usable_files: List[File] = []
-    logging.info('Filtering for Dataform declaration files and extracting table information.')
+    Returns:
+        Tuple[Dict[str, Dict[str, List[str]]], Set[str], Dict[str, List[str]]]: Full table ID ->
+            column -> declared policy tags, the paths of every file read and the rejections:
+            file path -> error for the declarations that could not be parsed and, with validation
+            on, full table ID -> errors for the tables whose declarations have unknown tags.
+    """
+    settings: Settings = get_settings()
+    declared: Dict[str, Dict[str, List[str]]] = {}
+    rejected: Dict[str, List[str]] = {}
+    workspace_state: Dict[str, Any] = st.empty_state()
+    with metrics.active().phase('collect'):
+        snapshot: Optional[df.WorkspaceSnapshot] = _workspace_snapshot(workspace)
+        paths: Iterable[str] = files if files is not None else df.get_files(
+            workspace, settings.base_folder, include=settings.include_globs,
+            exclude=settings.exclude_globs, max_in_flight=settings.list_concurrency, snapshot=snapshot
+        )
+        invalid: Dict[str, str] = {}
+        declarations: Iterator[File] = _read_declarations(
+            workspace, paths, st.empty_state(), st.empty_state(), workspace_state, summary, invalid,
+            targeted=files is not None, snapshot=snapshot
+        )
+        if settings.validate_policy_tags:
+            declarations = _validate_policy_tags(declarations, rejected)
+        for t in declarations:
+            table_tags: Dict[str, List[str]] = declared.setdefault(t.full_table_id, {})
+            for column_name, column_def in t.definition['columns'].items():
+                if 'bigqueryPolicyTags' in column_def:
+                    table_tags[column_name] = column_def['bigqueryPolicyTags']
+        if snapshot is not None:
+            snapshot.commit()
+    for f, error in invalid.items():
+        rejected[f] = [error]
+    return declared, set(workspace_state['files']) | set(invalid), rejected
+
+def _workspace_snapshot(workspace: str) -> Optional[df.WorkspaceSnapshot]:
+    """
+    Identifica o estado do workspace para reaproveitar as listagens e os arquivos lidos
+    por invocações anteriores da instância (`WORKSPACE_CACHE_*`).
+
+    Returns:
+        Optional[df.WorkspaceSnapshot]: The snapshot, or None when the cache is disabled or
+            the workspace commit cannot be identified.
+    """
+    settings: Settings = get_settings()
+    return df.workspace_snapshot(
+        workspace, cache.shared(settings.workspace_cache_bytes, settings.workspace_cache_dir),
+        settings.workspace_cache_ttl
+    )
+
+def _read_declarations(
+    workspace: str,
+    files: Iterable[str],
+    previous_state: Dict[str, Any],
+    stored_state: Dict[str, Any],
+    new_state: Dict[str, Any],
+    summary: Dict[str, Any],
+    invalid: Dict[str, str],
+    targeted: bool = False,
+    snapshot: Optional[df.WorkspaceSnapshot] = None,
+    contents: Optional[Dict[str, str]] = None
+) -> Iterator[File]:
+    """
+    Lê os arquivos do workspace e gera as declarações a sincronizar, na ordem em que
+    as leituras terminam, atualizando o novo estado e a contagem do resumo.
+
+    Args:
+        workspace (str): The Dataform workspace resource name.
+        files (Iterable[str]): The file paths, possibly a generator still listing the workspace.
+        previous_state (Dict[str, Any]): The state used to skip unchanged files.
+        stored_state (Dict[str, Any]): The stored state, used to drop the previous table of
+            targeted files.
+        new_state (Dict[str, Any]): The state being built by the run.
+        summary (Dict[str, Any]): The run summary.
+        invalid (Dict[str, str]): Receives file path -> error for the declarations that could
+            not be parsed. These files are left out of the new state, to be read again on the next run.
+        targeted (bool): Whether the files were explicitly targeted. Targeted files are always
+            reprocessed, and missing ones are reported instead of failing the run.
+        snapshot (Optional[df.WorkspaceSnapshot]): The workspace snapshot, whose cached file
+            contents are used instead of reading the files.
+        contents (Optional[Dict[str, str]]): File path -> content already read in this run, for
+            some of the `files`, used instead of reading them again.
+
+    Yields:
+        File: Each parsed declaration that must be synced.
+    """
+    settings: Settings = get_settings()
+    declaration_cache: Optional[cache.LRUCache] = cache.shared(
+        settings.workspace_cache_bytes, settings.workspace_cache_dir
+    )
+    contents = contents or {}
+    pending: Iterable[str] = (f for f in files if f not in contents) if contents else files
+    read: Iterator[Tuple[str, Optional[str]]] = itertools.chain(
+        contents.items(),
+        df.read_files(
+            workspace, pending, max_in_flight=settings.read_concurrency, ignore_not_found=targeted, snapshot=snapshot
+        )
+    )
+    for f, file_content in read:
+        if targeted:
+            previous_table: Optional[str] = (stored_state['files'].get(f) or {}).get('table')
+            if previous_table and new_state['tables'].get(previous_table, {}).get('file') == f:
+                new_state['tables'].pop(previous_table)
+            if file_content is None:
+                logging.warning('Skipping file %s: Not found in the Dataform workspace.', f)
+                new_state['files'].pop(f, None)
+                summary['targets']['missing_files'].append(f)
+                continue
+
+        summary['files_read'] += 1
+        file_hash: str = st.content_hash(file_content)
+        previous_file: Optional[Dict[str, Any]] = previous_state['files'].get(f)
+        if not targeted and previous_file and previous_file['hash'] == file_hash and (
+            previous_file['table'] is None or previous_file['table'] in previous_state['tables']
+        ):
+            logging.debug('Skipping file %s: Unchanged since the last sync.', f)
+            new_state['files'][f] = previous_file
+            if previous_file['table'] is not None:
+                new_state['tables'][previous_file['table']] = previous_state['tables'][previous_file['table']]
+            continue
+
+        new_state['files'][f] = {'hash': file_hash, 'table': None}
+        try:
+            declaration: Optional[Declaration] = df.parse_declaration(file_content, declaration_cache)
+        except ValueError as e:
+            logging.warning('Skipping file %s: Invalid declaration: %s', f, e)
+            new_state['files'].pop(f)
+            invalid[f] = f'{type(e).__name__}: {e}'
+            continue
+        if declaration is None:
+            logging.info('Skipping file %s: Not a declaration file.', f)
+            continue
+        # Construct the full table ID, using the project ID as a default for the database
+        full_table: str = declaration.full_table_id(settings.project_id)
+        new_state['files'][f]['table'] = full_table
+        logging.debug('Identified declaration file: %s -> BigQuery table: %s', f, full_table)
+        yield File(f, full_table, declaration.config)
+
+def _coalesce(
+    declarations: Iterable[File],
+    summary: Dict[str, Any],
+    new_state: Dict[str, Any],
+    rejected: Optional[Dict[str, List[str]]] = None
+) -> Dict[str, Tuple[File, List[str]]]:
+    """
+    Agrupa as declarações por tabela, unindo as policy tags desejadas de todas as
+    declarações da mesma tabela em uma única declaração. As declarações de uma tabela
+    que não mudaram desde a última execução (e por isso não foram lidas) entram no
+    grupo com as policy tags registradas no estado.
+
+    Duas declarações com policy tags diferentes para a mesma coluna são um conflito:
+    a tabela é rejeitada (status 'failed') e não é alterada. O mesmo acontece quando
+    alguma das declarações da tabela tem policy tags desconhecidas.
+
+    Args:
+        declarations (Iterable[File]): The parsed declarations.
+        summary (Dict[str, Any]): The run summary, where rejected tables are added.
+        new_state (Dict[str, Any]): The state being built by the run, where the desired
+            policy tags of each declaration are recorded.
+        rejected (Optional[Dict[str, List[str]]]): Full table ID -> policy tag errors found
+            by `_validate_policy_tags`. Filled while the declarations are consumed.
+
+    Returns:
+        Dict[str, Tuple[File, List[str]]]: Full table ID -> the coalesced declaration, named
+            after the first of its files, and the sorted paths of all its declaration files.
+    """
+    groups: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+    count: int = 0
+    for t in declarations:
+        count += 1
+        # Apenas as policy tags desejadas são mantidas, o restante da definição é descartado
+        columns: Dict[str, Any] = {
+            column_name: {'bigqueryPolicyTags': column_def['bigqueryPolicyTags']}
+            if 'bigqueryPolicyTags' in column_def else {}
+            for column_name, column_def in t.definition['columns'].items()
+        }
+        new_state['files'][t.full_file_name]['columns'] = {
+            column_name: column_def['bigqueryPolicyTags']
+            for column_name, column_def in columns.items() if column_def
+        }
+        groups.setdefault(t.full_table_id, {})[t.full_file_name] = columns
+
+    for f, file_state in new_state['files'].items():
+        group: Optional[Dict[str, Dict[str, Any]]] = groups.get(file_state['table'])
+        if group is not None and f not in group:
+            group[f] = {
+                column_name: {'bigqueryPolicyTags': tags}
+                for column_name, tags in file_state.get('columns', {}).items()
+            }
+
+    tables: Dict[str, Tuple[File, List[str]]] = {}
+    for full_table_id, group in groups.items():
+        files: List[str] = sorted(group)
+        summary['tables']['total'] += 1
+        if rejected and full_table_id in rejected:
+            logging.error('Rejecting table %s: %s', full_table_id, '; '.join(rejected[full_table_id]))
+            _reject(summary, new_state, full_table_id, files, tx.UnknownPolicyTagError, rejected[full_table_id])
+            continue
+        merged: Dict[str, Dict[str, Any]] = {}
+        owners: Dict[str, str] = {}
+        conflicts: List[str] = []
+        for f in files:
+            for column_name, column_def in group[f].items():
+                merged_def: Dict[str, Any] = merged.setdefault(column_name, {})
+                if 'bigqueryPolicyTags' not in column_def:
+                    continue
+                if column_name not in owners:
+                    merged_def['bigqueryPolicyTags'] = column_def['bigqueryPolicyTags']
+                    owners[column_name] = f
+                elif set(merged_def['bigqueryPolicyTags']) != set(column_def['bigqueryPolicyTags']):
+                    conflicts.append(
+                        f'Column "{column_name}": {owners[column_name]} declares '
+                        f'{sorted(merged_def["bigqueryPolicyTags"])}, {f} declares '
+                        f'{sorted(column_def["bigqueryPolicyTags"])}'
+                    )
+        if conflicts:
+            logging.error('Rejecting table %s: Conflicting declarations: %s', full_table_id, '; '.join(conflicts))
+            _reject(summary, new_state, full_table_id, files, PolicyTagConflictError, conflicts)
+            continue
+        tables[full_table_id] = (File(files[0], full_table_id, {'columns': merged}), files)
+
+    logging.info('Coalesced %d declarations into %d tables.', count, len(groups))
+    return tables
+
+def _reject(
+    summary: Dict[str, Any],
+    new_state: Dict[str, Any],
+    full_table_id: str,
+    files: List[str],
+    error_type: type,
+    errors: List[str]
+) -> None:
+    """Registra uma tabela rejeitada (status 'failed'), deixando seus arquivos fora do estado."""
+    error: str = f'{error_type.__name__}: {"; ".join(errors)}'
+    _add_result(summary, TableResult(full_table_id, ', '.join(files), FAILED, error, None))
     for f in files:
-        file_content: str = df.read_file(workspace, f)
-
-        if re.search(declaration, file_content):
-            parsed_file: Dict[str, Any] = df.parse_file(file_content)
-            assert 'schema' in parsed_file, f"File {f} is missing the 'schema' key."
-            assert 'name' in parsed_file, f"File {f} is missing the 'name' key."
-
-            # Construct the full table ID, using PROJECT_ID as a default for the database
-            full_table: str = '{project}.{schema}.{name}'.format(
-                project=parsed_file.get('database', PROJECT_ID),
-                schema=parsed_file['schema'],
-                name=parsed_file['name']
-            )
-            usable_files.append(File(f, full_table, parsed_file))
-            logging.debug('Identified declaration file: %s -> BigQuery table: %s', f, full_table)
+        new_state['files'].pop(f, None)
+
+def _dataset_of(full_table_id: str) -> str:
+    """Retorna o dataset ('project.dataset') de um ID completo de tabela."""
+    return full_table_id.rsplit('.', 1)[0]
+
+def _schedule_by_dataset(items: Iterable[T], table_id: Callable[[T], str]) -> Iterator[T]:
+    """
+    Ordena as tabelas intercalando os datasets, para que as atualizações em andamento
+    se distribuam entre eles em vez de se concentrarem em um único dataset.
+
+    Args:
+        items (Iterable[T]): The items to schedule.
+        table_id (Callable[[T], str]): Returns the full table ID of an item.
+    """
+    by_dataset: Dict[str, Deque[T]] = {}
+    for item in items:
+        by_dataset.setdefault(_dataset_of(table_id(item)), collections.deque()).append(item)
+    queues: Deque[Deque[T]] = collections.deque(by_dataset.values())
+    while queues:
+        queue: Deque[T] = queues.popleft()
+        yield queue.popleft()
+        if queue:
+            queues.append(queue)
+
+def resolve_targets(
+    targets: Dict[str, List[str]],
+    state: Dict[str, Any],
+    default_project: str
+) -> Tuple[List[str], List[str]]:
+    """
+    Converte os alvos de uma sincronização direcionada na lista de arquivos a processar.
+    Tabelas são resolvidas para o arquivo de declaração registrado no estado salvo.
+
+    Args:
+        targets (Dict[str, List[str]]): {'files': [...], 'tables': [...]}. Table IDs may be
+            'project.dataset.table', 'project:dataset.table' or 'dataset.table'.
+        state (Dict[str, Any]): The stored sync state.
+        default_project (str): The project used for table IDs without one.
+
+    Returns:
+        Tuple[List[str], List[str]]: The file paths to process (without duplicates) and
+            the table IDs that could not be resolved to a file.
+    """
+    files: Dict[str, None] = dict.fromkeys(targets.get('files', []))
+    unresolved: List[str] = []
+    for table_id in targets.get('tables', []):
+        full_table_id: str = normalize_table_id(table_id, default_project)
+        table_state: Optional[Dict[str, Any]] = state['tables'].get(full_table_id)
+        if table_state:
+            files.update(dict.fromkeys(table_state.get('files', [table_state['file']])))
         else:
-            logging.info('Skipping file %s: Not a declaration file.', f)
+            logging.info('Table %s is not in the sync state.', table_id)
+            unresolved.append(table_id)
+    return list(files), unresolved
 
-    if not usable_files:
-        logging.info('No usable declaration files found. Exiting.')
-        return
+def normalize_table_id(table_id: str, default_project: str) -> str:
+    """
+    Converte um ID de tabela ('project.dataset.table', 'project:dataset.table' ou
+    'dataset.table') para o ID completo 'project.dataset.table'.
+    """
+    full_table_id: str = table_id.replace(':', '.')
+    if full_table_id.count('.') == 1:
+        full_table_id = f'{default_project}.{full_table_id}'
+    return full_table_id
 
-    logging.info('Identified %d usable declaration files.', len(usable_files))
-    for t in usable_files:
-        logging.info(
-            'Processing BigQuery table: %s from Dataform file: %s',
-            t.full_table_id, t.full_file_name
-        )
+def _find_declaration_files(
+    workspace: str,
+    full_table_ids: Iterable[str],
+    snapshot: Optional[df.WorkspaceSnapshot] = None
+) -> Dict[str, Dict[str, str]]:
+    """
+    Procura no workspace os arquivos de declaração das tabelas informadas, lendo todos
+    os arquivos de `BASE_FOLDER`. Usado para os alvos que não estão no estado salvo; o
+    conteúdo dos arquivos encontrados é retornado para não ser lido de novo.
+
+    Args:
+        workspace (str): The Dataform workspace resource name.
+        full_table_ids (Iterable[str]): The full table IDs to look for.
+        snapshot (Optional[df.WorkspaceSnapshot]): The workspace snapshot.
+
+    Returns:
+        Dict[str, Dict[str, str]]: Full table ID -> declaration file path -> file content, sorted
+            by path, for the tables found.
+    """
+    settings: Settings = get_settings()
+    wanted: Set[str] = set(full_table_ids)
+    declaration_cache: Optional[cache.LRUCache] = cache.shared(
+        settings.workspace_cache_bytes, settings.workspace_cache_dir
+    )
+    found: Dict[str, Dict[str, str]] = {}
+    files: Iterator[str] = df.get_files(
+        workspace, settings.base_folder, include=settings.include_globs,
+        exclude=settings.exclude_globs, max_in_flight=settings.list_concurrency, snapshot=snapshot
+    )
+    for f, file_content in df.read_files(
+        workspace, files, max_in_flight=settings.read_concurrency, snapshot=snapshot
+    ):
+        try:
+            declaration: Optional[Declaration] = df.parse_declaration(file_content, declaration_cache)
+        except ValueError:
+            continue
+        if declaration is not None and declaration.full_table_id(settings.project_id) in wanted:
+            found.setdefault(declaration.full_table_id(settings.project_id), {})[f] = file_content
+    return {full_table_id: dict(sorted(paths.items())) for full_table_id, paths in found.items()}
+
+@_measured
+def apply_plan(document: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aplica um plano gerado pelo modo plan. Cada tabela do plano é relida no BigQuery no
+    momento da atualização, e as ações de adicionar e remover são aplicadas sobre as
+    policy tags atuais.
+
+    O plano é conferido contra as declarações atuais do workspace antes de qualquer
+    escrita: tabelas sem declaração, colunas que nenhuma declaração gerencia, tags
+    adicionadas que a declaração da coluna não tem e tags removidas que ela declara são
+    rejeitadas (status 'failed'). Com `VALIDATE_POLICY_TAGS`, as tags do plano também são
+    resolvidas pelo índice de taxonomias, e tags desconhecidas rejeitam a tabela.
+
+    Apenas os arquivos de declaração registrados no plano (chave 'files') são relidos, sem
+    percorrer o workspace; tabelas com algum desses arquivos ausente são rejeitadas.
+    Declarações da tabela em arquivos criados depois do plano não são consideradas. Planos
+    sem a chave 'files' em alguma tabela (escritos à mão) leem todo o `BASE_FOLDER`.
+
+    Args:
+        document (Optional[Dict[str, Any]]): The plan, or the summary of a plan run.
+
+    Returns:
+        Dict[str, Any]: The run summary, in the same format returned by `validate_and_apply`.
+            When the plan files are read, 'targets' lists the 'missing_files'.
+
+    Raises:
+        ValueError: If the document is not a valid plan.
+    """
+    settings: Settings = get_settings()
+    table_plans: Dict[str, Dict[str, Any]] = pl.load_plan(document)['tables']
+    logging.info('Applying plan with changes for %d tables.', len(table_plans))
+    summary: Dict[str, Any] = _new_summary(len(table_plans))
+    summary['files_read'] = 0
+    workspace: str = df.workspace_path(
+        settings.project_id, settings.region_id, settings.repository_id, settings.workspace_id
+    )
+    declared: Dict[str, Dict[str, List[str]]] = {}
+    rejected: Dict[str, List[str]] = {}
+    index: Optional[tx.PolicyTagIndex] = None
+    missing_files: Set[str] = set()
+    if table_plans:
+        files: Optional[List[str]] = None
+        if all('files' in table_plan for table_plan in table_plans.values()):
+            files = list(dict.fromkeys(f for table_plan in table_plans.values() for f in table_plan['files']))
+            summary['targets'] = {'missing_files': []}
+        declared, _, rejected = _declared_tags(workspace, summary, files)
+        if files is not None:
+            missing_files = set(summary['targets']['missing_files'])
+        if settings.validate_policy_tags:
+            index = _policy_tag_index()
+
+    accepted: List[str] = []
+    for full_table_id, table_plan in sorted(table_plans.items()):
+        errors: List[str] = [
+            f'Declaration file {f} not found in the Dataform workspace.'
+            for f in table_plan.get('files', []) if f in missing_files
+        ] or _check_table_plan(table_plan, declared.get(full_table_id), rejected.get(full_table_id, []), index)
+        if errors:
+            logging.error('Rejecting plan for table %s: %s', full_table_id, '; '.join(errors))
+            error: str = f'{PlanRejectedError.__name__}: {"; ".join(errors)}'
+            _add_result(summary, TableResult(full_table_id, table_plan.get('file'), FAILED, error, None))
+        else:
+            accepted.append(full_table_id)
+
+    limiter: RateLimiter = RateLimiter(settings.table_rate_limit)
+    dataset_slots: KeyedSemaphore = KeyedSemaphore(settings.dataset_concurrency)
+
+    def apply_table(full_table_id: str) -> TableResult:
+        table_plan: Dict[str, Any] = table_plans[full_table_id]
+        file_name: Optional[str] = table_plan.get('file')
+        try:
+            with dataset_slots.hold(_dataset_of(full_table_id)):
+                limiter.acquire()
+                bq.sync_bigquery_column_policy_tags(full_table_id, pl.plan_to_changes(table_plan['columns']))
+            return TableResult(full_table_id, file_name, UPDATED, None, table_plan['columns'])
+        except Exception as e: #pylint: disable=W0718
+            logging.error('Error applying plan to table %s: %s', full_table_id, e, exc_info=True)
+            error: str = f'{type(e).__name__}: {e}'
+            return TableResult(full_table_id, file_name, FAILED, error, table_plan['columns'])
+
+    with metrics.active().phase('sync'):
+        for _, result in _run_tables(apply_table, _schedule_by_dataset(accepted, lambda t: t)):
+            _add_result(summary, result)
+
+    _log_summary(summary)
+    return summary
+
+def _check_table_plan(
+    table_plan: Dict[str, Any],
+    declared: Optional[Dict[str, List[str]]],
+    rejected: List[str],
+    index: Optional[tx.PolicyTagIndex]
+) -> List[str]:
+    """
+    Confere o plano de uma tabela contra as policy tags declaradas no workspace. Com o
+    índice de taxonomias, as tags do plano são resolvidas para os nomes de recurso.
+
+    Args:
+        table_plan (Dict[str, Any]): The table plan. Its tags are replaced by the resolved ones.
+        declared (Optional[Dict[str, List[str]]]): Column -> declared policy tags, or None
+            when the table has no declaration.
+        rejected (List[str]): Errors of the table declarations, see `_validate_policy_tags`.
+        index (Optional[tx.PolicyTagIndex]): The policy tag index, when validation is on.
+
+    Returns:
+        List[str]: The reasons to reject the plan. Empty when the plan can be applied.
+    """
+    if declared is None:
+        return ['Table is not declared in the Dataform workspace.']
+    if rejected:
+        return rejected
+    errors: List[str] = []
+    for column_name, column_plan in table_plan['columns'].items():
+        if column_name not in declared:
+            errors.append(f'Column "{column_name}": Policy tags are not managed by any declaration.')
+            continue
+        declared_tags: Set[str] = set(declared[column_name])
+        for action in ('add', 'remove'):
+            tags: List[str] = column_plan.get(action, [])
+            if index is not None:
+                tags, tag_errors = index.resolve_all(tags)
+                errors.extend(f'Column "{column_name}": {e}' for e in tag_errors)
+                column_plan[action] = tags
+            if action == 'add':
+                errors.extend(
+                    f'Column "{column_name}": Policy tag "{tag}" is not declared.'
+                    for tag in tags if tag not in declared_tags
+                )
+            else:
+                errors.extend(
+                    f'Column "{column_name}": Policy tag "{tag}" is declared and cannot be removed.'
+                    for tag in tags if tag in declared_tags
+                )
+    return errors
+
+@_measured
+def export_declarations(datasets: Optional[List[str]] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Gera declarações do Dataform a partir das policy tags atuais do BigQuery e
+    relata as divergências entre os dois lados.
+
+    Os datasets são lidos com uma consulta ao `COLUMN_FIELD_PATHS` cada, em paralelo
+    (`TABLE_CONCURRENCY`), e as declarações são gravadas no workspace à medida que cada
+    dataset é lido, com o trabalho em andamento limitado. Apenas tabelas com alguma policy
+    tag e sem declaração no workspace são exportadas, para `EXPORT_FOLDER/dataset/tabela.sqlx`
+    (com o projeto como diretório adicional quando ele não é o `PROJECT_ID`). Arquivos
+    existentes nunca são sobrescritos.
+
+    Args:
+        datasets (Optional[List[str]]): The datasets to read, as 'dataset' or 'project.dataset'.
+            Defaults to `EXPORT_DATASETS` or, when empty, every dataset of `PROJECT_ID`.
+        dry_run (bool): Only compute the export and the drift report, without writing files.
+
+    Returns:
+        Dict[str, Any]: The export summary, with the following keys:
+            - 'datasets': Number of datasets read.
+            - 'tables': Counts of tables 'scanned', 'exported' (or to be exported, in dry run),
+              'untagged' (skipped) and 'declared' (already with a declaration).
+            - 'drift': 'missing_declaration' (tagged tables without a declaration),
+              'missing_table' (declared tables not found in the datasets read) and
+              'tag_drift' (table -> column -> {'declared', 'actual'}, where 'declared' is
+              None for tagged columns not managed by any declaration).
+            - 'errors': Dataset or table -> error, for datasets that could not be read, files
+              that already exist or could not be written and, with `VALIDATE_POLICY_TAGS`,
+              declarations with unknown policy tags.
+
+    Raises:
+        ValueError: If a dataset ID is not a valid BigQuery identifier.
+    """
+    settings: Settings = get_settings()
+    run: metrics.Metrics = metrics.active()
+    workspace: str = df.workspace_path(
+        settings.project_id, settings.region_id, settings.repository_id, settings.workspace_id
+    )
+
+    dataset_ids: List[str] = [
+        '.'.join(bq.parse_dataset_id(d, settings.project_id))
+        for d in datasets or settings.export_datasets or bq.list_datasets(settings.project_id)
+    ]
+    summary: Dict[str, Any] = {
+        'files_read': 0,
+        'datasets': len(dataset_ids),
+        'tables': {'scanned': 0, 'exported': 0, 'untagged': 0, 'declared': 0},
+        'drift': {'missing_declaration': [], 'missing_table': [], 'tag_drift': {}},
+        'errors': {}
+    }
+
+    # Declarações existentes: policy tags declaradas por tabela (resolvidas para os nomes de
+    # recurso com `VALIDATE_POLICY_TAGS`) e caminhos já ocupados no workspace
+    declared, existing_paths, rejected = _declared_tags(workspace, summary)
+    for full_table_id, errors in rejected.items():
+        summary['errors'][full_table_id] = '; '.join(errors)
+    logging.info('Found %d declared tables in the Dataform workspace.', len(declared))
+
+    scanned_datasets: Set[str] = set()
+    seen_declared: Set[str] = set()
+
+    def read_dataset(dataset_id: str) -> Tuple[Optional[Dict[str, Dict[str, Dict[str, Any]]]], Optional[str]]:
+        try:
+            return bq.get_bigquery_dataset_config(*dataset_id.rsplit('.', 1)), None
+        except Exception as e: #pylint: disable=W0718
+            return None, f'{type(e).__name__}: {e}'
+
+    def exports() -> Iterator[Tuple[str, str, str]]:
+        """Compara cada tabela lida com as declarações e gera as declarações a gravar."""
+        for dataset_id, (tables, error) in _run_tables(read_dataset, dataset_ids):
+            if tables is None:
+                summary['errors'][dataset_id] = error
+                continue
+            scanned_datasets.add(dataset_id)
+            for full_table_id, table_config in sorted(tables.items()):
+                summary['tables']['scanned'] += 1
+                actual: Dict[str, List[str]] = {
+                    path: column['policy_tags'] for path, column in table_config.items() if column['policy_tags']
+                }
+                table_tags: Optional[Dict[str, List[str]]] = declared.get(full_table_id)
+                if table_tags is not None:
+                    summary['tables']['declared'] += 1
+                    seen_declared.add(full_table_id)
+                    drift: Dict[str, Dict[str, Any]] = {
+                        path: {'declared': table_tags.get(path), 'actual': actual.get(path, [])}
+                        for path in sorted(set(table_tags) | set(actual))
+                        if set(table_tags.get(path, [])) != set(actual.get(path, [])) or path not in table_tags
+                    }
+                    if drift:
+                        summary['drift']['tag_drift'][full_table_id] = drift
+                    continue
+                if not actual:
+                    summary['tables']['untagged'] += 1
+                    continue
+                summary['drift']['missing_declaration'].append(full_table_id)
+                project, dataset, table = full_table_id.split('.', 2)
+                folder: str = f'{settings.export_folder}/{dataset}'
+                if project != settings.project_id:
+                    folder = f'{settings.export_folder}/{project}/{dataset}'
+                path: str = f'{folder}/{table}.sqlx'
+                if path in existing_paths:
+                    summary['errors'][full_table_id] = f'File {path} already exists and is not a declaration.'
+                    continue
+                database: Optional[str] = project if project != settings.project_id else None
+                yield full_table_id, sqlx.render_declaration(database, dataset, table, actual), path
+
+    def write(item: Tuple[str, str, str]) -> Optional[str]:
+        try:
+            # `existing_paths` só cobre os arquivos percorridos em BASE_FOLDER; EXPORT_FOLDER pode estar fora
+            if df.file_exists(workspace, item[2]):
+                return f'File {item[2]} already exists and is not a declaration.'
+            if not dry_run:
+                df.write_file(workspace, item[2], item[1])
+            return None
+        except Exception as e: #pylint: disable=W0718
+            return f'{type(e).__name__}: {e}'
+
+    with run.phase('export'):
+        for (full_table_id, _, path), error in _run_tables(write, exports()):
+            if error:
+                summary['errors'][full_table_id] = error
+                continue
+            summary['tables']['exported'] += 1
+            logging.debug('Exported declaration for table %s to %s.', full_table_id, path)
+
+    summary['drift']['missing_table'] = sorted(
+        full_table_id for full_table_id in declared
+        if _dataset_of(full_table_id) in scanned_datasets and full_table_id not in seen_declared
+    )
+    summary['drift']['missing_declaration'].sort()
+    logging.info(
+        'Export %s: %d tables scanned, %d exported, %d untagged, %d declared (%d with drift), %d errors.',
+        'planned' if dry_run else 'completed', summary['tables']['scanned'], summary['tables']['exported'],
+        summary['tables']['untagged'], summary['tables']['declared'], len(summary['drift']['tag_drift']),
+        len(summary['errors'])
+    )
+    return summary
+
+def _validate_policy_tags(declarations: Iterable[File], rejected: Dict[str, List[str]]) -> Iterator[File]:
+    """
+    Valida as policy tags desejadas das declarações contra o índice de taxonomias,
+    substituindo nomes de exibição pelos nomes de recurso. Tags desconhecidas ou ambíguas
+    são mantidas como foram escritas e registradas em `rejected`, para que a tabela inteira,
+    com todas as suas declarações, seja rejeitada antes de qualquer escrita.
+
+    Args:
+        declarations (Iterable[File]): The parsed declarations.
+        rejected (Dict[str, List[str]]): Where the errors are added, by full table ID.
+
+    Yields:
+        File: Every declaration, with the valid tags resolved to resource names.
+    """
+    index: Optional[tx.PolicyTagIndex] = None
+    for t in declarations:
+        with metrics.active().phase('validate'):
+            if index is None:
+                index = _policy_tag_index()
+            errors: List[str] = []
+            for column_name, column_def in t.definition['columns'].items():
+                if 'bigqueryPolicyTags' not in column_def:
+                    continue
+                resolved: List[str] = []
+                for tag in column_def['bigqueryPolicyTags']:
+                    try:
+                        resolved.append(index.resolve(tag))
+                    except tx.UnknownPolicyTagError as e:
+                        resolved.append(tag)
+                        errors.append(f'Column "{column_name}": {e}')
+                column_def['bigqueryPolicyTags'] = resolved
+        if errors:
+            logging.error('Invalid policy tags in declaration %s: %s', t.full_file_name, '; '.join(errors))
+            rejected.setdefault(t.full_table_id, []).extend(f'{t.full_file_name}: {e}' for e in errors)
+        yield t
+
+def _policy_tag_index() -> tx.PolicyTagIndex:
+    """Retorna o índice das taxonomias de `TAXONOMY_PROJECTS` e `TAXONOMY_LOCATIONS`."""
+    settings: Settings = get_settings()
+    return tx.get_policy_tag_index(
+        settings.taxonomy_projects, settings.taxonomy_locations, settings.taxonomy_cache_ttl
+    )
+
+def _new_summary(total: int) -> Dict[str, Any]:
+    """Cria o resumo vazio de uma execução."""
+    return {
+        'tables': {'total': total, UNCHANGED: 0, PLANNED: 0, UPDATED: 0, FAILED: 0},
+        'results': []
+    }
+
+def _add_result(summary: Dict[str, Any], result: TableResult) -> None:
+    """Adiciona o resultado de uma tabela ao resumo da execução."""
+    summary['tables'][result.status] += 1
+    summary['results'].append(result._asdict())
+
+def _log_summary(summary: Dict[str, Any]) -> None:
+    """Registra no log a contagem de tabelas por status."""
+    logging.info(
+        'Processed %d tables: %d unchanged, %d planned, %d updated, %d failed.',
+        summary['tables']['total'], summary['tables'][UNCHANGED], summary['tables'][PLANNED],
+        summary['tables'][UPDATED], summary['tables'][FAILED]
+    )
+
+def _run_tables(function: Callable[[T], R], items: Iterable[T]) -> Iterator[Tuple[T, R]]:
+    """
+    Executa uma função por tabela em um pool de threads limitado por `TABLE_CONCURRENCY`,
+    retornando os resultados na ordem em que terminam. Os itens são consumidos sob demanda,
+    com no máximo o dobro de `TABLE_CONCURRENCY` tabelas em andamento, o que propaga a
+    contrapressão para as etapas anteriores quando `items` é um gerador.
+    """
+    workers: int = max(1, get_settings().table_concurrency)
+    remaining: Iterator[T] = iter(items)
+    pending: Dict[futures.Future, T] = {}
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next() -> bool:
+            for item in remaining:
+                pending[executor.submit(function, item)] = item
+                return True
+            return False
+
+        try:
+            while len(pending) < 2 * workers and submit_next():
+                pass
+            while pending:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    item: T = pending.pop(future)
+                    yield item, future.result()
+                    submit_next()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def sync_table(
+    t: File,
+    table_bq_config: Optional[Dict[str, Dict[str, Any]]] = None,
+    limiter: Optional[RateLimiter] = None,
+    dry_run: bool = False
+) -> TableResult:
+    """
+    Compara as policy tags desejadas de uma declaração com as atuais da tabela
+    no BigQuery e aplica as diferenças. Erros são capturados e retornados no
+    resultado, para que uma tabela com problema não interrompa as demais.
+
+    Args:
+        t (File): The parsed Dataform declaration.
+        table_bq_config (Optional[Dict[str, Dict[str, Any]]]): The current table configuration,
+            when already known (e.g. from a bulk snapshot). When omitted, the table is fetched.
+        limiter (Optional[RateLimiter]): Shared limiter acquired before touching BigQuery.
+        dry_run (bool): Only compute the changes, without updating the table.
+
+    Returns:
+        TableResult: The table outcome: 'unchanged', 'planned' (dry run), 'updated' or
+            'failed' (with the error), and the changes per column in the plan format.
+    """
+    logging.info(
+        'Processing BigQuery table: %s from Dataform file: %s',
+        t.full_table_id, t.full_file_name
+    )
+    try:
+        if limiter:
+            limiter.acquire()
         changes: Dict[str, Dict[str, List[Dict[str, str]]]] = {}
-        table_bq_config: Dict[str, Dict[str, Any]] = bq.get_bigquery_table_config(t.full_table_id)
+        bq_table: Optional[bigquery.Table] = None
+        if table_bq_config is None:
+            # A tabela é lida uma única vez e reaproveitada na etapa de atualização
+            bq_table = bq.get_bigquery_table(t.full_table_id)
+            table_bq_config = bq.get_bigquery_table_config(t.full_table_id, bq_table)
 
         assert 'columns' in t.definition, \
             f"Dataform definition for {t.full_table_id} is missing the 'columns' key."
@@ -105,14 +1036,26 @@ def validate_and_apply() -> None:
                 )
             # else: column_def might not have 'bigqueryPolicyTags', which is fine.
 
-        if changes:
+        if not changes:
             logging.info(
-                'Applying %d column policy tag changes to table: %s', len(changes),
+                'No policy tag changes needed for table: %s',
                 t.full_table_id
             )
-            bq.sync_bigquery_column_policy_tags(t.full_table_id, changes)
-        else:
+            return TableResult(t.full_table_id, t.full_file_name, UNCHANGED, None, {})
+
+        if dry_run:
             logging.info(
-                'No policy tag changes needed for table: %s',
+                'Planned %d column policy tag changes for table: %s', len(changes),
                 t.full_table_id
             )
+            return TableResult(t.full_table_id, t.full_file_name, PLANNED, None, pl.changes_to_plan(changes))
+
+        logging.info(
+            'Applying %d column policy tag changes to table: %s', len(changes),
+            t.full_table_id
+        )
+        bq.sync_bigquery_column_policy_tags(t.full_table_id, changes, bq_table)
+        return TableResult(t.full_table_id, t.full_file_name, UPDATED, None, pl.changes_to_plan(changes))
+    except Exception as e: #pylint: disable=W0718
+        logging.error('Error processing table %s: %s', t.full_table_id, e, exc_info=True)
+        return TableResult(t.full_table_id, t.full_file_name, FAILED, f'{type(e).__name__}: {e}', None)
@@ -0,0 +1,65 @@
+'''Módulo com utilitários para limitar a taxa de chamadas às APIs.'''
+
+import contextlib
+import threading
+import time
+
+from typing import Dict, Hashable, Iterator
+
+
+class RateLimiter:
+    """
+    Limita a quantidade de operações por segundo, compartilhado entre threads.
+    As operações são espaçadas igualmente no tempo.
+    """
+
+    def __init__(self, rate: float) -> None:
+        """
+        Args:
+            rate (float): Maximum number of operations per second. Zero or a
+                          negative value disables the limit.
+        """
+        self.interval: float = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloqueia até que a próxima operação possa ser executada."""
+        if not self.interval:
+            return
+        with self._lock:
+            now: float = time.monotonic()
+            slot: float = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class KeyedSemaphore:
+    """
+    Limita a quantidade de operações simultâneas por chave (por exemplo, por dataset),
+    compartilhado entre threads.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        Args:
+            limit (int): Maximum number of concurrent operations per key. Zero or a
+                         negative value disables the limit.
+        """
+        self.limit: int = limit
+        self._semaphores: Dict[Hashable, threading.BoundedSemaphore] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        """Bloqueia até que haja uma vaga para a chave, liberando-a ao final do bloco."""
+        if self.limit <= 0:
+            yield
+            return
+        with self._lock:
+            semaphore: threading.BoundedSemaphore = self._semaphores.setdefault(
+                key, threading.BoundedSemaphore(self.limit)
+            )
+        with semaphore:
+            yield
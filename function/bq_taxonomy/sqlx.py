@@ -0,0 +1,394 @@
+'''Módulo para análise do bloco `config { ... }` dos arquivos SQLX do Dataform.'''
+
+import json
+import re
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+DECLARATION_TYPE: str = 'declaration'
+
+_CONFIG_PATTERN: re.Pattern = re.compile(r'config\s*\{')
+_CONFIG_LINE_PATTERN: re.Pattern = re.compile(r'^[ \t]*config\s*\{', re.MULTILINE)
+# Espaços em branco e comentários `//` e `/* */`
+_WHITESPACE_PATTERN: re.Pattern = re.compile(r'(?:[\s\ufeff]+|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+_IDENTIFIER_PATTERN: re.Pattern = re.compile(r'[A-Za-z_$][\w$]*')
+_HEX_ESCAPE_PATTERN: re.Pattern = re.compile(r'[0-9A-Fa-f]{4}')
+_NUMBER_PATTERN: re.Pattern = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+# Caracteres que interrompem a leitura rápida de uma string, por tipo de aspas
+_STRING_STOP_PATTERNS: Dict[str, re.Pattern] = {
+    '"': re.compile(r'["\\\n]'),
+    "'": re.compile(r"['\\\n]"),
+    '`': re.compile(r'[`\\$]')
+}
+# Chave 'type' com o valor 'declaration', usada para identificar declarações cujo bloco não pôde ser analisado
+_DECLARATION_TYPE_PATTERN: re.Pattern = re.compile(r'(?<![\w$])["\']?type["\']?\s*:\s*(["\'`])declaration\1')
+_LITERALS: Dict[str, Any] = {'true': True, 'false': False, 'null': None}
+_ESCAPES: Dict[str, str] = {
+    'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'
+}
+
+
+class SqlxParseError(ValueError):
+    """Erro de sintaxe no bloco de configuração de um arquivo SQLX."""
+
+    def __init__(self, message: str, content: str, position: int) -> None:
+        line: int = content.count('\n', 0, position) + 1
+        column: int = position - content.rfind('\n', 0, position)
+        super().__init__(f'{message} (line {line}, column {column})')
+        self.line: int = line
+        self.column: int = column
+
+
+class Declaration(NamedTuple):
+    """Declaração do Dataform já validada."""
+    database: Optional[str]
+    schema: str
+    name: str
+    columns: Dict[str, Dict[str, Any]]
+    config: Dict[str, Any]
+
+    def full_table_id(self, default_project: str) -> str:
+        """
+        Monta o ID completo da tabela declarada.
+
+        Args:
+            default_project (str): The project used when the declaration has no 'database'.
+
+        Returns:
+            str: The full table ID in the format 'project.dataset.table'.
+        """
+        return f'{self.database or default_project}.{self.schema}.{self.name}'
+
+
+class _NotRequestedType(Exception):
+    """Sinaliza internamente que o bloco não é do tipo procurado."""
+
+
+class _Parser:
+    """
+    Parser de passagem única para o subconjunto de objetos JavaScript usado nos
+    blocos de configuração: chaves com ou sem aspas, strings com aspas simples,
+    duplas ou crases, números, booleanos, null, listas, objetos, vírgulas finais
+    e comentários `//` e `/* */`.
+    """
+
+    def __init__(self, content: str, position: int, required_type: Optional[str]) -> None:
+        self.content: str = content
+        self.position: int = position
+        self.required_type: Optional[str] = required_type
+        self.depth: int = 0
+
+    def error(self, message: str) -> SqlxParseError:
+        return SqlxParseError(message, self.content, self.position)
+
+    def skip_whitespace(self) -> None:
+        # Caso comum: nada a pular, sem executar a expressão regular
+        char: str = self.content[self.position:self.position + 1]
+        if char and not char.isspace() and char not in '/\ufeff':
+            return
+        self.position = _WHITESPACE_PATTERN.match(self.content, self.position).end()
+        if self.content.startswith('/*', self.position):
+            raise self.error('Unterminated block comment')
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.position >= len(self.content):
+            raise self.error('Unexpected end of content')
+        return self.content[self.position]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self.error(f'Expected "{char}" but found "{self.content[self.position]}"')
+        self.position += 1
+
+    def parse_value(self) -> Any:
+        char: str = self.peek()
+        if char == '{':
+            return self.parse_object()
+        if char == '[':
+            return self.parse_array()
+        if char in '"\'`':
+            return self.parse_string()
+        match = _NUMBER_PATTERN.match(self.content, self.position)
+        if match:
+            self.position = match.end()
+            text: str = match.group()
+            return float(text) if any(c in text for c in '.eE') else int(text)
+        match = _IDENTIFIER_PATTERN.match(self.content, self.position)
+        if match and match.group() in _LITERALS:
+            self.position = match.end()
+            return _LITERALS[match.group()]
+        raise self.error(f'Unexpected character "{char}"')
+
+    def parse_string(self) -> str:
+        content: str = self.content
+        quote: str = content[self.position]
+        stop: re.Pattern = _STRING_STOP_PATTERNS[quote]
+        self.position += 1
+        parts: List[str] = []
+        while True:
+            match = stop.search(content, self.position)
+            if not match:
+                raise self.error('Unterminated string')
+            end: int = match.start()
+            char: str = content[end]
+            if char == quote and not parts:
+                # Caso comum: string sem escapes
+                value: str = content[self.position:end]
+                self.position = end + 1
+                return value
+            parts.append(content[self.position:end])
+            if char == quote:
+                self.position = end + 1
+                return ''.join(parts)
+            if char == '\\':
+                escaped: str = content[end + 1:end + 2]
+                if escaped == 'u':
+                    digits: str = content[end + 2:end + 6]
+                    if not _HEX_ESCAPE_PATTERN.fullmatch(digits):
+                        self.position = end
+                        raise self.error('Invalid unicode escape')
+                    parts.append(chr(int(digits, 16)))
+                    self.position = end + 6
+                else:
+                    # Uma barra seguida de quebra de linha continua a string na próxima linha
+                    parts.append('' if escaped == '\n' else _ESCAPES.get(escaped, escaped))
+                    self.position = end + 2
+            elif char == '$':
+                if content.startswith('${', end):
+                    raise self.error('Template literal interpolation is not supported')
+                parts.append(char)
+                self.position = end + 1
+            else:
+                self.position = end
+                raise self.error('Unterminated string')
+
+    def parse_key(self) -> str:
+        char: str = self.peek()
+        if char in '"\'':
+            return self.parse_string()
+        match = _IDENTIFIER_PATTERN.match(self.content, self.position)
+        if not match:
+            raise self.error(f'Expected a key but found "{char}"')
+        self.position = match.end()
+        return match.group()
+
+    def parse_object(self) -> Dict[str, Any]:
+        self.expect('{')
+        self.depth += 1
+        result: Dict[str, Any] = {}
+        while self.peek() != '}':
+            key: str = self.parse_key()
+            self.expect(':')
+            value: Any = self.parse_value()
+            result[key] = value
+            if self.depth == 1 and key == 'type' and self.required_type is not None \
+                    and value != self.required_type:
+                # Rejeita o arquivo sem analisar o restante do bloco
+                raise _NotRequestedType()
+            if self.peek() == ',':
+                self.position += 1
+            elif self.content[self.position] != '}':
+                raise self.error('Expected "," or "}"')
+        self.position += 1
+        self.depth -= 1
+        return result
+
+    def parse_array(self) -> List[Any]:
+        self.expect('[')
+        result: List[Any] = []
+        while self.peek() != ']':
+            result.append(self.parse_value())
+            if self.peek() == ',':
+                self.position += 1
+            elif self.content[self.position] != ']':
+                raise self.error('Expected "," or "]"')
+        self.position += 1
+        return result
+
+
+def find_config_block(content: str) -> int:
+    """
+    Localiza o início do bloco `config { ... }`.
+
+    Args:
+        content (str): The SQLX file content.
+
+    Returns:
+        int: The position of the opening brace of the config block, or -1 if there is none.
+    """
+    # Caso comum: o bloco é a primeira instrução do arquivo, depois de comentários
+    parser: _Parser = _Parser(content, 0, None)
+    while True:
+        parser.skip_whitespace()
+        if not content.startswith('--', parser.position):
+            break
+        end: int = content.find('\n', parser.position)
+        parser.position = len(content) if end == -1 else end + 1
+    match = _CONFIG_PATTERN.match(content, parser.position) or _CONFIG_LINE_PATTERN.search(content)
+    return match.end() - 1 if match else -1
+
+def parse_config(content: str, required_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Analisa o bloco `config { ... }` de um arquivo SQLX em uma única passagem,
+    parando na chave que fecha o bloco.
+
+    Args:
+        content (str): The SQLX file content.
+        required_type (Optional[str]): When given, blocks whose 'type' differs (or is
+            missing) are rejected as soon as that is known, without parsing the rest.
+
+    Returns:
+        Optional[Dict[str, Any]]: The config block as a dictionary, or None if the file
+            has no config block or it is not of the required type.
+
+    Raises:
+        SqlxParseError: If the config block is not valid.
+    """
+    start: int = find_config_block(content)
+    if start == -1:
+        return None
+    try:
+        config: Dict[str, Any] = _Parser(content, start, required_type).parse_object()
+    except _NotRequestedType:
+        return None
+    if required_type is not None and config.get('type') != required_type:
+        return None
+    return config
+
+def flatten_columns(columns: Dict[str, Any], prefix: str = '') -> Dict[str, Dict[str, Any]]:
+    """
+    Achata as colunas de uma declaração em um dicionário indexado pelo caminho
+    completo do campo. Campos aninhados podem ser declarados tanto com chaves
+    pontuadas ('address.zip') quanto com a chave `columns` dentro da coluna pai.
+
+    Args:
+        columns (Dict[str, Any]): The 'columns' block of the declaration.
+        prefix (str): Path prefix of the given columns, used in the recursion.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Column path -> column definition. Columns described
+            only by a string are normalized to {'description': ...}, and nested
+            `columns` blocks are removed from the parent definition.
+
+    Raises:
+        ValueError: If a nested 'columns' key is not a dictionary.
+    """
+    flattened: Dict[str, Dict[str, Any]] = {}
+    for name, value in columns.items():
+        path: str = f'{prefix}{name}'
+        if not isinstance(value, dict):
+            flattened[path] = {'description': value}
+            continue
+        nested: Any = value.get('columns')
+        if nested is None:
+            flattened[path] = value
+            continue
+        if not isinstance(nested, dict):
+            raise ValueError(f"Column '{path}' 'columns' key is not a dictionary.")
+        flattened[path] = {k: v for k, v in value.items() if k != 'columns'}
+        flattened.update(flatten_columns(nested, f'{path}.'))
+    return flattened
+
+def parse_declaration(content: str) -> Optional[Declaration]:
+    """
+    Analisa um arquivo SQLX e retorna a declaração, se o arquivo for do tipo 'declaration'.
+
+    Columns are flattened with `flatten_columns`, so nested fields are keyed by their
+    dotted path.
+
+    Args:
+        content (str): The SQLX file content.
+
+    Blocos que não podem ser analisados (por exemplo, com expressões JavaScript antes da
+    chave 'type') só são considerados inválidos quando declaram `type: "declaration"`;
+    os demais arquivos são ignorados.
+
+    Returns:
+        Optional[Declaration]: The declaration, or None if the file is not a declaration.
+
+    Raises:
+        SqlxParseError: If the config block of a declaration is not valid.
+        ValueError: If a required key is missing or has the wrong type.
+    """
+    try:
+        config: Optional[Dict[str, Any]] = parse_config(content, DECLARATION_TYPE)
+    except SqlxParseError:
+        start: int = find_config_block(content)
+        if not _DECLARATION_TYPE_PATTERN.search(content, start):
+            return None
+        raise
+    if config is None:
+        return None
+    for key in ('schema', 'name'):
+        if not isinstance(config.get(key), str):
+            raise ValueError(f"Declaration is missing the '{key}' key.")
+    if 'database' in config and not isinstance(config['database'], str):
+        raise ValueError("Declaration 'database' key must be a string.")
+    if not isinstance(config.get('columns', {}), dict):
+        raise ValueError("Declaration 'columns' key is not a dictionary.")
+
+    columns: Dict[str, Dict[str, Any]] = flatten_columns(config.get('columns', {}))
+    for path, column in columns.items():
+        tags: Any = column.get('bigqueryPolicyTags', [])
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise ValueError(f"Column '{path}' 'bigqueryPolicyTags' key must be a list of strings.")
+    config['columns'] = columns
+    return Declaration(config.get('database'), config['schema'], config['name'], columns, config)
+
+def _render_key(key: str) -> str:
+    """Escreve uma chave do bloco de configuração, entre aspas apenas se necessário."""
+    return key if _IDENTIFIER_PATTERN.fullmatch(key) else json.dumps(key)
+
+def _render_columns(tree: Dict[str, Any], indent: str) -> List[str]:
+    lines: List[str] = []
+    for i, (name, node) in enumerate(tree.items()):
+        lines.append(f'{indent}{_render_key(name)}: {{')
+        body: List[str] = []
+        if node['tags'] is not None:
+            body.append(f'{indent}  bigqueryPolicyTags: {json.dumps(node["tags"])}')
+        if node['columns']:
+            body.append('\n'.join(
+                [f'{indent}  columns: {{'] + _render_columns(node['columns'], indent + '    ') + [f'{indent}  }}']
+            ))
+        lines.append(',\n'.join(body))
+        lines.append(f'{indent}}}' + (',' if i < len(tree) - 1 else ''))
+    return lines
+
+def render_declaration(
+    database: Optional[str],
+    schema: str,
+    name: str,
+    columns: Dict[str, List[str]]
+) -> str:
+    """
+    Gera o conteúdo de um arquivo SQLX de declaração com as policy tags das colunas,
+    no formato lido por `parse_declaration`. Campos aninhados são escritos em blocos
+    `columns` dentro da coluna pai.
+
+    Args:
+        database (Optional[str]): The table project, omitted from the file when None.
+        schema (str): The dataset ID.
+        name (str): The table ID.
+        columns (Dict[str, List[str]]): Column path (e.g. 'address.zip') -> policy tags.
+
+    Returns:
+        str: The SQLX file content.
+    """
+    tree: Dict[str, Any] = {}
+    for path in sorted(columns):
+        node: Dict[str, Any] = {'columns': tree}
+        for part in path.split('.'):
+            node = node['columns'].setdefault(part, {'tags': None, 'columns': {}})
+        node['tags'] = list(columns[path])
+
+    lines: List[str] = ['config {', f'  type: {json.dumps(DECLARATION_TYPE)},']
+    if database:
+        lines.append(f'  database: {json.dumps(database)},')
+    lines.append(f'  schema: {json.dumps(schema)},')
+    lines.append(f'  name: {json.dumps(name)},')
+    lines.append('  columns: {')
+    lines.extend(_render_columns(tree, '    '))
+    lines.extend(['  }', '}', ''])
+    return '\n'.join(lines)
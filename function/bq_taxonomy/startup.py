@@ -0,0 +1,54 @@
+'''Módulo para medição do tempo de inicialização (cold start) da função.'''
+
+import contextlib
+import threading
+import time
+
+from typing import Any, Dict, Iterator
+
+
+# Instante em que o pacote começou a ser importado (este módulo é o primeiro importado por main)
+STARTED_AT: float = time.perf_counter()
+
+_lock: threading.Lock = threading.Lock()
+_timings: Dict[str, float] = {}
+
+@contextlib.contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Mede o tempo de uma etapa da inicialização.
+
+    Args:
+        name (str): The step name, e.g. 'client.bigquery'.
+    """
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _timings[name] = time.perf_counter() - start
+
+def mark(name: str) -> None:
+    """
+    Registra o tempo decorrido desde o início da importação do pacote.
+
+    Args:
+        name (str): The milestone name, e.g. 'imports'.
+    """
+    with _lock:
+        _timings[name] = time.perf_counter() - STARTED_AT
+
+def report() -> Dict[str, Any]:
+    """
+    Retorna o relatório de tempos da inicialização.
+
+    Returns:
+        Dict[str, Any]: The time in seconds of each measured step and milestone,
+            plus 'uptime', the time since the package started being imported.
+    """
+    with _lock:
+        timings: Dict[str, float] = dict(_timings)
+    return {
+        'timings': {name: round(seconds, 6) for name, seconds in sorted(timings.items())},
+        'uptime': round(time.perf_counter() - STARTED_AT, 6)
+    }
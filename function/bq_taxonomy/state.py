@@ -0,0 +1,169 @@
+'''Módulo para persistência do estado da última sincronização bem-sucedida.'''
+
+import abc
+import hashlib
+import json
+import logging
+import os
+
+from typing import Any, Dict, Optional
+from urllib import parse
+
+from google.auth.transport import requests as auth_requests
+
+from . import clients
+
+
+STATE_VERSION: int = 1
+GCS_DOWNLOAD_URL: str = 'https://storage.googleapis.com/storage/v1/b/{bucket}/o/{name}?alt=media'
+GCS_UPLOAD_URL: str = 'https://storage.googleapis.com/upload/storage/v1/b/{bucket}/o?uploadType=media&name={name}'
+
+def empty_state() -> Dict[str, Any]:
+    """
+    Cria um estado vazio, equivalente a nunca ter sincronizado.
+
+    Returns:
+        Dict[str, Any]: A state with the following keys:
+            - 'version': The state format version.
+            - 'project': The default project used to resolve table IDs.
+            - 'files': File path -> {'hash': content hash, 'table': full table ID or None,
+              'columns': column -> policy tags desired by the file}.
+            - 'tables': Full table ID -> {'file': first declaration file, 'files': all declaration
+              files, 'columns': column -> policy tags applied}.
+    """
+    return {'version': STATE_VERSION, 'project': None, 'files': {}, 'tables': {}}
+
+def content_hash(content: str) -> str:
+    """
+    Calcula o hash do conteúdo de um arquivo.
+
+    Args:
+        content (str): The file content.
+
+    Returns:
+        str: The SHA-256 hex digest of the UTF-8 encoded content.
+    """
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class StateStore(abc.ABC):
+    """Interface para leitura e escrita do estado de sincronização."""
+
+    @abc.abstractmethod
+    def _read(self) -> Optional[str]:
+        """Lê o estado serializado, retornando None se ele ainda não existir."""
+
+    @abc.abstractmethod
+    def _write(self, data: str) -> None:
+        """Grava o estado serializado."""
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Carrega o estado salvo. Um estado ausente, ilegível ou de outra versão é
+        tratado como vazio, o que força uma sincronização completa.
+
+        Returns:
+            Dict[str, Any]: The stored state, in the format described in `empty_state`.
+        """
+        try:
+            data: Optional[str] = self._read()
+            if data is None:
+                logging.info('No sync state found at %s. Starting from an empty state.', self)
+                return empty_state()
+            state: Dict[str, Any] = json.loads(data)
+            if state.get('version') != STATE_VERSION:
+                logging.warning('Sync state at %s has an unsupported version. Ignoring it.', self)
+                return empty_state()
+            return state
+        except Exception as e: #pylint: disable=W0718
+            logging.warning('Could not load sync state from %s. Ignoring it: %s', self, e)
+            return empty_state()
+
+    def save(self, state: Dict[str, Any]) -> None:
+        """
+        Grava o estado da sincronização.
+
+        Args:
+            state (Dict[str, Any]): The state to store, in the format described in `empty_state`.
+        """
+        logging.info(
+            'Saving sync state with %d files and %d tables to %s.',
+            len(state['files']), len(state['tables']), self
+        )
+        self._write(json.dumps(state, sort_keys=True))
+
+class LocalStateStore(StateStore):
+    """Estado armazenado em um arquivo local."""
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+    def __str__(self) -> str:
+        return self.path
+
+    def _read(self) -> Optional[str]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def _write(self, data: str) -> None:
+        directory: str = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Escreve em um arquivo temporário e renomeia, para nunca deixar um estado parcial
+        tmp_path: str = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+class GcsStateStore(StateStore):
+    """Estado armazenado em um objeto do Cloud Storage, usando a API JSON."""
+
+    def __init__(self, bucket: str, name: str) -> None:
+        self.bucket: str = bucket
+        self.name: str = name
+
+    def __str__(self) -> str:
+        return f'gs://{self.bucket}/{self.name}'
+
+    @property
+    def session(self) -> auth_requests.AuthorizedSession:
+        """Sessão HTTP autenticada compartilhada."""
+        return clients.authorized_session()
+
+    def _read(self) -> Optional[str]:
+        response = self.session.get(GCS_DOWNLOAD_URL.format(
+            bucket=self.bucket, name=parse.quote(self.name, safe='')
+        ))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content.decode('utf-8')
+
+    def _write(self, data: str) -> None:
+        response = self.session.post(
+            GCS_UPLOAD_URL.format(bucket=self.bucket, name=parse.quote(self.name, safe='')),
+            data=data.encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        response.raise_for_status()
+
+def get_state_store(uri: str) -> Optional[StateStore]:
+    """
+    Cria o StateStore correspondente a uma URI.
+
+    Args:
+        uri (str): Either 'gs://bucket/path/to/object.json' or a local file path.
+                   An empty string disables the state store.
+
+    Returns:
+        Optional[StateStore]: The store, or None when the URI is empty.
+    """
+    if not uri:
+        return None
+    if uri.startswith('gs://'):
+        bucket, _, name = uri[len('gs://'):].partition('/')
+        if not bucket or not name:
+            raise ValueError(f'Invalid GCS state URI: {uri}')
+        return GcsStateStore(bucket, name)
+    return LocalStateStore(uri)
@@ -0,0 +1,208 @@
+'''Módulo para consulta e validação das policy tags das taxonomias do Data Catalog.'''
+
+import logging
+import threading
+import time
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.auth.transport import requests as auth_requests
+
+from . import clients
+
+
+DATACATALOG_URL: str = 'https://datacatalog.googleapis.com/v1/{parent}/{collection}'
+
+
+class UnknownPolicyTagError(ValueError):
+    """Policy tag inexistente ou ambígua nas taxonomias carregadas."""
+
+
+class PolicyTagClient:
+    """
+    Cliente mínimo da API PolicyTagManager do Data Catalog, usando a API REST.
+    Implementa apenas as listagens necessárias para montar o índice de policy tags.
+    """
+
+    @property
+    def session(self) -> auth_requests.AuthorizedSession:
+        """Sessão HTTP autenticada compartilhada."""
+        return clients.authorized_session()
+
+    def _list(self, parent: str, collection: str) -> Iterator[Dict[str, Any]]:
+        url: str = DATACATALOG_URL.format(parent=parent, collection=collection)
+        params: Dict[str, Any] = {'pageSize': 1000}
+        while True:
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            body: Dict[str, Any] = response.json()
+            yield from body.get(collection, [])
+            if not body.get('nextPageToken'):
+                return
+            params['pageToken'] = body['nextPageToken']
+
+    def list_taxonomies(self, parent: str) -> Iterator[Dict[str, Any]]:
+        """
+        Lista as taxonomias de um projeto e localização.
+
+        Args:
+            parent (str): The location resource name, e.g. 'projects/PROJECT/locations/us'.
+
+        Yields:
+            Dict[str, Any]: Each taxonomy resource, with at least 'name' and 'displayName'.
+        """
+        return self._list(parent, 'taxonomies')
+
+    def list_policy_tags(self, taxonomy: str) -> Iterator[Dict[str, Any]]:
+        """
+        Lista todas as policy tags de uma taxonomia.
+
+        Args:
+            taxonomy (str): The taxonomy resource name.
+
+        Yields:
+            Dict[str, Any]: Each policy tag resource, with at least 'name' and 'displayName'.
+        """
+        return self._list(taxonomy, 'policyTags')
+
+
+class PolicyTagIndex:
+    """
+    Índice das policy tags conhecidas, que resolve tanto nomes de recurso quanto
+    nomes de exibição ('Email') ou nomes qualificados pela taxonomia
+    ('Controle de Acesso/Email') para o nome de recurso.
+    """
+
+    def __init__(self) -> None:
+        self.names: Dict[str, str] = {}
+        self.display_names: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, taxonomy_display_name: str, policy_tag: Dict[str, Any]) -> None:
+        """
+        Adiciona uma policy tag ao índice.
+
+        Args:
+            taxonomy_display_name (str): Display name of the taxonomy holding the tag.
+            policy_tag (Dict[str, Any]): The policy tag resource.
+        """
+        name: str = policy_tag['name']
+        display_name: str = policy_tag.get('displayName', '')
+        self.names[name] = display_name
+        for key in (display_name, f'{taxonomy_display_name}/{display_name}'):
+            self.display_names.setdefault(key, []).append(name)
+
+    def resolve(self, tag: str) -> str:
+        """
+        Resolve uma policy tag para o nome de recurso.
+
+        Args:
+            tag (str): A policy tag resource name, display name or 'Taxonomy/Display name'.
+
+        Returns:
+            str: The policy tag resource name.
+
+        Raises:
+            UnknownPolicyTagError: If the tag does not exist or the display name is ambiguous.
+        """
+        if tag in self.names:
+            return tag
+        candidates: List[str] = self.display_names.get(tag, [])
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates:
+            raise UnknownPolicyTagError(
+                f'Ambiguous policy tag "{tag}": matches {", ".join(sorted(candidates))}. '
+                'Use the resource name or "Taxonomy/Display name".'
+            )
+        raise UnknownPolicyTagError(f'Unknown policy tag "{tag}".')
+
+    def resolve_all(self, tags: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """
+        Resolve uma lista de policy tags.
+
+        Args:
+            tags (Iterable[str]): The policy tags to resolve.
+
+        Returns:
+            Tuple[List[str], List[str]]: The resolved resource names and the errors
+                for the tags that could not be resolved.
+        """
+        resolved: List[str] = []
+        errors: List[str] = []
+        for tag in tags:
+            try:
+                resolved.append(self.resolve(tag))
+            except UnknownPolicyTagError as e:
+                errors.append(str(e))
+        return resolved, errors
+
+
+def load_policy_tag_index(
+    client: Any,
+    projects: Iterable[str],
+    locations: Iterable[str]
+) -> PolicyTagIndex:
+    """
+    Carrega todas as taxonomias e policy tags dos projetos e localizações informados.
+
+    Args:
+        client (Any): A PolicyTagClient, or any object with the same
+                      `list_taxonomies` and `list_policy_tags` methods.
+        projects (Iterable[str]): The projects holding the taxonomies.
+        locations (Iterable[str]): The taxonomy locations (e.g. 'us').
+
+    Returns:
+        PolicyTagIndex: The index with every policy tag found.
+    """
+    index: PolicyTagIndex = PolicyTagIndex()
+    locations = list(locations)
+    for project in projects:
+        for location in locations:
+            for taxonomy in client.list_taxonomies(f'projects/{project}/locations/{location}'):
+                for policy_tag in client.list_policy_tags(taxonomy['name']):
+                    index.add(taxonomy.get('displayName', ''), policy_tag)
+    logging.info('Loaded %d policy tags from Data Catalog.', len(index))
+    return index
+
+
+_cache_lock: threading.Lock = threading.Lock()
+_cache: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], Tuple[float, PolicyTagIndex]] = {}
+_client: Optional[PolicyTagClient] = None
+
+def get_policy_tag_index(
+    projects: Iterable[str],
+    locations: Iterable[str],
+    ttl: float = 300.0,
+    client: Optional[Any] = None
+) -> PolicyTagIndex:
+    """
+    Retorna o índice de policy tags, reaproveitando o índice carregado por uma
+    invocação anterior na mesma instância enquanto ele for mais novo que `ttl`.
+
+    Args:
+        projects (Iterable[str]): The projects holding the taxonomies.
+        locations (Iterable[str]): The taxonomy locations (e.g. 'us').
+        ttl (float): Maximum age of a cached index, in seconds. Zero disables the cache.
+        client (Optional[Any]): The client used to load the index. Defaults to a shared
+                                PolicyTagClient.
+
+    Returns:
+        PolicyTagIndex: The policy tag index.
+    """
+    global _client #pylint: disable=W0603
+    key: Tuple[Tuple[str, ...], Tuple[str, ...]] = (tuple(sorted(projects)), tuple(sorted(locations)))
+    with _cache_lock:
+        cached: Optional[Tuple[float, PolicyTagIndex]] = _cache.get(key)
+        if cached and ttl > 0 and time.monotonic() - cached[0] < ttl:
+            logging.info('Using cached policy tag index.')
+            return cached[1]
+        if client is None:
+            if _client is None:
+                _client = PolicyTagClient()
+            client = _client
+        index: PolicyTagIndex = load_policy_tag_index(client, *key)
+        _cache[key] = (time.monotonic(), index)
+        return index
@@ -0,0 +1,29 @@
+'''Fixtures compartilhadas pelos testes, que rodam contra os backends falsos de `benchmarks.fakes`.'''
+
+from typing import Dict, Iterator
+
+import pytest
+
+from bq_taxonomy import cache
+from bq_taxonomy import config
+
+
+ENVIRONMENT: Dict[str, str] = {
+    'PROJECT_ID': 'p',
+    'REPOSITORY_ID': 'r',
+    'WORKSPACE_ID': 'w',
+    'BASE_FOLDER': 'definitions',
+    'STATE_URI': ''
+}
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch: pytest.MonkeyPatch) -> Iterator[pytest.MonkeyPatch]:
+    """Configura as variáveis de ambiente mínimas e descarta a configuração e o cache lidos por outro teste."""
+    for name, value in ENVIRONMENT.items():
+        monkeypatch.setenv(name, value)
+    config.get_settings.cache_clear()
+    cache.shared.cache_clear()
+    yield monkeypatch
+    config.get_settings.cache_clear()
+    cache.shared.cache_clear()
@@ -0,0 +1,113 @@
+'''Testes da leitura em lote das policy tags pelo `INFORMATION_SCHEMA.COLUMN_FIELD_PATHS`.'''
+
+from typing import Any, List
+
+import pytest
+
+from google.api_core import exceptions
+from google.cloud import bigquery
+
+from bq_taxonomy import bigquery as bq
+from bq_taxonomy import metrics
+from benchmarks import fakes
+
+
+def _field(name: str, tags: List[str]) -> bigquery.SchemaField:
+    return bigquery.SchemaField(name, 'STRING', policy_tags=bigquery.PolicyTagList(tags) if tags else None)
+
+TABLES = {
+    'p.ds1.a': [_field('x', ['t1']), bigquery.SchemaField('r', 'RECORD', fields=[_field('y', ['t2'])])],
+    'p.ds1.b': [_field('x', [])],
+    'p.ds1.unrequested': [_field('x', ['t3'])],
+    'p.ds2.c': [_field('z', ['t4'])],
+    'q.ds1.d': [_field('x', ['t5'])],
+}
+
+
+class _FailingDatasetClient(fakes.FakeBigQueryClient):
+    """Fake cuja consulta a um dos datasets falha."""
+
+    def query(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        if '`p`.`ds2`' in query:
+            self._call('query')
+            raise exceptions.Forbidden('Access denied to INFORMATION_SCHEMA')
+        return super().query(query, *args, **kwargs)
+
+
+def test_one_query_per_dataset() -> None:
+    client = fakes.FakeBigQueryClient(TABLES)
+    with fakes.install(bigquery_client=client):
+        index = bq.get_bigquery_tables_config(['p.ds1.a', 'p.ds1.b', 'p.ds2.c', 'q.ds1.d', 'p.ds1.missing'])
+    assert client.calls['query'] == 3
+    assert client.calls['get_table'] == 0
+    assert set(index) == {'p.ds1.a', 'p.ds1.b', 'p.ds2.c', 'q.ds1.d'}
+
+def test_index_keyed_by_full_table_id_with_nested_paths() -> None:
+    with fakes.install(bigquery_client=fakes.FakeBigQueryClient(TABLES)):
+        index = bq.get_bigquery_tables_config(['p.ds1.a', 'p.ds1.b'])
+    assert index['p.ds1.a'] == {
+        'x': {'name': 'x', 'policy_tags': ['t1']},
+        'r': {'name': 'r', 'policy_tags': []},
+        'r.y': {'name': 'r.y', 'policy_tags': ['t2']},
+    }
+    assert index['p.ds1.b'] == {'x': {'name': 'x', 'policy_tags': []}}
+
+def test_failed_dataset_is_left_out_for_per_table_fallback() -> None:
+    client = _FailingDatasetClient(TABLES)
+    with fakes.install(bigquery_client=client):
+        index = bq.get_bigquery_tables_config(['p.ds1.a', 'p.ds2.c'])
+    assert client.calls['query'] == 2
+    assert set(index) == {'p.ds1.a'}
+
+def test_per_table_read_matches_bulk_read() -> None:
+    with fakes.install(bigquery_client=fakes.FakeBigQueryClient(TABLES)):
+        bulk = bq.get_bigquery_tables_config(['p.ds1.a'])['p.ds1.a']
+        single = bq.get_bigquery_table_config('p.ds1.a')
+    assert {k: v['policy_tags'] for k, v in bulk.items()} == {k: v['policy_tags'] for k, v in single.items()}
+
+@pytest.mark.parametrize('dataset_id', [
+    'ds`.INFORMATION_SCHEMA.TABLES --',
+    'p.ds1 UNION ALL SELECT 1',
+    'P.ds1',
+    'proj-.ds1',
+    'p.',
+])
+def test_invalid_dataset_ids_are_rejected_before_querying(dataset_id: str) -> None:
+    client = fakes.FakeBigQueryClient(TABLES)
+    with fakes.install(bigquery_client=client):
+        project, _, dataset = dataset_id.rpartition('.')
+        with pytest.raises(ValueError, match='Invalid dataset ID'):
+            bq.get_bigquery_dataset_config(project or 'p', dataset)
+        with pytest.raises(ValueError, match='Invalid dataset ID'):
+            bq.parse_dataset_id(dataset_id, 'p')
+    assert client.calls['query'] == 0
+
+@pytest.mark.parametrize('dataset_id, expected', [
+    ('ds1', ('p', 'ds1')),
+    ('my-project.ds_1', ('my-project', 'ds_1')),
+    ('example.com:my-project.ds1', ('example.com:my-project', 'ds1')),
+])
+def test_valid_dataset_ids(dataset_id: str, expected: tuple) -> None:
+    assert bq.parse_dataset_id(dataset_id, 'p') == expected
+
+def test_concurrent_update_is_refetched_and_reapplied() -> None:
+    client = fakes.FakeBigQueryClient({'p.ds.a': [_field('x', ['t1']), _field('y', [])]})
+    run = metrics.begin()
+    with fakes.install(bigquery_client=client):
+        table = bq.get_bigquery_table('p.ds.a')
+        # Outro processo altera a tabela entre a leitura e a escrita, mudando o etag
+        concurrent = client.get_table('p.ds.a')
+        concurrent.schema = [_field('x', ['t1']), _field('y', ['t2'])]
+        client.update_table(concurrent, ['schema'])
+        client.calls.clear()
+        bq.sync_bigquery_column_policy_tags(
+            'p.ds.a', {'x': {'changes': [{'action': 'add', 'tag_name': 't3'}]}}, table
+        )
+        current = client.get_table('p.ds.a')
+    assert client.calls['get_table'] == 2
+    assert client.calls['update_table'] == 2
+    # As mudanças são aplicadas sobre o schema atualizado, sem desfazer a alteração concorrente
+    assert {f.name: list(f.policy_tags.names) for f in current.schema} == {'x': ['t1', 't3'], 'y': ['t2']}
+    operations = run.report()['operations']
+    assert operations['bigquery.get_table']['calls'] == 2
+    assert operations['bigquery.sync_policy_tags']['retries'] == 1
@@ -0,0 +1,104 @@
+'''Testes do snapshot do workspace usado pelo cache de listagens e arquivos do Dataform.'''
+
+from typing import Dict, List, Optional
+
+import pytest
+
+from google.cloud import dataform
+
+from bq_taxonomy import dataform as df
+from bq_taxonomy.cache import LRUCache
+from benchmarks import fakes
+
+
+WORKSPACE: str = 'projects/p/locations/l/repositories/r/workspaces/w'
+FILES: Dict[str, str] = {'definitions/a.sqlx': 'a1', 'definitions/b.sqlx': 'b1'}
+
+
+def _read(snapshot: Optional[df.WorkspaceSnapshot]) -> Dict[str, Optional[str]]:
+    """Lê todos os arquivos pelo snapshot e grava no cache as entradas lidas."""
+    contents: Dict[str, Optional[str]] = dict(df.read_files(WORKSPACE, sorted(FILES), snapshot=snapshot))
+    if snapshot is not None:
+        snapshot.commit()
+    return contents
+
+def _write(client: fakes.FakeDataformClient, path: str, content: str) -> None:
+    client.write_file(dataform.WriteFileRequest(workspace=WORKSPACE, path=path, contents=content.encode('utf-8')))
+
+def _files() -> List[str]:
+    return sorted(df.get_files(WORKSPACE, 'definitions', snapshot=df.workspace_snapshot(WORKSPACE, LRUCache(2**20))))
+
+
+def test_unchanged_files_are_read_once() -> None:
+    client = fakes.FakeDataformClient(FILES)
+    cache = LRUCache(2**20)
+    with fakes.install(client):
+        assert _read(df.workspace_snapshot(WORKSPACE, cache)) == FILES
+        assert _read(df.workspace_snapshot(WORKSPACE, cache)) == FILES
+    assert client.calls['read_file'] == 2
+
+def test_uncommitted_edit_bypasses_the_cache() -> None:
+    client = fakes.FakeDataformClient(FILES)
+    cache = LRUCache(2**20)
+    with fakes.install(client):
+        _read(df.workspace_snapshot(WORKSPACE, cache))
+        _write(client, 'definitions/a.sqlx', 'a2')
+        client.calls.clear()
+        snapshot = df.workspace_snapshot(WORKSPACE, cache)
+        assert _read(snapshot) == {'definitions/a.sqlx': 'a2', 'definitions/b.sqlx': 'b1'}
+        # O arquivo editado é sempre lido do Dataform, e os demais continuam no cache
+        assert client.calls['read_file'] == 1
+        _write(client, 'definitions/a.sqlx', 'a3')
+        assert _read(df.workspace_snapshot(WORKSPACE, cache))['definitions/a.sqlx'] == 'a3'
+        assert client.calls['read_file'] == 2
+        # Depois do commit, a chave do cache muda e o conteúdo novo é lido
+        client.commit()
+        assert _read(df.workspace_snapshot(WORKSPACE, cache))['definitions/a.sqlx'] == 'a3'
+
+def test_added_file_changes_the_listing() -> None:
+    client = fakes.FakeDataformClient(FILES)
+    with fakes.install(client):
+        assert _files() == sorted(FILES)
+        _write(client, 'definitions/c.sqlx', 'c1')
+        assert _files() == sorted(FILES) + ['definitions/c.sqlx']
+
+@pytest.mark.parametrize('change', ['edit', 'commit'])
+def test_entries_are_discarded_when_the_workspace_changes_mid_run(change: str) -> None:
+    client = fakes.FakeDataformClient(FILES)
+    cache = LRUCache(2**20)
+    with fakes.install(client):
+        snapshot = df.workspace_snapshot(WORKSPACE, cache)
+        assert dict(df.read_files(WORKSPACE, sorted(FILES), snapshot=snapshot)) == FILES
+        if change == 'edit':
+            _write(client, 'definitions/b.sqlx', 'b2')
+        else:
+            client.commit()
+        assert snapshot.commit() == 0
+        client.calls.clear()
+        # Nenhuma entrada da execução anterior é reaproveitada
+        _read(df.workspace_snapshot(WORKSPACE, cache))
+        assert client.calls['read_file'] == 2
+
+@pytest.mark.parametrize('options', [{'history': False}, {'ahead': 1}])
+def test_unidentified_commit_uses_the_ttl(options: Dict, monkeypatch: pytest.MonkeyPatch) -> None:
+    client = fakes.FakeDataformClient(FILES, **options)
+    cache = LRUCache(2**20)
+    now: List[float] = [1000.0]
+    monkeypatch.setattr(df.time, 'time', lambda: now[0])
+    with fakes.install(client):
+        # Sem TTL, o cache não é usado
+        assert df.workspace_snapshot(WORKSPACE, cache) is None
+        _read(df.workspace_snapshot(WORKSPACE, cache, ttl=60))
+        now[0] += 10
+        _read(df.workspace_snapshot(WORKSPACE, cache, ttl=60))
+        assert client.calls['read_file'] == 2
+        # No intervalo seguinte do TTL, as entradas não valem mais
+        now[0] += 60
+        _read(df.workspace_snapshot(WORKSPACE, cache, ttl=60))
+        assert client.calls['read_file'] == 4
+
+def test_git_state_errors_skip_the_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = fakes.FakeDataformClient(FILES)
+    monkeypatch.setattr(client, 'fetch_git_ahead_behind', lambda *args, **kwargs: 1 / 0)
+    with fakes.install(client):
+        assert df.workspace_snapshot(WORKSPACE, LRUCache(2**20)) is None
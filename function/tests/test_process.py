@@ -0,0 +1,297 @@
+'''Testes de ponta a ponta dos modos da função, contra os backends falsos de `benchmarks.fakes`.'''
+
+import base64
+import json
+import pathlib
+
+from typing import Dict, List
+
+import flask
+import pytest
+
+from google.cloud import bigquery
+
+from bq_taxonomy import config
+from bq_taxonomy import main
+from bq_taxonomy import process
+from bq_taxonomy import sqlx
+from benchmarks import fakes
+
+
+TAG: str = 'projects/p/locations/us/taxonomies/1/policyTags/{}'
+
+
+def _field(name: str, tags: List[str]) -> bigquery.SchemaField:
+    return bigquery.SchemaField(name, 'STRING', policy_tags=bigquery.PolicyTagList(tags) if tags else None)
+
+def _tags(client: fakes.FakeBigQueryClient, full_table_id: str) -> Dict[str, List[str]]:
+    """Policy tags atuais de cada coluna (sem campos aninhados) de uma tabela do fake."""
+    return {
+        field['name']: (field.get('policyTags') or {}).get('names', [])
+        for field in client.tables[full_table_id]['schema']['fields']
+    }
+
+def _declaration(dataset: str, table: str, columns: Dict[str, List[str]]) -> str:
+    return sqlx.render_declaration(None, dataset, table, columns)
+
+
+def test_bulk_snapshot_sends_one_query_per_dataset(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('BULK_SNAPSHOT', 'true')
+    files: Dict[str, str] = {}
+    tables: Dict[str, List[bigquery.SchemaField]] = {}
+    for d in range(3):
+        for t in range(7):
+            files[f'definitions/ds{d}/t{t}.sqlx'] = _declaration(f'ds{d}', f't{t}', {'a': [TAG.format(1)]})
+            tables[f'p.ds{d}.t{t}'] = [_field('a', [TAG.format(1)] if t % 2 else [])]
+    bigquery_client = fakes.FakeBigQueryClient(tables)
+    with fakes.install(fakes.FakeDataformClient(files), bigquery_client):
+        summary = process.validate_and_apply()
+    assert summary['tables'] == {'total': 21, 'unchanged': 9, 'planned': 0, 'updated': 12, 'failed': 0}
+    assert bigquery_client.calls['query'] == 3
+    # Apenas as tabelas atualizadas são relidas com tables.get, para obter o etag
+    assert bigquery_client.calls['get_table'] == 12
+
+def _policy_tag_client() -> fakes.FakePolicyTagClient:
+    # TAG.format(1) -> 'Email', TAG.format(2) -> 'Phone'
+    return fakes.FakePolicyTagClient({'Access': ['Email', 'Phone']})
+
+def test_unknown_tag_in_one_declaration_rejects_the_whole_table(
+    environment: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path
+) -> None:
+    environment.setenv('VALIDATE_POLICY_TAGS', 'true')
+    environment.setenv('STATE_URI', str(tmp_path / 'state.json'))
+    files = {
+        'definitions/a1.sqlx': _declaration('ds', 'a', {'x': ['Email']}),
+        'definitions/a2.sqlx': _declaration('ds', 'a', {'y': ['Typo']}),
+        'definitions/b.sqlx': _declaration('ds', 'b', {'x': ['Access/Phone']}),
+    }
+    tables = {'p.ds.a': [_field('x', []), _field('y', [])], 'p.ds.b': [_field('x', [])]}
+    bigquery_client = fakes.FakeBigQueryClient(tables)
+    with fakes.install(fakes.FakeDataformClient(files), bigquery_client, _policy_tag_client()):
+        summary = process.validate_and_apply()
+        assert summary['tables'] == {'total': 2, 'unchanged': 0, 'planned': 0, 'updated': 1, 'failed': 1}
+        failed = [r for r in summary['results'] if r['status'] == process.FAILED]
+        assert failed[0]['full_table_id'] == 'p.ds.a'
+        assert failed[0]['full_file_name'] == 'definitions/a1.sqlx, definitions/a2.sqlx'
+        assert failed[0]['error'].startswith('UnknownPolicyTagError: definitions/a2.sqlx: Column "y"')
+        # Nenhuma coluna da tabela rejeitada é alterada, nem as da declaração válida
+        assert bigquery_client.calls['update_table'] == 1
+        assert _tags(bigquery_client, 'p.ds.a') == {'x': [], 'y': []}
+        assert _tags(bigquery_client, 'p.ds.b') == {'x': [TAG.format(2)]}
+
+        # A tabela rejeitada fica fora do estado e é reprocessada na execução seguinte; a outra é pulada
+        summary = process.validate_and_apply()
+        assert summary['tables'] == {'total': 1, 'unchanged': 0, 'planned': 0, 'updated': 0, 'failed': 1}
+
+def _apply_workspace() -> Dict[str, str]:
+    return {'definitions/a.sqlx': _declaration('ds', 'a', {'x': [TAG.format(1)], 'y': []})}
+
+def _apply_tables() -> Dict[str, List[bigquery.SchemaField]]:
+    return {
+        'p.ds.a': [_field('x', [TAG.format(2)]), _field('y', [TAG.format(2)]), _field('secret', [TAG.format(1)])],
+        'p.e.x': [_field('c', [TAG.format(1)])],
+    }
+
+def test_apply_mode_is_disabled_by_default(environment: pytest.MonkeyPatch) -> None:
+    # Pula a configuração do Cloud Logging da primeira requisição
+    environment.setattr(main, '_initialized', True)
+    bigquery_client = fakes.FakeBigQueryClient(_apply_tables())
+    plan = {'version': 1, 'tables': {'p.e.x': {'columns': {'c': {'remove': [TAG.format(1)]}}}}}
+    with fakes.install(fakes.FakeDataformClient(_apply_workspace()), bigquery_client):
+        with flask.Flask(__name__).test_request_context('/?mode=apply', json=plan):
+            response = main.bq_taxonomy(flask.request)
+    assert response.status_code == 403
+    assert bigquery_client.calls['update_table'] == 0
+
+def test_plan_round_trip_is_applied(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('WORKSPACE_CACHE_MB', '0')
+    files = {
+        **_apply_workspace(),
+        'definitions/a_more.sqlx': _declaration('ds', 'a', {'y': []}),
+        **{f'definitions/other{i}.sqlx': _declaration('ds', f'other{i}', {}) for i in range(5)},
+    }
+    bigquery_client = fakes.FakeBigQueryClient(_apply_tables())
+    dataform_client = fakes.FakeDataformClient(files)
+    with fakes.install(dataform_client, bigquery_client):
+        plan = process.validate_and_apply(dry_run=True)['plan']
+        assert plan['tables']['p.ds.a']['files'] == ['definitions/a.sqlx', 'definitions/a_more.sqlx']
+        assert plan['tables']['p.ds.a']['columns'] == {
+            'x': {'add': [TAG.format(1)], 'remove': [TAG.format(2)]},
+            'y': {'add': [], 'remove': [TAG.format(2)]},
+        }
+        dataform_client.calls.clear()
+        summary = process.apply_plan(plan)
+    assert summary['tables'] == {'total': 1, 'unchanged': 0, 'planned': 0, 'updated': 1, 'failed': 0}
+    assert _tags(bigquery_client, 'p.ds.a') == {'x': [TAG.format(1)], 'y': [], 'secret': [TAG.format(1)]}
+    # Apenas os arquivos registrados no plano são relidos, sem percorrer o workspace
+    assert dataform_client.calls['read_file'] == 2
+    assert dataform_client.calls['query_directory_contents'] == 0
+
+def test_plan_with_missing_declaration_files_is_rejected() -> None:
+    bigquery_client = fakes.FakeBigQueryClient(_apply_tables())
+    with fakes.install(fakes.FakeDataformClient(_apply_workspace()), bigquery_client):
+        summary = process.apply_plan({'version': 1, 'tables': {'p.ds.a': {
+            'files': ['definitions/a.sqlx', 'definitions/gone.sqlx'],
+            'columns': {'y': {'remove': [TAG.format(2)]}},
+        }}})
+    assert summary['tables']['failed'] == 1
+    assert 'definitions/gone.sqlx not found' in summary['results'][0]['error']
+    assert summary['targets'] == {'missing_files': ['definitions/gone.sqlx']}
+    assert bigquery_client.calls['update_table'] == 0
+
+@pytest.mark.parametrize('table, columns, error', [
+    ('p.e.x', {'c': {'remove': [TAG.format(1)]}}, 'Table is not declared'),
+    ('p.ds.a', {'x': {'remove': [TAG.format(1)]}}, 'is declared and cannot be removed'),
+    ('p.ds.a', {'y': {'add': [TAG.format(3)]}}, 'is not declared'),
+    ('p.ds.a', {'secret': {'remove': [TAG.format(1)]}}, 'not managed by any declaration'),
+])
+def test_plan_not_matching_the_declarations_is_rejected(table: str, columns: Dict, error: str) -> None:
+    bigquery_client = fakes.FakeBigQueryClient(_apply_tables())
+    with fakes.install(fakes.FakeDataformClient(_apply_workspace()), bigquery_client):
+        summary = process.apply_plan({'version': 1, 'tables': {table: {'columns': columns}}})
+    assert summary['tables']['failed'] == 1
+    assert summary['results'][0]['error'].startswith('PlanRejectedError:')
+    assert error in summary['results'][0]['error']
+    assert bigquery_client.calls['update_table'] == 0
+
+def test_plan_tags_are_resolved_with_validation(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('VALIDATE_POLICY_TAGS', 'true')
+    files = {'definitions/a.sqlx': _declaration('ds', 'a', {'x': ['Email'], 'y': []})}
+    bigquery_client = fakes.FakeBigQueryClient(_apply_tables())
+    with fakes.install(fakes.FakeDataformClient(files), bigquery_client, _policy_tag_client()):
+        summary = process.apply_plan({'version': 1, 'tables': {
+            'p.ds.a': {'columns': {'x': {'add': ['Access/Email'], 'remove': ['Phone']}}}
+        }})
+        assert summary['tables']['updated'] == 1
+        assert _tags(bigquery_client, 'p.ds.a')['x'] == [TAG.format(1)]
+
+        summary = process.apply_plan({'version': 1, 'tables': {
+            'p.ds.a': {'columns': {'y': {'remove': ['Typo']}}}
+        }})
+        assert summary['tables']['failed'] == 1
+        assert 'Unknown policy tag "Typo"' in summary['results'][0]['error']
+
+def _sync_request(body: object, monkeypatch: pytest.MonkeyPatch) -> Dict:
+    monkeypatch.setattr(main, '_initialized', True)
+    with flask.Flask(__name__).test_request_context('/?mode=plan', json=body):
+        response = main.bq_taxonomy(flask.request)
+    assert response.status_code == 200, response.get_data()
+    return json.loads(response.get_data())
+
+@pytest.mark.parametrize('body', [
+    None,
+    {'job': 'scheduler'},
+    {'message': {'data': base64.b64encode(b'tick').decode()}},
+    {'message': {'data': base64.b64encode(b'{"other": 1}').decode()}},
+])
+def test_bodies_without_targets_run_a_full_sync(body: object, environment: pytest.MonkeyPatch) -> None:
+    files = {f'definitions/t{i}.sqlx': _declaration('ds', f't{i}', {'x': [TAG.format(1)]}) for i in range(3)}
+    tables = {f'p.ds.t{i}': [_field('x', [])] for i in range(3)}
+    with fakes.install(fakes.FakeDataformClient(files), fakes.FakeBigQueryClient(tables)):
+        summary = _sync_request(body, environment)
+    assert summary['tables']['planned'] == 3
+    assert 'targets' not in summary
+
+def test_invalid_target_list_is_rejected(environment: pytest.MonkeyPatch) -> None:
+    environment.setattr(main, '_initialized', True)
+    with flask.Flask(__name__).test_request_context('/?mode=plan', json={'tables': 'p.ds.t0'}):
+        assert main.bq_taxonomy(flask.request).status_code == 400
+
+def test_table_targets_without_state_are_found_in_the_workspace(environment: pytest.MonkeyPatch) -> None:
+    files = {
+        'definitions/a1.sqlx': _declaration('ds', 'a', {'x': [TAG.format(1)]}),
+        'definitions/a2.sqlx': _declaration('ds', 'a', {'y': [TAG.format(2)]}),
+        'definitions/b.sqlx': _declaration('ds', 'b', {'x': [TAG.format(1)]}),
+    }
+    tables = {'p.ds.a': [_field('x', []), _field('y', [])], 'p.ds.b': [_field('x', [])]}
+    with fakes.install(fakes.FakeDataformClient(files), fakes.FakeBigQueryClient(tables)):
+        summary = _sync_request({'tables': ['ds.a', 'p.ds.missing']}, environment)
+    assert summary['targets'] == {'missing_files': [], 'unresolved_tables': ['p.ds.missing']}
+    assert summary['tables']['total'] == 1
+    assert summary['plan']['tables']['p.ds.a']['columns'] == {
+        'x': {'add': [TAG.format(1)], 'remove': []},
+        'y': {'add': [TAG.format(2)], 'remove': []},
+    }
+
+def test_export_resolves_declared_tags_before_the_drift_check(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('VALIDATE_POLICY_TAGS', 'true')
+    files = {'definitions/a.sqlx': _declaration('ds', 'a', {'x': ['Email'], 'y': ['Access/Phone']})}
+    tables = {'p.ds.a': [_field('x', [TAG.format(1)]), _field('y', [TAG.format(1)])]}
+    with fakes.install(fakes.FakeDataformClient(files), fakes.FakeBigQueryClient(tables), _policy_tag_client()):
+        summary = process.export_declarations(['ds'], dry_run=True)
+    # Só a coluna y diverge; x declara a mesma tag pelo nome de exibição
+    assert summary['drift']['tag_drift'] == {'p.ds.a': {'y': {'declared': [TAG.format(2)], 'actual': [TAG.format(1)]}}}
+    assert not summary['errors']
+
+def test_export_does_not_overwrite_files_outside_the_base_folder(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('EXPORT_FOLDER', 'exported')
+    files = {
+        'definitions/c.sqlx': _declaration('ds', 'c', {'x': [TAG.format(1)]}),
+        'exported/ds/a.sqlx': '-- arquivo manual\n',
+    }
+    tables = {
+        'p.ds.a': [_field('x', [TAG.format(1)])],
+        'p.ds.b': [_field('x', [TAG.format(2)])],
+        'p.ds.c': [_field('x', [TAG.format(1)])],
+    }
+    dataform_client = fakes.FakeDataformClient(files)
+    with fakes.install(dataform_client, fakes.FakeBigQueryClient(tables)):
+        summary = process.export_declarations(['ds'])
+    assert summary['tables']['exported'] == 1
+    assert summary['errors'] == {'p.ds.a': 'File exported/ds/a.sqlx already exists and is not a declaration.'}
+    assert dataform_client.files['exported/ds/a.sqlx'] == b'-- arquivo manual\n'
+    assert 'exported/ds/b.sqlx' in dataform_client.files
+
+def _export_request(query: str, monkeypatch: pytest.MonkeyPatch) -> flask.Response:
+    monkeypatch.setattr(main, '_initialized', True)
+    tables = {'p.ds.a': [_field('x', [TAG.format(1)])]}
+    dataform_client = fakes.FakeDataformClient({'definitions/b.sqlx': _declaration('ds', 'b', {})})
+    with fakes.install(dataform_client, fakes.FakeBigQueryClient(tables)):
+        with flask.Flask(__name__).test_request_context(f'/?mode=export&dry_run=true&{query}'):
+            return main.bq_taxonomy(flask.request)
+
+def test_export_mode_is_disabled_by_default(environment: pytest.MonkeyPatch) -> None:
+    assert _export_request('datasets=ds', environment).status_code == 403
+    environment.setenv('ALLOW_EXPORT', 'true')
+    config.get_settings.cache_clear()
+    assert _export_request('datasets=ds', environment).status_code == 200
+
+def test_export_rejects_invalid_dataset_ids(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('ALLOW_EXPORT', 'true')
+    response = _export_request('datasets=ds`.INFORMATION_SCHEMA.TABLES%20--', environment)
+    assert response.status_code == 400
+    assert b'Invalid dataset ID' in response.get_data()
+
+def test_unparsable_files_do_not_abort_the_run(environment: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    environment.setenv('STATE_URI', str(tmp_path / 'state.json'))
+    files = {
+        'definitions/view.sqlx': 'config { schema: dataform.projectConfig.vars.ds, type: "view" }\nSELECT 1',
+        'definitions/broken.sqlx': 'config { type: "declaration", schema: vars.ds, name: "b" }',
+        'definitions/string_tags.sqlx': (
+            'config { type: "declaration", schema: "ds", name: "c", columns: { x: { bigqueryPolicyTags: "t1" } } }'
+        ),
+        'definitions/a.sqlx': _declaration('ds', 'a', {'x': [TAG.format(1)]}),
+    }
+    tables = {'p.ds.a': [_field('x', [])], 'p.ds.c': [_field('x', [])]}
+    bigquery_client = fakes.FakeBigQueryClient(tables)
+    with fakes.install(fakes.FakeDataformClient(files), bigquery_client):
+        summary = process.validate_and_apply()
+        assert summary['tables'] == {'total': 3, 'unchanged': 0, 'planned': 0, 'updated': 1, 'failed': 2}
+        failed = {r['full_file_name']: r['error'] for r in summary['results'] if r['status'] == process.FAILED}
+        assert failed['definitions/broken.sqlx'].startswith('SqlxParseError: ')
+        assert failed['definitions/string_tags.sqlx'].startswith('ValueError: ')
+        assert _tags(bigquery_client, 'p.ds.a') == {'x': [TAG.format(1)]}
+        assert _tags(bigquery_client, 'p.ds.c') == {'x': []}
+        # Os arquivos inválidos são relidos na próxima execução; a view continua ignorada
+        summary = process.validate_and_apply()
+        assert summary['tables'] == {'total': 2, 'unchanged': 0, 'planned': 0, 'updated': 0, 'failed': 2}
+
+def test_table_targets_without_state_read_each_file_once(environment: pytest.MonkeyPatch) -> None:
+    environment.setenv('WORKSPACE_CACHE_MB', '0')
+    files = {f'definitions/t{i}.sqlx': _declaration('ds', f't{i}', {'x': [TAG.format(1)]}) for i in range(50)}
+    dataform_client = fakes.FakeDataformClient(files)
+    with fakes.install(dataform_client, fakes.FakeBigQueryClient({'p.ds.t7': [_field('x', [])]})):
+        summary = _sync_request({'tables': ['ds.t7']}, environment)
+    assert summary['tables']['planned'] == 1
+    assert dataform_client.calls['read_file'] == 50
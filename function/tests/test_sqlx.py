@@ -0,0 +1,107 @@
+'''Testes do parser dos blocos `config { ... }` dos arquivos SQLX.'''
+
+import json
+
+import pytest
+
+from bq_taxonomy import sqlx
+
+
+def test_comments_trailing_commas_and_quotes() -> None:
+    content = '''config {
+      // comentário de linha
+      type: 'declaration', /* comentário
+      de bloco */
+      schema: "ds",
+      name: `t`,
+      description: "url: http://x // não é comentário",
+      columns: {
+        "a": { bigqueryPolicyTags: ['tag:1', "tag/2",], },
+      },
+    }
+    SELECT 1'''
+    assert sqlx.parse_config(content) == {
+        'type': 'declaration',
+        'schema': 'ds',
+        'name': 't',
+        'description': 'url: http://x // não é comentário',
+        'columns': {'a': {'bigqueryPolicyTags': ['tag:1', 'tag/2']}},
+    }
+
+def test_literals_numbers_and_escapes() -> None:
+    config = sqlx.parse_config(r'config { a: true, b: null, c: -1.5e2, d: 3, e: "x\"y\né", f: [] }')
+    assert config == {'a': True, 'b': None, 'c': -150.0, 'd': 3, 'e': 'x"y\né', 'f': []}
+
+def test_nested_columns_are_flattened() -> None:
+    declaration = sqlx.parse_declaration(
+        'config { type: "declaration", schema: "ds", name: "t", '
+        'columns: { r: { description: "rec", columns: { f: { bigqueryPolicyTags: ["t1"] } } } } }'
+    )
+    assert declaration is not None
+    assert declaration.full_table_id('p') == 'p.ds.t'
+    assert declaration.columns == {'r': {'description': 'rec'}, 'r.f': {'bigqueryPolicyTags': ['t1']}}
+
+def test_other_types_are_rejected_before_parsing_the_rest() -> None:
+    # O restante do bloco é inválido, mas não chega a ser lido
+    assert sqlx.parse_config('config { type: "table", columns: {{{ }', sqlx.DECLARATION_TYPE) is None
+    assert sqlx.parse_declaration('config { type: "view" }\nSELECT 1') is None
+    assert sqlx.parse_declaration('config { schema: "ds", name: "t" }') is None
+
+def test_missing_required_keys() -> None:
+    with pytest.raises(ValueError, match="'name'"):
+        sqlx.parse_declaration('config { type: "declaration", schema: "ds" }')
+
+def test_unparsable_blocks_of_other_types_are_skipped() -> None:
+    assert sqlx.parse_declaration('config { schema: dataform.projectConfig.vars.ds, type: "view" }') is None
+    assert sqlx.parse_declaration('config { schema: `${dataform.projectConfig.vars.ds}`, type: "table" }') is None
+    with pytest.raises(sqlx.SqlxParseError):
+        sqlx.parse_declaration('config { schema: vars.ds, "type": \'declaration\', name: "t" }')
+
+@pytest.mark.parametrize('tags', ['"t1"', '[1]', '[["t1"]]', 'null'])
+def test_policy_tags_must_be_a_list_of_strings(tags: str) -> None:
+    with pytest.raises(ValueError, match="Column 'a' 'bigqueryPolicyTags' key must be a list of strings"):
+        sqlx.parse_declaration(
+            f'config {{ type: "declaration", schema: "ds", name: "t", columns: {{ a: {{ bigqueryPolicyTags: {tags} }} }} }}'
+        )
+
+@pytest.mark.parametrize('content', [
+    'config { type: "table" }',
+    '-- header\n-- another: config {\nconfig { type: "table" }',
+    '/* block */ -- line\n  config {}',
+    'js {\n  const x = 1;\n}\nconfig { type: "table" }',
+])
+def test_find_config_block(content: str) -> None:
+    # O bloco é sempre o último `config {` dos exemplos
+    assert sqlx.find_config_block(content) == content.rindex('config {') + len('config ')
+
+def test_find_config_block_without_config() -> None:
+    assert sqlx.find_config_block('-- config {\nSELECT 1') == -1
+
+def test_config_after_js_block_is_parsed() -> None:
+    content = 'js {\n  const config = { type: "x" };\n}\nconfig { type: "declaration", schema: "s", name: "n" }'
+    assert sqlx.parse_config(content)['type'] == 'declaration'
+
+@pytest.mark.parametrize('content, message, line', [
+    ('config {\n  a: "x\n" }', 'Unterminated string', 2),
+    ('config { a: 1 b: 2 }', 'Expected "," or "}"', 1),
+    ('config {\n  a: ${x} }', 'Unexpected character', 2),
+    ('config { a: `x ${y}` }', 'Template literal interpolation', 1),
+    ('config { /* a: 1 }', 'Unterminated block comment', 1),
+    ('config {\n\n  a: "\\u12g4" }', 'Invalid unicode escape', 3),
+    ('config { a: "\\u12" }', 'Invalid unicode escape', 1),
+    ('config { a: [1, 2 }', 'Expected "," or "]"', 1),
+    ('config { a: 1', 'Unexpected end of content', 1),
+])
+def test_errors_are_positioned(content: str, message: str, line: int) -> None:
+    with pytest.raises(sqlx.SqlxParseError, match=message) as error:
+        sqlx.parse_config(content)
+    assert error.value.line == line
+
+def test_render_declaration_round_trip() -> None:
+    columns = {'a': ['t1'], 'r.f': ['t2', 't3'], 'with space': ['t4']}
+    content = sqlx.render_declaration('p', 'ds', 't', columns)
+    declaration = sqlx.parse_declaration(content)
+    assert declaration is not None
+    assert (declaration.database, declaration.schema, declaration.name) == ('p', 'ds', 't')
+    assert {k: v['bigqueryPolicyTags'] for k, v in declaration.columns.items() if 'bigqueryPolicyTags' in v} == columns
+    assert json.loads(json.dumps(declaration.config)) == declaration.config
@@ -0,0 +1,69 @@
+'''Testes do índice de policy tags, contra o Data Catalog falso de `benchmarks.fakes`.'''
+
+import pytest
+
+from bq_taxonomy import taxonomy as tx
+from benchmarks import fakes
+
+
+TAXONOMIES = {
+    'Access': ['Email', 'Phone', 'Shared'],
+    'Finance': ['Salary', 'Shared'],
+}
+EMAIL = 'projects/p/locations/us/taxonomies/1/policyTags/1'
+ACCESS_SHARED = 'projects/p/locations/us/taxonomies/1/policyTags/3'
+SALARY = 'projects/p/locations/us/taxonomies/2/policyTags/1'
+
+
+@pytest.fixture
+def index() -> tx.PolicyTagIndex:
+    return tx.load_policy_tag_index(fakes.FakePolicyTagClient(TAXONOMIES), ['p'], ['us'])
+
+def test_index_loads_every_tag(index: tx.PolicyTagIndex) -> None:
+    assert len(index) == 5
+
+@pytest.mark.parametrize('tag, expected', [
+    (EMAIL, EMAIL),
+    ('Email', EMAIL),
+    ('Finance/Salary', SALARY),
+    ('Access/Shared', ACCESS_SHARED),
+])
+def test_resolve(index: tx.PolicyTagIndex, tag: str, expected: str) -> None:
+    assert index.resolve(tag) == expected
+
+def test_ambiguous_display_name(index: tx.PolicyTagIndex) -> None:
+    with pytest.raises(tx.UnknownPolicyTagError, match='Ambiguous policy tag "Shared"'):
+        index.resolve('Shared')
+
+@pytest.mark.parametrize('tag', ['Missing', 'Access/Salary', 'projects/p/locations/us/taxonomies/9/policyTags/1'])
+def test_unknown_tag(index: tx.PolicyTagIndex, tag: str) -> None:
+    with pytest.raises(tx.UnknownPolicyTagError, match='Unknown policy tag'):
+        index.resolve(tag)
+
+def test_resolve_all_collects_errors(index: tx.PolicyTagIndex) -> None:
+    resolved, errors = index.resolve_all(['Email', 'Shared', 'Missing', 'Finance/Salary'])
+    assert resolved == [EMAIL, SALARY]
+    assert len(errors) == 2
+
+def test_index_is_reused_within_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = fakes.FakePolicyTagClient(TAXONOMIES)
+    now = [1000.0]
+    monkeypatch.setattr(tx.time, 'monotonic', lambda: now[0])
+    with fakes.install(policy_tag_client=client):
+        first = tx.get_policy_tag_index(['p'], ['us'], ttl=60)
+        now[0] += 59
+        assert tx.get_policy_tag_index(['p'], ['us'], ttl=60) is first
+        assert client.calls['list_taxonomies'] == 1
+        now[0] += 2
+        assert tx.get_policy_tag_index(['p'], ['us'], ttl=60) is not first
+        assert client.calls['list_taxonomies'] == 2
+        # Sem TTL, o índice é sempre recarregado
+        tx.get_policy_tag_index(['p'], ['us'], ttl=0)
+        assert client.calls['list_taxonomies'] == 3
+
+def test_index_is_keyed_by_projects_and_locations() -> None:
+    client = fakes.FakePolicyTagClient(TAXONOMIES)
+    with fakes.install(policy_tag_client=client):
+        assert len(tx.get_policy_tag_index(['p'], ['us'], ttl=60)) == 5
+        assert len(tx.get_policy_tag_index(['p'], ['eu'], ttl=60)) == 0
+        assert client.calls['list_taxonomies'] == 2